@@ -0,0 +1,536 @@
+"""
+alternator_async_client.py
+Asyncio counterpart of alternator_client.py, built on aiobotocore.
+
+The method names and return values match AlternatorClient / AlternatorWikipediaClient, but every
+call is a coroutine (scans are async generators). All requests of a client share one aiohttp
+connection pool and a semaphore limiting the number of requests in flight, so thousands of
+lookups can be fanned out with asyncio.gather from a single process.
+
+Writes are batched, retried and reported per item as by bulk_writer.BulkWriter, and return the
+same BulkWriteResult; the semaphore takes the place of its adaptive concurrency limit. Calls are
+recorded in the same metrics as the sync client's (see alternator_client.instrument_client).
+
+Usage:
+    async with AsyncAlternatorWikipediaClient('http://localhost:8000') as client:
+        articles = await asyncio.gather(*(client.get_article(t) for t in titles))
+"""
+import asyncio
+import contextlib
+import random
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from alternator.alternator_client import (
+    BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS, BATCH_GET_MAX_KEYS, BATCH_MAX_RETRIES, DEFAULT_CLIENT_CONFIG,
+    AlternatorWikipediaClient, UnprocessedKeysError, _key_identity, _projection_kwargs, instrument_client,
+)
+from alternator.article_codec import ArticleCodecs, get_codec
+from alternator.bulk_writer import (
+    DEFAULT_MAX_BATCH_BYTES, THROTTLING_ERRORS, WRITE_MAX_RETRIES, BulkWriteResult, _last_of_each_key,
+    _match_unprocessed, _pack_requests, _share_outcomes,
+)
+
+DEFAULT_MAX_CONCURRENCY = 64
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _serialize(item):
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+
+def _deserialize(item):
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+
+def _serialize_request(request):
+    (request_type, body), = request.items()
+    (field, value), = body.items()
+    return {request_type: {field: _serialize(value)}}
+
+
+def _deserialize_request(request):
+    (request_type, body), = request.items()
+    (field, value), = body.items()
+    return {request_type: {field: _deserialize(value)}}
+
+
+async def _backoff_sleep(attempt):
+    await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))))
+
+
+class AsyncAlternatorClient:
+    def __init__(self, endpoint_url, config=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, max_write_retries=WRITE_MAX_RETRIES):
+        """
+        Args:
+            endpoint_url (str): Alternator endpoint, e.g. 'http://localhost:8000'.
+            config (dict, optional): aiobotocore/botocore client options merged into DEFAULT_CLIENT_CONFIG.
+                max_pool_connections defaults to max_concurrency.
+            max_concurrency (int): Maximum number of requests in flight at once.
+            max_batch_bytes (int): Estimated size limit of one batch_write_item, as in BulkWriter.
+            max_write_retries (int): Retries of unprocessed or throttled write requests.
+        The client is opened by 'async with', open() or its first call.
+        """
+        options = dict(DEFAULT_CLIENT_CONFIG, max_pool_connections=max_concurrency)
+        options.update(config or {})
+        self.endpoint_url = endpoint_url
+        self.config = AioConfig(**options)
+        self.max_concurrency = max_concurrency
+        self.max_batch_bytes = max_batch_bytes
+        self.max_write_retries = max_write_retries
+        self.session = get_session()
+        self.client = None
+        self._exit_stack = None
+        self._semaphore = None
+        # Concurrent first calls must not each create a client
+        self._open_lock = asyncio.Lock()
+
+    async def open(self):
+        """
+        Create the underlying aiobotocore client and its connection pool.
+        """
+        async with self._open_lock:
+            if self.client is None:
+                exit_stack = contextlib.AsyncExitStack()
+                client = await exit_stack.enter_async_context(
+                    self.session.create_client('dynamodb', endpoint_url=self.endpoint_url, config=self.config)
+                )
+                instrument_client(client)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._exit_stack, self.client = exit_stack, client
+        return self
+
+    async def close(self):
+        """
+        Close the client and its connections.
+        """
+        async with self._open_lock:
+            if self._exit_stack is not None:
+                await self._exit_stack.aclose()
+            self._exit_stack = None
+            self.client = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _call(self, operation, **kwargs):
+        """
+        Call a DynamoDB API operation within the concurrency budget.
+        """
+        if self.client is None:
+            await self.open()
+        async with self._semaphore:
+            return await getattr(self.client, operation)(**kwargs)
+
+    async def create_table(self, table_name, key_schema, attribute_definitions):
+        """
+        Create a table in Alternator and wait until it exists.
+        Returns:
+            The TableDescription of the new table.
+        """
+        response = await self._call(
+            'create_table',
+            BillingMode='PAY_PER_REQUEST',
+            TableName=table_name,
+            KeySchema=key_schema,
+            AttributeDefinitions=attribute_definitions
+        )
+        waiter = self.client.get_waiter('table_exists')
+        await waiter.wait(TableName=table_name)
+        return response['TableDescription']
+
+    async def add_rows(self, table_name, items, key_names=None):
+        """
+        Add multiple rows (items) to the specified table, writing batches concurrently.
+        See AlternatorClient.add_rows.
+        Returns:
+            BulkWriteResult with the outcome of each item, truthy when all were written.
+        """
+        return await self._write(table_name, 'PutRequest', 'Item', items, key_names)
+
+    async def remove_rows(self, table_name, keys):
+        """
+        Remove multiple rows from the specified table by primary keys.
+        Returns:
+            BulkWriteResult with the outcome of each key, truthy when all were deleted.
+        """
+        return await self._write(table_name, 'DeleteRequest', 'Key', keys, tuple(keys[0]) if keys else None)
+
+    async def _write(self, table_name, request_type, field, values, key_names=None):
+        """
+        Send a 'PutRequest' (field 'Item') or 'DeleteRequest' (field 'Key') per value,
+        as BulkWriter.write does.
+        """
+        result = BulkWriteResult(table_name, len(values))
+        if not values:
+            return result
+        identities, owners = _last_of_each_key(values, key_names)
+        batches = _pack_requests(request_type, field, values, sorted(owners.values()), result, self.max_batch_bytes)
+        await asyncio.gather(*(self._write_batch(table_name, requests, indexes, result)
+                               for requests, indexes in batches))
+        _share_outcomes(result, identities, owners)
+        return result
+
+    async def _write_batch(self, table_name, requests, indexes, result, attempt=0):
+        """
+        Send one batch_write_item and record the outcome of its requests in result.
+        Unprocessed and throttled requests are retried with backoff, a batch failing validation
+        is resent one request at a time.
+        """
+        while True:
+            try:
+                response = await self._call('batch_write_item', RequestItems={
+                    table_name: [_serialize_request(request) for request in requests]})
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code', '')
+                if code in THROTTLING_ERRORS:
+                    reason = code
+                elif code == 'ValidationException' and len(requests) > 1:
+                    await asyncio.gather(*(self._write_batch(table_name, [request], [i], result, attempt)
+                                           for request, i in zip(requests, indexes)))
+                    return
+                elif code == 'ValidationException':
+                    result.errors[indexes[0]] = e.response['Error'].get('Message', code)
+                    return
+                else:
+                    raise
+            else:
+                unprocessed = (response.get('UnprocessedItems') or {}).get(table_name) or []
+                if not unprocessed:
+                    return
+                requests, indexes = _match_unprocessed(
+                    requests, indexes, [_deserialize_request(request) for request in unprocessed])
+                reason = 'unprocessed'
+            if attempt >= self.max_write_retries:
+                for i in indexes:
+                    result.errors[i] = f'{reason} after {attempt} retries'
+                return
+            await _backoff_sleep(attempt)
+            attempt += 1
+
+    async def delete_table(self, table_name):
+        """
+        Delete a table in Alternator and wait until it is gone.
+        """
+        response = await self._call('delete_table', TableName=table_name)
+        waiter = self.client.get_waiter('table_not_exists')
+        await waiter.wait(TableName=table_name)
+        return response
+
+    async def get_rows(self, table_name, keys=None, projection_expression=None, ordered=False,
+                       max_retries=BATCH_MAX_RETRIES):
+        """
+        Retrieve rows by primary key with batch_get_item.
+        Keys are deduplicated and split into 100-key chunks fetched concurrently; UnprocessedKeys
+        are retried with jittered backoff. See AlternatorClient.get_rows.
+        Returns:
+            List of items (rows).
+        """
+        if not keys:
+            return []
+        key_names = list(keys[0].keys())
+        unique_keys = list({_key_identity(key, key_names): key for key in keys}.values())
+        if ordered and projection_expression:
+            projected = [name.strip() for name in projection_expression.split(',')]
+            missing = [name for name in key_names if name not in projected]
+            if missing:
+                projection_expression = ', '.join(projected + missing)
+        chunks = [unique_keys[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(unique_keys), BATCH_GET_MAX_KEYS)]
+        results = await asyncio.gather(*(
+            self._batch_get_chunk(table_name, chunk, projection_expression, max_retries) for chunk in chunks
+        ))
+        items = [item for chunk_items in results for item in chunk_items]
+        if not ordered:
+            return items
+        by_key = {_key_identity(item, key_names): item for item in items}
+        ordered_items = (by_key.get(_key_identity(key, key_names)) for key in unique_keys)
+        return [item for item in ordered_items if item is not None]
+
+    async def _batch_get_chunk(self, table_name, keys, projection_expression, max_retries):
+        request = {'Keys': [_serialize(key) for key in keys]}
+        if projection_expression:
+            request['ProjectionExpression'] = projection_expression
+        request_items = {table_name: request}
+        items = []
+        attempt = 0
+        while request_items:
+            response = await self._call('batch_get_item', RequestItems=request_items)
+            items.extend(_deserialize(item) for item in response['Responses'].get(table_name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items:
+                if attempt >= max_retries:
+                    unprocessed = request_items.get(table_name, {}).get('Keys', [])
+                    raise UnprocessedKeysError(table_name, [_deserialize(key) for key in unprocessed])
+                await _backoff_sleep(attempt)
+                attempt += 1
+        return items
+
+    @staticmethod
+    def _expression_kwargs(kwargs):
+        """
+        Serialize ExpressionAttributeValues given as plain Python values.
+        """
+        values = kwargs.get('ExpressionAttributeValues')
+        if values:
+            kwargs['ExpressionAttributeValues'] = _serialize(values)
+        return kwargs
+
+    async def query_table(self, table_name, key_condition_expression, index_name=None, **kwargs):
+        """
+        Query the specified table. key_condition_expression is either a boto3 condition
+        (e.g. Key('title').eq('X')) or an expression string with ExpressionAttributeValues in kwargs.
+        Returns:
+            List of items (rows) of the first result page, like AlternatorClient.query_table.
+        """
+        query_kwargs = dict(kwargs, TableName=table_name)
+        if isinstance(key_condition_expression, ConditionBase):
+            expression = ConditionExpressionBuilder().build_expression(key_condition_expression, is_key_condition=True)
+            query_kwargs['KeyConditionExpression'] = expression.condition_expression
+            query_kwargs['ExpressionAttributeNames'] = dict(
+                query_kwargs.get('ExpressionAttributeNames', {}), **expression.attribute_name_placeholders)
+            query_kwargs['ExpressionAttributeValues'] = dict(
+                query_kwargs.get('ExpressionAttributeValues', {}), **expression.attribute_value_placeholders)
+        else:
+            query_kwargs['KeyConditionExpression'] = key_condition_expression
+        if index_name:
+            query_kwargs['IndexName'] = index_name
+        response = await self._call('query', **self._expression_kwargs(query_kwargs))
+        return [_deserialize(item) for item in response.get('Items', [])]
+
+    async def scan_page(self, table_name, exclusive_start_key=None, limit=10, attributes=None, **kwargs):
+        """
+        Scan one page of up to limit items. See AlternatorClient.scan_page.
+        Returns:
+            Tuple (items, continuation_key); an empty page (limit <= 0) makes no request and
+            continues at exclusive_start_key.
+        """
+        scan_kwargs = self._expression_kwargs(dict(kwargs, TableName=table_name, **_projection_kwargs(attributes)))
+        items = []
+        last_key = exclusive_start_key
+        # Limit must be positive, so stop before asking for an empty page
+        while len(items) < limit:
+            scan_kwargs['Limit'] = limit - len(items)
+            if last_key:
+                scan_kwargs['ExclusiveStartKey'] = _serialize(last_key)
+            response = await self._call('scan', **scan_kwargs)
+            items.extend(_deserialize(item) for item in response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            last_key = _deserialize(last_key) if last_key else None
+            if not last_key:
+                break
+        return items, last_key
+
+    async def scan_table(self, table_name, total_segments=4, attributes=None, page_size=None,
+                         max_queued_pages=None, **kwargs):
+        """
+        Parallel segmented scan of the whole table as an async generator; one task per segment
+        feeds a bounded queue. See AlternatorClient.scan_table.
+        """
+        pages = asyncio.Queue(maxsize=max_queued_pages or 2 * total_segments)
+        done = object()
+        scan_kwargs = self._expression_kwargs(dict(kwargs, TableName=table_name, **_projection_kwargs(attributes)))
+        if page_size:
+            scan_kwargs['Limit'] = page_size
+
+        async def scan_segment(segment):
+            try:
+                segment_kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+                while True:
+                    response = await self._call('scan', **segment_kwargs)
+                    await pages.put([_deserialize(item) for item in response.get('Items', [])])
+                    last_key = response.get('LastEvaluatedKey')
+                    if not last_key:
+                        break
+                    segment_kwargs['ExclusiveStartKey'] = last_key
+            except Exception as e:
+                await pages.put(e)
+            finally:
+                await pages.put(done)
+
+        tasks = [asyncio.ensure_future(scan_segment(segment)) for segment in range(total_segments)]
+        try:
+            remaining = total_segments
+            while remaining:
+                page = await pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for item in page:
+                        yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncAlternatorWikipediaClient(AsyncAlternatorClient):
+    """
+    Asyncio counterpart of AlternatorWikipediaClient, with the same table layout and method names.
+    """
+    TABLE_NAME = 'wikipedia_articles'
+    KEY_SCHEMA = [
+        {'AttributeName': 'title', 'KeyType': 'HASH'}
+    ]
+    ATTRIBUTE_DEFINITIONS = [
+        {'AttributeName': 'title', 'AttributeType': 'S'}
+    ]
+
+    def __init__(self, endpoint_url, config=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, codec=None,
+                 codec_dictionary=None, **write_options):
+        """
+        codec and codec_dictionary select the compression of written article text, as in
+        AlternatorWikipediaClient; reads always return plain string text. write_options are
+        max_batch_bytes and max_write_retries of AsyncAlternatorClient.
+        """
+        super().__init__(endpoint_url, config, max_concurrency, **write_options)
+        if codec is None or isinstance(codec, str):
+            codec = get_codec(codec, dictionary_path=codec_dictionary)
+        self.codecs = ArticleCodecs(codec)
+
+    async def create_articles_table(self):
+        """
+        Create the Wikipedia articles table if it does not exist.
+        """
+        try:
+            return await self.create_table(self.TABLE_NAME, self.KEY_SCHEMA, self.ATTRIBUTE_DEFINITIONS)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceInUseException':
+                return None
+            raise
+
+    async def _handle_table_not_exists(self, func, *args, **kwargs):
+        """
+        Await func, create the table on ResourceNotFoundException and retry once.
+        """
+        try:
+            return await func(*args, **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                await self.create_articles_table()
+                return await func(*args, **kwargs)
+            raise
+
+    async def _quitely_handle_table_not_exists(self, func, *args, **kwargs):
+        """
+        Await func, return None on ResourceNotFoundException.
+        """
+        try:
+            return await func(*args, **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return None
+            raise
+
+    async def add_article(self, title, text):
+        """
+        Add a single Wikipedia article. Returns a BulkWriteResult, truthy when it was written.
+        """
+        item = self.codecs.encode_item({'title': title, 'text': text})
+        return await self._handle_table_not_exists(self.add_rows, self.TABLE_NAME, [item], key_names=('title',))
+
+    async def add_articles(self, articles):
+        """
+        Add multiple Wikipedia articles (dicts with 'title' and 'text').
+        Returns a BulkWriteResult with the outcome of each article, truthy when all were written.
+        """
+        items = [self.codecs.encode_item({'title': a['title'], 'text': a['text']}) for a in articles]
+        return await self._handle_table_not_exists(self.add_rows, self.TABLE_NAME, items, key_names=('title',))
+
+    async def get_article(self, title):
+        """
+        Retrieve a Wikipedia article by title, or None.
+        """
+        async def get():
+            items = await self.get_rows(self.TABLE_NAME, keys=[{'title': title}])
+            return self.codecs.decode_item(items[0]) if items else None
+        return await self._handle_table_not_exists(get)
+
+    async def get_articles(self, titles):
+        """
+        Retrieve Wikipedia articles by a list of titles, in the order of titles.
+        """
+        async def get():
+            keys = [{'title': t} for t in titles]
+            return self.codecs.decode_items(await self.get_rows(self.TABLE_NAME, keys=keys, ordered=True))
+        return await self._handle_table_not_exists(get)
+
+    async def remove_articles(self, titles):
+        """
+        Remove articles from the database by a list of titles.
+        Returns a BulkWriteResult with the outcome of each title, or None if the table does not exist.
+        """
+        async def remove():
+            keys = [{'title': t} for t in titles]
+            return await self.remove_rows(self.TABLE_NAME, keys)
+        return await self._quitely_handle_table_not_exists(remove)
+
+    async def delete_articles_table(self):
+        """
+        Delete the Wikipedia articles table. Ignore if table does not exist.
+        """
+        return await self._quitely_handle_table_not_exists(self.delete_table, self.TABLE_NAME)
+
+    async def check_articles_exist(self, titles):
+        """
+        Return the titles from the given list that exist in the database.
+        """
+        async def get():
+            keys = [{'title': t} for t in titles]
+            items = await self.get_rows(self.TABLE_NAME, keys=keys, projection_expression='title')
+            return [item['title'] for item in items if 'title' in item]
+        return await self._quitely_handle_table_not_exists(get) or []
+
+    async def get_articles_page_from(self, start_title=None, page_size=10):
+        """
+        Fetch a page of articles starting after start_title (exclusive).
+        """
+        items, _ = await self.get_articles_page(start_title, page_size)
+        return items
+
+    async def get_articles_page(self, start_title=None, page_size=10, attributes=('title', 'text')):
+        """
+        Fetch a page of articles in scan order.
+        Returns:
+            Tuple (articles, next_start_title).
+        """
+        async def get():
+            start_key = {'title': start_title} if start_title else None
+            attrs = AlternatorWikipediaClient._with_codec_attribute(attributes)
+            items, last_key = await self.scan_page(self.TABLE_NAME, start_key, page_size, attrs)
+            return self.codecs.decode_items(items), last_key['title'] if last_key else None
+        return await self._handle_table_not_exists(get)
+
+    async def scan_articles(self, attributes=('title', 'text'), total_segments=4, page_size=None):
+        """
+        Stream all articles with a parallel segmented scan (async generator).
+        """
+        try:
+            attrs = AlternatorWikipediaClient._with_codec_attribute(attributes)
+            async for item in self.scan_table(self.TABLE_NAME, total_segments, attrs, page_size):
+                yield self.codecs.decode_item(item)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+
+    async def query_articles(self, key_condition_expression, **kwargs):
+        """
+        Query the articles table using the OpenSearch index.
+        Returns a list of dicts with 'title' and 'text'.
+        """
+        items = await self.query_table(self.TABLE_NAME, key_condition_expression, index_name="OpenSearch", **kwargs)
+        return [
+            {'title': item.get('title'), 'text': item.get('text')}
+            for item in self.codecs.decode_items(items) if 'title' in item and 'text' in item
+        ]
@@ -2,15 +2,203 @@
 alternator_client.py
 A Python library to wrap boto3 for communicating with ScyllaDB Alternator.
 """
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError
+from alternator.article_codec import CODEC_ATTRIBUTE, ArticleCodecs, get_codec
+from alternator.bulk_writer import BulkWriter
+from alternator.key_mirror import KeyMirror
+from telemetry import metrics
+
+# Defaults for the botocore client: a connection pool large enough for threaded callers,
+# TCP keep-alive, bounded timeouts and adaptive (client-side rate limited) retries.
+DEFAULT_CLIENT_CONFIG = {
+    'max_pool_connections': 50,
+    'tcp_keepalive': True,
+    'connect_timeout': 5,
+    'read_timeout': 60,
+    'retries': {'max_attempts': 10, 'mode': 'adaptive'},
+}
+
+def make_client_config(**overrides):
+    """
+    Build a botocore Config from DEFAULT_CLIENT_CONFIG updated with the given options.
+    Accepts any botocore Config option (e.g. max_pool_connections, read_timeout, retries, region_name).
+    """
+    options = dict(DEFAULT_CLIENT_CONFIG)
+    options.update(overrides)
+    return Config(**options)
+
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_WORKERS = 8
+BATCH_MAX_RETRIES = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5.0
+
+class UnprocessedKeysError(Exception):
+    """
+    Raised when a batch request still has unprocessed keys after all retries.
+    """
+    def __init__(self, table_name, keys):
+        super().__init__(f"{len(keys)} keys of table {table_name} left unprocessed after retries")
+        self.table_name = table_name
+        self.keys = keys
+
+def _key_identity(item, key_names):
+    """
+    Hashable identity of an item or key dict, built from its primary key attributes.
+    """
+    return tuple(item.get(name) for name in key_names)
+
+def _projection_kwargs(attributes):
+    """
+    Build ProjectionExpression kwargs for a list of attribute names. Names go through
+    ExpressionAttributeNames, so reserved words such as 'text' are safe to project.
+    """
+    if not attributes:
+        return {}
+    names = {f'#p{i}': name for i, name in enumerate(attributes)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+def _backoff_sleep(attempt):
+    """
+    Sleep for a full-jitter exponential backoff delay for the given retry attempt.
+    """
+    time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))))
+
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'alternator_request_seconds', 'Latency of Alternator calls, botocore retries included', ('operation',))
+RETRIES = metrics.REGISTRY.counter('alternator_retries_total', 'Retries made by botocore', ('operation',))
+ERRORS = metrics.REGISTRY.counter('alternator_errors_total', 'Failed Alternator calls', ('operation', 'status'))
+UNPROCESSED_ITEMS = metrics.REGISTRY.counter(
+    'alternator_unprocessed_items_total', 'Items or keys returned unprocessed by batch calls', ('operation',))
+MIRROR_LOOKUPS = metrics.REGISTRY.counter(
+    'alternator_key_mirror_lookups_total', 'Titles checked against the key mirror', ('answer',))
+
+def _start_call_timer(context, **kwargs):
+    context['metrics_start'] = time.perf_counter()
+
+def _unprocessed_count(parsed):
+    count = sum(len(requests) for requests in parsed.get('UnprocessedItems', {}).values())
+    return count + sum(len(keys.get('Keys', ())) for keys in parsed.get('UnprocessedKeys', {}).values())
+
+def _record_call(model, context, parsed=None, http_response=None, exception=None, **kwargs):
+    """
+    botocore after-call handler: record the latency, retries, unprocessed items and errors of a call.
+    """
+    start = context.pop('metrics_start', None)
+    operation = model.name
+    if start is not None:
+        metrics.record('dynamodb', time.perf_counter() - start, REQUEST_SECONDS, operation=operation)
+    if parsed is not None:
+        attempts = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if attempts:
+            RETRIES.inc(attempts, operation=operation)
+        unprocessed = _unprocessed_count(parsed)
+        if unprocessed:
+            UNPROCESSED_ITEMS.inc(unprocessed, operation=operation)
+    if exception is not None:
+        ERRORS.inc(operation=operation, status=type(exception).__name__)
+    elif http_response is not None and http_response.status_code >= 300:
+        ERRORS.inc(operation=operation, status=str(http_response.status_code))
+
+def instrument_client(client):
+    """
+    Register the metrics handlers on a botocore DynamoDB client (see telemetry.metrics).
+    """
+    events = client.meta.events
+    events.register('before-call.dynamodb', _start_call_timer, unique_id='alternator-metrics-start')
+    events.register('after-call.dynamodb', _record_call, unique_id='alternator-metrics-record')
+    events.register('after-call-error.dynamodb', _record_call, unique_id='alternator-metrics-error')
 
 class AlternatorClient:
-    def __init__(self, endpoint_url):
-        self.dynamodb = boto3.resource(
+    _shared_instances = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, endpoint_url, config=None, writer_options=None):
+        """
+        Args:
+            endpoint_url (str): Alternator endpoint, e.g. 'http://localhost:8000'.
+            config (botocore.config.Config or dict, optional): Client configuration; a dict is
+                merged into DEFAULT_CLIENT_CONFIG.
+            writer_options (dict, optional): BulkWriter options of add_rows / remove_rows
+                (max_concurrency, initial_concurrency, max_batch_bytes, max_retries, latency_factor).
+        The low-level botocore client (self.client) is thread-safe and shared by all threads.
+        boto3 resources are not, so self.dynamodb is a cheap per-thread resource wrapping
+        that same client and its connection pool. The chunks of get_rows are fetched in one
+        pool of BATCH_GET_WORKERS threads per client, created on first use; close() stops it.
+        """
+        if not isinstance(config, Config):
+            config = make_client_config(**(config or {}))
+        self.endpoint_url = endpoint_url
+        self.config = config
+        self.session = boto3.session.Session()
+        self._resource = self.session.resource(
             'dynamodb',
-            endpoint_url=endpoint_url
+            endpoint_url=endpoint_url,
+            config=config
         )
+        self.client = self._resource.meta.client
+        instrument_client(self.client)
+        self.writer = BulkWriter(self.client, **(writer_options or {}))
+        self._get_pool = None
+        self._get_pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._local.dynamodb = self._resource
+
+    def _batch_get_pool(self):
+        with self._get_pool_lock:
+            if self._get_pool is None:
+                self._get_pool = ThreadPoolExecutor(max_workers=BATCH_GET_WORKERS, thread_name_prefix='batch-get')
+            return self._get_pool
+
+    def close(self):
+        """
+        Stop the thread pools of batch gets and bulk writes; they are recreated if the client
+        is used again.
+        """
+        with self._get_pool_lock:
+            pool, self._get_pool = self._get_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        self.writer.close()
+
+    @property
+    def dynamodb(self):
+        """
+        The boto3 DynamoDB service resource of the calling thread.
+        """
+        resource = getattr(self._local, 'dynamodb', None)
+        if resource is None:
+            resource = self._local.dynamodb = type(self._resource)(client=self.client)
+        return resource
+
+    @classmethod
+    def shared(cls, endpoint_url, **config):
+        """
+        Return a process-wide instance for this endpoint and configuration, creating it on
+        first use. Reusing it keeps the session, resolved credentials and endpoint, and the
+        pool of open connections across requests.
+        """
+        return cls._shared_instance(endpoint_url, config)
+
+    @classmethod
+    def _shared_instance(cls, endpoint_url, config, **options):
+        key = (cls, endpoint_url, repr(sorted(config.items())), repr(sorted(options.items())))
+        with cls._shared_lock:
+            instance = cls._shared_instances.get(key)
+            if instance is None:
+                instance = cls._shared_instances[key] = cls(endpoint_url, config=config, **options)
+            return instance
 
     def create_table(self, table_name, key_schema, attribute_definitions):
         """
@@ -31,21 +219,19 @@ class AlternatorClient:
         table.wait_until_exists()
         return table
 
-    def add_rows(self, table_name, items):
+    def add_rows(self, table_name, items, key_names=None):
         """
-        Add multiple rows (items) to the specified table.
+        Add multiple rows (items) to the specified table, in concurrent batch_write_item calls
+        sized by item count and bytes, with adaptive concurrency (see bulk_writer.BulkWriter).
         Args:
             table_name (str): Name of the table.
             items (list of dict): List of items to add.
+            key_names (list of str, optional): Primary key attributes; items repeating a key
+                replace the earlier ones, which are reported with the outcome of the last.
         Returns:
-            List of responses from DynamoDB.
+            BulkWriteResult with the outcome of each item, truthy when all were written.
         """
-        table = self.dynamodb.Table(table_name)
-        with table.batch_writer() as batch:
-            for item in items:
-                batch.put_item(Item=item)
-        # batch_writer does not return responses for each item, so just return True for success
-        return True
+        return self.writer.put(table_name, items, key_names)
 
     def remove_rows(self, table_name, keys):
         """
@@ -54,14 +240,9 @@ class AlternatorClient:
             table_name (str): Name of the table.
             keys (list of dict): List of primary key dicts to delete.
         Returns:
-            None
+            BulkWriteResult with the outcome of each key, truthy when all were deleted.
         """
-        if not keys:
-            return
-        table = self.dynamodb.Table(table_name)
-        with table.batch_writer() as batch:
-            for key in keys:
-                batch.delete_item(Key=key)
+        return self.writer.delete(table_name, keys)
 
     def delete_table(self, table_name):
         """
@@ -76,26 +257,179 @@ class AlternatorClient:
         table.wait_until_not_exists()
         return response
 
-    def get_rows(self, table_name, keys=None, projection_expression=None):
+    def get_rows(self, table_name, keys=None, projection_expression=None, ordered=False,
+                 max_workers=BATCH_GET_WORKERS, max_retries=BATCH_MAX_RETRIES):
         """
         Retrieve rows from the specified table.
         If keys is provided, use batch_get_item for efficient retrieval of multiple items by primary key.
         Optionally, use projection_expression to fetch only specific columns.
+        Keys are deduplicated and split into chunks of at most 100 keys (the batch_get_item limit);
+        chunks are fetched concurrently and UnprocessedKeys are retried with jittered backoff.
         Args:
             table_name (str): Name of the table.
             keys (list of dict, optional): List of primary key dicts for batch retrieval.
             projection_expression (str, optional): Columns to fetch (e.g., 'title').
+            ordered (bool): Return items in the order of keys (missing items are skipped).
+            max_workers (int): Maximum number of chunks of this call fetched in parallel, in the
+                client's pool of BATCH_GET_WORKERS threads shared by all calls.
+            max_retries (int): Retries of unprocessed keys per chunk before giving up.
         Returns:
             List of items (rows).
+        Raises:
+            UnprocessedKeysError: If some keys are still unprocessed after max_retries retries.
         """
         if keys is None or not keys:
             return []
+        key_names = list(keys[0].keys())
+        unique_keys = list({_key_identity(key, key_names): key for key in keys}.values())
+        if ordered and projection_expression:
+            projected = [name.strip() for name in projection_expression.split(',')]
+            missing = [name for name in key_names if name not in projected]
+            if missing:
+                projection_expression = ', '.join(projected + missing)
+        chunks = [unique_keys[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(unique_keys), BATCH_GET_MAX_KEYS)]
+        fetch = lambda chunk: self._batch_get_chunk(table_name, chunk, projection_expression, max_retries)
+        if len(chunks) == 1 or max_workers <= 1:
+            results = [fetch(chunk) for chunk in chunks]
+        else:
+            pool = self._batch_get_pool()
+            fetch = metrics.propagate(fetch)
+            results = []
+            in_flight = deque()
+            try:
+                for chunk in chunks:
+                    if len(in_flight) >= max_workers:
+                        results.append(in_flight.popleft().result())
+                    in_flight.append(pool.submit(fetch, chunk))
+                while in_flight:
+                    results.append(in_flight.popleft().result())
+            finally:
+                for future in in_flight:
+                    future.cancel()
+        items = [item for chunk_items in results for item in chunk_items]
+        if not ordered:
+            return items
+        by_key = {_key_identity(item, key_names): item for item in items}
+        ordered_items = (by_key.get(_key_identity(key, key_names)) for key in unique_keys)
+        return [item for item in ordered_items if item is not None]
+
+    def _batch_get_chunk(self, table_name, keys, projection_expression, max_retries):
+        """
+        Fetch one chunk of at most 100 keys, retrying UnprocessedKeys with full-jitter
+        exponential backoff.
+        """
         request = {'Keys': keys}
         if projection_expression:
             request['ProjectionExpression'] = projection_expression
         request_items = {table_name: request}
-        response = self.dynamodb.meta.client.batch_get_item(RequestItems=request_items)
-        return response['Responses'].get(table_name, [])
+        items = []
+        attempt = 0
+        while request_items:
+            response = self.client.batch_get_item(RequestItems=request_items)
+            items.extend(response['Responses'].get(table_name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items:
+                if attempt >= max_retries:
+                    unprocessed = request_items.get(table_name, {}).get('Keys', [])
+                    raise UnprocessedKeysError(table_name, unprocessed)
+                _backoff_sleep(attempt)
+                attempt += 1
+        return items
+
+    def scan_page(self, table_name, exclusive_start_key=None, limit=10, attributes=None, **kwargs):
+        """
+        Scan one page of up to limit items, following LastEvaluatedKey until the page is
+        full or the table is exhausted.
+        Args:
+            table_name (str): Name of the table.
+            exclusive_start_key (dict, optional): Key to continue after (a previous continuation key).
+            limit (int): Maximum number of items to return.
+            attributes (list of str, optional): Attributes to project, e.g. ['title'].
+            **kwargs: Additional arguments to pass to the scan.
+        Returns:
+            Tuple (items, continuation_key); continuation_key is None when the scan is complete.
+            An empty page (limit <= 0) makes no request and continues at exclusive_start_key.
+        """
+        table = self.dynamodb.Table(table_name)
+        scan_kwargs = dict(kwargs, **_projection_kwargs(attributes))
+        items = []
+        last_key = exclusive_start_key
+        # Limit must be positive, so stop before asking for an empty page
+        while len(items) < limit:
+            scan_kwargs['Limit'] = limit - len(items)
+            if last_key:
+                scan_kwargs['ExclusiveStartKey'] = last_key
+            response = table.scan(**scan_kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+        return items, last_key
+
+    def scan_table(self, table_name, total_segments=4, attributes=None, page_size=None, max_queued_pages=None, **kwargs):
+        """
+        Parallel segmented scan of the whole table.
+        Each of total_segments segments is scanned by its own thread (DynamoDB Segment/TotalSegments),
+        following LastEvaluatedKey to the end of the segment. Pages are handed over through a
+        bounded queue, so memory stays bounded however large the table is.
+        Args:
+            table_name (str): Name of the table.
+            total_segments (int): Number of parallel segments.
+            attributes (list of str, optional): Attributes to project, e.g. ['title'].
+            page_size (int, optional): Limit of items per scan request.
+            max_queued_pages (int, optional): Pages buffered between scanners and the consumer
+                (default: 2 per segment).
+            **kwargs: Additional arguments to pass to each scan.
+        Yields:
+            Items, in no particular order.
+        """
+        pages = queue.Queue(maxsize=max_queued_pages or 2 * total_segments)
+        stop = threading.Event()
+        done = object()
+        scan_kwargs = dict(kwargs, **_projection_kwargs(attributes))
+        if page_size:
+            scan_kwargs['Limit'] = page_size
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def scan_segment(segment):
+            try:
+                table = self.dynamodb.Table(table_name)
+                segment_kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+                while not stop.is_set():
+                    response = table.scan(**segment_kwargs)
+                    put(response.get('Items', []))
+                    last_key = response.get('LastEvaluatedKey')
+                    if not last_key:
+                        break
+                    segment_kwargs['ExclusiveStartKey'] = last_key
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        threads = [threading.Thread(target=scan_segment, args=(segment,), daemon=True)
+                   for segment in range(total_segments)]
+        for thread in threads:
+            thread.start()
+        try:
+            remaining = total_segments
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            stop.set()
 
     def query_table(self, table_name, key_condition_expression, index_name=None, **kwargs):
         """
@@ -121,7 +455,10 @@ class AlternatorClient:
 class AlternatorWikipediaClient(AlternatorClient):
     """
     Specialized client for a Wikipedia articles table in Alternator.
-    The table has a string primary key 'title' and a string column 'text'.
+    The table has a string primary key 'title' and a column 'text'. With a codec, 'text' is
+    written as a compressed binary attribute next to a 'codec' attribute (see article_codec);
+    all read methods return plain string text either way. With a key mirror (see key_mirror),
+    articles are also written with a 'size' attribute, the UTF-8 size of their text.
     """
     TABLE_NAME = 'wikipedia_articles'
     KEY_SCHEMA = [
@@ -130,6 +467,49 @@ class AlternatorWikipediaClient(AlternatorClient):
     ATTRIBUTE_DEFINITIONS = [
         {'AttributeName': 'title', 'AttributeType': 'S'}
     ]
+    SIZE_ATTRIBUTE = 'size'
+
+    def __init__(self, endpoint_url, config=None, codec=None, codec_dictionary=None, writer_options=None,
+                 key_mirror=None):
+        """
+        Args:
+            endpoint_url (str): Alternator endpoint, e.g. 'http://localhost:8000'.
+            config (botocore.config.Config or dict, optional): Client configuration.
+            codec (str or codec, optional): Compression of written article text, 'zlib' or 'zstd'
+                (or a codec object from article_codec). None stores plain text.
+            codec_dictionary (str, optional): Path of a trained zstd dictionary.
+            writer_options (dict, optional): BulkWriter options, see AlternatorClient.
+            key_mirror (KeyMirror, str or dict, optional): Local mirror of the table's titles and
+                article sizes answering check_articles_exist and titles-only pages; a str is the
+                path of its SQLite file, a dict the KeyMirror arguments.
+        """
+        super().__init__(endpoint_url, config, writer_options)
+        if codec is None or isinstance(codec, str):
+            codec = get_codec(codec, dictionary_path=codec_dictionary)
+        self.codecs = ArticleCodecs(codec)
+        if isinstance(key_mirror, str):
+            key_mirror = KeyMirror(key_mirror)
+        elif isinstance(key_mirror, dict):
+            key_mirror = KeyMirror(**key_mirror)
+        self.key_mirror = key_mirror
+
+    @classmethod
+    def shared(cls, endpoint_url, codec=None, codec_dictionary=None, writer_options=None, key_mirror=None, **config):
+        """
+        Return the process-wide instance for this endpoint, configuration, codec and key mirror.
+        """
+        return cls._shared_instance(endpoint_url, config, codec=codec, codec_dictionary=codec_dictionary,
+                                    writer_options=writer_options, key_mirror=key_mirror)
+
+    @staticmethod
+    def _with_codec_attribute(attributes):
+        """
+        Projected attributes plus the codec attribute, needed to decode a projected 'text'.
+        """
+        attributes = list(attributes)
+        if 'text' in attributes and CODEC_ATTRIBUTE not in attributes:
+            attributes.append(CODEC_ATTRIBUTE)
+        return attributes
 
     def create_articles_table(self):
         """
@@ -180,21 +560,34 @@ class AlternatorWikipediaClient(AlternatorClient):
             else:
                 raise
 
+    def _encode_article(self, article):
+        item = {'title': article['title'], 'text': article['text']}
+        if self.key_mirror is not None:
+            item[self.SIZE_ATTRIBUTE] = len(article['text'].encode('utf-8'))
+        return self.codecs.encode_item(item)
+
+    def _write_articles(self, items):
+        result = self._handle_table_not_exists(self.add_rows, self.TABLE_NAME, items, key_names=('title',))
+        if self.key_mirror is not None:
+            self.key_mirror.add((item['title'], item[self.SIZE_ATTRIBUTE])
+                                for item, ok in zip(items, result) if ok)
+        return result
+
     def add_article(self, title, text):
         """
-        Add a single Wikipedia article.
+        Add a single Wikipedia article. Returns a BulkWriteResult, truthy when it was written.
         """
-        item = {'title': title, 'text': text}
-        return self._handle_table_not_exists(self.add_rows, self.TABLE_NAME, [item])
+        return self._write_articles([self._encode_article({'title': title, 'text': text})])
 
     def add_articles(self, articles):
         """
         Add multiple Wikipedia articles.
         Args:
             articles (list of dict): Each dict must have 'title' and 'text'.
+        Returns:
+            BulkWriteResult with the outcome of each article, truthy when all were written.
         """
-        items = [{'title': a['title'], 'text': a['text']} for a in articles]
-        return self._handle_table_not_exists(self.add_rows, self.TABLE_NAME, items)
+        return self._write_articles([self._encode_article(a) for a in articles])
 
     def get_article(self, title):
         """
@@ -202,7 +595,7 @@ class AlternatorWikipediaClient(AlternatorClient):
         """
         def get():
             items = self.get_rows(self.TABLE_NAME, keys=[{'title': title}])
-            return items[0] if items else None
+            return self.codecs.decode_item(items[0]) if items else None
         return self._handle_table_not_exists(get)
 
     def get_articles(self, titles):
@@ -211,11 +604,11 @@ class AlternatorWikipediaClient(AlternatorClient):
         Args:
             titles (list of str): List of article titles to retrieve.
         Returns:
-            List of article items.
+            List of article items, in the order of titles (missing articles are skipped).
         """
         def get():
             keys = [{'title': t} for t in titles]
-            return self.get_rows(self.TABLE_NAME, keys=keys)
+            return self.codecs.decode_items(self.get_rows(self.TABLE_NAME, keys=keys, ordered=True))
         return self._handle_table_not_exists(get)
 
     def remove_articles(self, titles):
@@ -224,12 +617,15 @@ class AlternatorWikipediaClient(AlternatorClient):
         Args:
             titles (list of str): List of article titles to remove.
         Returns:
-            None
+            BulkWriteResult with the outcome of each title, or None if the table does not exist.
         """
         def remove():
             keys = [{'title': t} for t in titles]
             return self.remove_rows(self.TABLE_NAME, keys)
-        return self._quitely_handle_table_not_exists(remove)
+        result = self._quitely_handle_table_not_exists(remove)
+        if self.key_mirror is not None:
+            self.key_mirror.remove(titles if result is None else [t for t, ok in zip(titles, result) if ok])
+        return result
 
     def delete_articles_table(self):
         """
@@ -237,22 +633,40 @@ class AlternatorWikipediaClient(AlternatorClient):
         """
         def delete():
             return self.delete_table(self.TABLE_NAME)
-        return self._quitely_handle_table_not_exists(delete)
+        result = self._quitely_handle_table_not_exists(delete)
+        if self.key_mirror is not None:
+            self.key_mirror.clear()
+        return result
 
     def check_articles_exist(self, titles):
         """
         Check which articles from the given list of titles exist in the database.
         Only returns the list of existing titles, does not fetch the text column.
+        With a ready key mirror, titles it does not know are reported missing without a
+        request; the others are confirmed with Alternator unless the mirror's confirm_hits
+        is off.
         Args:
             titles (list of str): List of article titles to check.
         Returns:
             List of titles that exist in the database.
         """
+        if self.key_mirror is not None and self.key_mirror.ready:
+            found = self.key_mirror.contains(titles)
+            MIRROR_LOOKUPS.inc(len(found), answer='hit')
+            MIRROR_LOOKUPS.inc(len(titles) - len(found), answer='miss')
+            titles = found
+            if not titles or not self.key_mirror.confirm_hits:
+                return titles
+
         def get():
             keys = [{'title': t} for t in titles]
             items = self.get_rows(self.TABLE_NAME, keys=keys, projection_expression='title')
             return [item['title'] for item in items if 'title' in item]
-        return self._quitely_handle_table_not_exists(get) or []
+        existing = self._quitely_handle_table_not_exists(get) or []
+        if self.key_mirror is not None and self.key_mirror.ready and len(existing) < len(set(titles)):
+            # Removed by a writer without the mirror: drop the stale hits
+            self.key_mirror.remove(set(titles).difference(existing))
+        return existing
 
     def get_articles_page_from(self, start_title=None, page_size=10):
         """
@@ -263,18 +677,66 @@ class AlternatorWikipediaClient(AlternatorClient):
         Returns:
             List of article items (dicts with 'title' and 'text').
         """
+        items, _ = self.get_articles_page(start_title, page_size)
+        return items
+
+    def get_articles_page(self, start_title=None, page_size=10, attributes=('title', 'text')):
+        """
+        Fetch a page of articles in table scan order, continuing after start_title.
+        Titles-only pages are served from a ready key mirror instead, in title order and with
+        the 'size' of each article.
+        Args:
+            start_title (str or None): Continuation key of the previous page (exclusive). If None, starts from the beginning.
+            page_size (int): Number of articles to fetch.
+            attributes (tuple of str): Attributes to fetch, e.g. ('title',) to skip the text.
+        Returns:
+            Tuple (articles, next_start_title); next_start_title is None on the last page.
+        """
+        if tuple(attributes) == ('title',) and self.key_mirror is not None and self.key_mirror.ready:
+            rows, next_start_title = self.key_mirror.page(start_title, page_size)
+            return [{'title': title, self.SIZE_ATTRIBUTE: size} for title, size in rows], next_start_title
+
         def get():
-            table = self.dynamodb.Table(self.TABLE_NAME)
-            scan_kwargs = {
-                'ProjectionExpression': 'title, text',
-                'Limit': page_size
-            }
-            if start_title:
-                scan_kwargs['ExclusiveStartKey'] = {'title': start_title}
-            response = table.scan(**scan_kwargs)
-            return response.get('Items', [])
+            start_key = {'title': start_title} if start_title else None
+            items, last_key = self.scan_page(self.TABLE_NAME, start_key, page_size, self._with_codec_attribute(attributes))
+            return self.codecs.decode_items(items), last_key['title'] if last_key else None
         return self._handle_table_not_exists(get)
 
+    def scan_articles(self, attributes=('title', 'text'), total_segments=4, page_size=None):
+        """
+        Stream all articles using a parallel segmented scan (see AlternatorClient.scan_table).
+        Args:
+            attributes (tuple of str): Attributes to fetch, e.g. ('title',) for titles only.
+            total_segments (int): Number of segments scanned in parallel.
+            page_size (int, optional): Limit of items per scan request.
+        Yields:
+            Article items, in no particular order.
+        """
+        try:
+            items = self.scan_table(self.TABLE_NAME, total_segments, self._with_codec_attribute(attributes), page_size)
+            for item in items:
+                yield self.codecs.decode_item(item)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+
+    def rebuild_key_mirror(self, total_segments=4, page_size=None):
+        """
+        Rebuild the key mirror from a titles-only (title and size) parallel scan of the table.
+        Returns the number of titles in the mirror, or None when another process is already
+        rebuilding it. Raises ValueError when the client has no key mirror.
+        """
+        if self.key_mirror is None:
+            raise ValueError('no key mirror configured')
+        started_at = self.key_mirror.begin_rebuild()
+        if started_at is None:
+            return None
+        items = self.scan_articles(('title', self.SIZE_ATTRIBUTE), total_segments, page_size)
+        # Numbers are scanned as Decimal; articles written without a mirror have no size
+        rows = ((item['title'], int(item[self.SIZE_ATTRIBUTE]) if self.SIZE_ATTRIBUTE in item else None)
+                for item in items)
+        return self.key_mirror.finish_rebuild(started_at, rows)
+
     def query_articles(self, key_condition_expression, **kwargs):
         """
         Query the Wikipedia articles table using the OpenSearch index and a KeyConditionExpression string.
@@ -294,5 +756,5 @@ class AlternatorWikipediaClient(AlternatorClient):
         # Only return dicts with 'title' and 'text' keys
         return [
             {'title': item.get('title'), 'text': item.get('text')}
-            for item in items if 'title' in item and 'text' in item
+            for item in self.codecs.decode_items(items) if 'title' in item and 'text' in item
         ]
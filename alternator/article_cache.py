@@ -0,0 +1,412 @@
+"""
+article_cache.py
+Read-through / write-through cache in front of AlternatorWikipediaClient.
+
+CachingAlternatorWikipediaClient wraps a client and keeps three caches:
+    articles - get_article/get_articles results by title, including negative entries for
+               titles that do not exist;
+    exists   - existence only, serving check_articles_exist without fetching any text;
+    queries  - query_articles results, dropped on every write.
+Writes through the wrapper (add_article(s), remove_articles, delete_articles_table) update or
+invalidate the cached entries: written articles are marked as existing and read back on the next
+lookup, so cached articles always match what get_article returns; entries of items the write
+reports as failed are dropped.
+Entries expire after a TTL, so changes made by other clients become visible after at most
+that long.
+
+Two storage backends are available: TTLCache, an in-process LRU bounded by bytes, and
+SqliteTTLCache, a SQLite file shared by all processes (e.g. Flask/gunicorn workers) on a host,
+so invalidations made by one worker are seen by the others.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from alternator.bulk_writer import BulkWriteResult
+
+MISSING = object()
+
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_NEGATIVE_TTL_SECONDS = 10.0
+
+
+def estimate_size(key, value) -> int:
+    """
+    Rough memory footprint of a cached key and value (article dicts, lists of them, bools, None).
+    """
+    size = 64 + len(key)
+    if isinstance(value, dict):
+        value = [value]
+    if isinstance(value, list):
+        for item in value:
+            size += 64 + sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in item.values())
+    return size
+
+
+def _json_default(value):
+    """
+    JSON encoding of the values boto3 reads back that json does not know: numbers come as Decimal.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _written_flags(result, count):
+    """
+    Per-item success of a write: a BulkWriteResult has its own, any other result (e.g. of a
+    stand-in client) counts as success for every item.
+    """
+    if isinstance(result, BulkWriteResult):
+        return list(result)
+    return [True] * count
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry expiry and LRU eviction, bounded by the total
+    estimated size of the values and by the number of entries.
+    get returns MISSING for absent or expired keys, so None can be cached as a value.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entries: int = 100000, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, ttl: float = None):
+        size = estimate_size(key, value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self.current_bytes += size
+            while self._entries and (self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SqliteTTLCache:
+    """
+    TTLCache with the same interface, stored in a SQLite database that several processes can
+    share. Values are stored as JSON. Once the stored values exceed max_bytes, the entries
+    closest to expiry are evicted. Hit/miss counters are per process.
+    """
+
+    def __init__(self, path: str, namespace: str, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = DEFAULT_TTL_SECONDS, evict_check_interval: int = 100):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict_check_interval = evict_check_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' namespace TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' value TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' expires REAL NOT NULL,'
+            ' PRIMARY KEY (namespace, key))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (namespace, expires)')
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires > ?',
+            (self.namespace, key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl: float = None):
+        data = json.dumps(value, default=_json_default)
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, size, expires) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, data, len(data) + len(key), expires)
+            )
+        with self._lock:
+            self._puts += 1
+            check = self._puts % self.evict_check_interval == 0
+        if check:
+            self._evict()
+
+    def _evict(self):
+        conn = self._connection()
+        with conn:
+            deleted = conn.execute('DELETE FROM cache WHERE namespace = ? AND expires <= ?',
+                                   (self.namespace, time.time())).rowcount
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?',
+                                 (self.namespace,)).fetchone()[0]
+            for key, size in conn.execute('SELECT key, size FROM cache WHERE namespace = ? ORDER BY expires',
+                                          (self.namespace,)).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+                total -= size
+                deleted += 1
+        with self._lock:
+            self.evictions += deleted
+
+    def delete(self, keys):
+        conn = self._connection()
+        with conn:
+            conn.executemany('DELETE FROM cache WHERE namespace = ? AND key = ?',
+                             [(self.namespace, key) for key in keys])
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires > ?', (self.namespace, time.time())
+        ).fetchone()[0]
+
+    def stats(self) -> dict:
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ? AND expires > ?',
+            (self.namespace, time.time())
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachingAlternatorWikipediaClient:
+    """
+    AlternatorWikipediaClient with article, existence and query caches in front of it.
+    Methods that are not cached are forwarded to the wrapped client unchanged.
+    Args:
+        client (AlternatorWikipediaClient): The client to wrap.
+        ttl (float): Seconds a cached article or existence flag stays valid.
+        negative_ttl (float): Seconds a "does not exist" entry stays valid.
+        max_bytes (int): Size bound of the article cache (the other caches get a fraction).
+        shared_path (str, optional): SQLite file to share the caches between processes;
+            in-process caches are used when None.
+    """
+
+    def __init__(self, client, ttl=DEFAULT_TTL_SECONDS, negative_ttl=DEFAULT_NEGATIVE_TTL_SECONDS,
+                 max_bytes=32 * 1024 * 1024, shared_path=None):
+        self.client = client
+        self.negative_ttl = negative_ttl
+        if shared_path:
+            self.articles = SqliteTTLCache(shared_path, 'articles', max_bytes, ttl)
+            self.exists = SqliteTTLCache(shared_path, 'exists', max_bytes // 8, ttl)
+            self.queries = SqliteTTLCache(shared_path, 'queries', max_bytes // 4, ttl)
+        else:
+            self.articles = TTLCache(max_bytes, ttl=ttl)
+            self.exists = TTLCache(max_bytes // 8, ttl=ttl)
+            self.queries = TTLCache(max_bytes // 4, ttl=ttl)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _store_article(self, title, article):
+        if article is None:
+            self.articles.put(title, None, self.negative_ttl)
+            self.exists.put(title, False, self.negative_ttl)
+        else:
+            self.articles.put(title, article)
+            self.exists.put(title, True)
+
+    def _written_article(self, title):
+        # The stored item may hold more than title and text (e.g. the size written with a key
+        # mirror): the next read fetches it, only its existence is known
+        self.articles.delete([title])
+        self.exists.put(title, True)
+
+    def _forget_article(self, title):
+        # The write failed, the stored state is unknown
+        self.articles.delete([title])
+        self.exists.delete([title])
+
+    def get_article(self, title):
+        """
+        Retrieve an article by title, from the cache when possible.
+        """
+        article = self.articles.get(title)
+        if article is MISSING:
+            article = self.client.get_article(title)
+            self._store_article(title, article)
+        return article
+
+    def get_articles(self, titles):
+        """
+        Retrieve articles by a list of titles, in the order of titles (missing articles are
+        skipped). Only titles not in the cache are fetched.
+        """
+        cached = {title: self.articles.get(title) for title in dict.fromkeys(titles)}
+        missing = [title for title, article in cached.items() if article is MISSING]
+        if missing:
+            fetched = {article['title']: article for article in self.client.get_articles(missing)}
+            for title in missing:
+                cached[title] = fetched.get(title)
+                self._store_article(title, cached[title])
+        return [cached[title] for title in titles if cached[title] is not None]
+
+    def check_articles_exist(self, titles):
+        """
+        Return the titles from the given list that exist, asking Alternator only about titles
+        not in the existence cache.
+        """
+        known = {title: self.exists.get(title) for title in dict.fromkeys(titles)}
+        unknown = [title for title, exists in known.items() if exists is MISSING]
+        if unknown:
+            existing = set(self.client.check_articles_exist(unknown))
+            for title in unknown:
+                known[title] = title in existing
+                self.exists.put(title, known[title], None if known[title] else self.negative_ttl)
+        return [title for title in known if known[title]]
+
+    def query_articles(self, key_condition_expression, **kwargs):
+        """
+        Query articles (see AlternatorWikipediaClient.query_articles), caching the results.
+        """
+        key = json.dumps([key_condition_expression, kwargs], sort_keys=True, default=str)
+        articles = self.queries.get(key)
+        if articles is MISSING:
+            articles = self.client.query_articles(key_condition_expression, **kwargs)
+            self.queries.put(key, articles)
+        return articles
+
+    def add_article(self, title, text):
+        result = self.client.add_article(title, text)
+        if _written_flags(result, 1)[0]:
+            self._written_article(title)
+        else:
+            self._forget_article(title)
+        self.queries.clear()
+        return result
+
+    def add_articles(self, articles):
+        result = self.client.add_articles(articles)
+        for article, ok in zip(articles, _written_flags(result, len(articles))):
+            if ok:
+                self._written_article(article['title'])
+            else:
+                self._forget_article(article['title'])
+        self.queries.clear()
+        return result
+
+    def remove_articles(self, titles):
+        result = self.client.remove_articles(titles)
+        for title, ok in zip(titles, _written_flags(result, len(titles))):
+            if ok:
+                self._store_article(title, None)
+            else:
+                self._forget_article(title)
+        self.queries.clear()
+        return result
+
+    def delete_articles_table(self):
+        result = self.client.delete_articles_table()
+        self.clear()
+        return result
+
+    def clear(self):
+        """
+        Drop all cached entries.
+        """
+        self.articles.clear()
+        self.exists.clear()
+        self.queries.clear()
+
+    def cache_stats(self) -> dict:
+        """
+        Return the statistics of the article, existence and query caches.
+        """
+        return {
+            'articles': self.articles.stats(),
+            'exists': self.exists.stats(),
+            'queries': self.queries.stats(),
+        }
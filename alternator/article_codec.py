@@ -0,0 +1,163 @@
+"""
+article_codec.py
+Compressed storage of article text in Alternator.
+
+With a codec, the 'text' attribute is stored as a compressed binary attribute and the item gets a
+'codec' attribute naming how it was compressed. Items without a 'codec' attribute hold plain
+string text, so tables with a mix of compressed and uncompressed articles read back fine.
+
+zstd support (optionally with a shared dictionary trained on a dump sample) needs the
+'zstandard' package; zlib works out of the box.
+
+Train a dictionary:
+    python -m alternator.article_codec DUMP.xml.bz2 INDEX.bin OUTPUT.dict --samples 10000
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ATTRIBUTE = 'codec'
+
+
+class ZlibCodec:
+    """
+    zlib (deflate) compression of article text.
+    """
+    def __init__(self, level=6):
+        self.level = level
+        self.name = 'zlib'
+
+    def encode(self, text):
+        return zlib.compress(text.encode('utf-8'), self.level)
+
+    def decode(self, data):
+        return zlib.decompress(data).decode('utf-8')
+
+
+class ZstdCodec:
+    """
+    zstd compression of article text, optionally with a shared dictionary.
+    The codec name records the dictionary id ('zstd:d<id>'), so readers can tell which
+    dictionary an item needs.
+    """
+    def __init__(self, level=3, dictionary=None):
+        if zstandard is None:
+            raise ImportError("The 'zstandard' package is required for the zstd codec")
+        self.level = level
+        self.dictionary = zstandard.ZstdCompressionDict(dictionary) if isinstance(dictionary, bytes) else dictionary
+        if self.dictionary is not None:
+            self.name = f'zstd:d{self.dictionary.dict_id()}'
+            self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+        else:
+            self.name = 'zstd'
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, text):
+        return self._compressor.compress(text.encode('utf-8'))
+
+    def decode(self, data):
+        return self._decompressor.decompress(data).decode('utf-8')
+
+
+def get_codec(name, level=None, dictionary_path=None):
+    """
+    Build a codec by name ('zlib' or 'zstd'); returns None for name None or 'none'.
+    dictionary_path: zstd dictionary file written by train_zstd_dictionary.
+    """
+    if name is None or name == 'none':
+        return None
+    if name == 'zlib':
+        return ZlibCodec(level if level is not None else 6)
+    if name == 'zstd':
+        dictionary = None
+        if dictionary_path:
+            with open(dictionary_path, 'rb') as f:
+                dictionary = f.read()
+        return ZstdCodec(level if level is not None else 3, dictionary)
+    raise ValueError(f"Unknown article codec: {name}")
+
+
+def train_zstd_dictionary(texts, dict_size=112640):
+    """
+    Train a zstd dictionary on a sample of article texts. Returns the dictionary as bytes.
+    """
+    if zstandard is None:
+        raise ImportError("The 'zstandard' package is required for the zstd codec")
+    samples = [text.encode('utf-8') for text in texts if text]
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+
+class ArticleCodecs:
+    """
+    The codec used for writes plus every codec known for reads.
+    zlib and plain zstd can always be decoded (zstd if installed); dictionary codecs only when
+    the dictionary was configured.
+    """
+    def __init__(self, codec=None):
+        self.codec = codec
+        self.decoders = {'zlib': ZlibCodec()}
+        if zstandard is not None:
+            self.decoders['zstd'] = ZstdCodec()
+        if codec is not None:
+            self.decoders[codec.name] = codec
+
+    def encode_item(self, item):
+        """
+        Return a copy of an article item with compressed text and the codec attribute set.
+        Items are returned unchanged when no codec is configured.
+        """
+        if self.codec is None or not isinstance(item.get('text'), str):
+            return item
+        encoded = dict(item)
+        encoded['text'] = self.codec.encode(item['text'])
+        encoded[CODEC_ATTRIBUTE] = self.codec.name
+        return encoded
+
+    def decode_item(self, item):
+        """
+        Return an article item with plain string text, decompressing it if the item has a
+        codec attribute. The codec attribute is removed.
+        """
+        if item is None or CODEC_ATTRIBUTE not in item:
+            return item
+        decoded = dict(item)
+        name = decoded.pop(CODEC_ATTRIBUTE)
+        if 'text' in decoded:
+            data = decoded['text']
+            data = data.value if hasattr(data, 'value') else bytes(data)
+            try:
+                decoder = self.decoders[name]
+            except KeyError:
+                raise ValueError(f"No decoder configured for article codec '{name}'")
+            decoded['text'] = decoder.decode(data)
+        return decoded
+
+    def decode_items(self, items):
+        return [self.decode_item(item) for item in items]
+
+
+if __name__ == '__main__':
+    import argparse
+    import itertools
+    from wikipedia.multistream import WikipediaMultistreamReader
+    parser = argparse.ArgumentParser(description='Train a zstd dictionary for article storage')
+    parser.add_argument('dump', help='Path to the multistream .xml.bz2 dump')
+    parser.add_argument('index', help='Path to the binary index')
+    parser.add_argument('output', help='Dictionary output path')
+    parser.add_argument('--samples', type=int, default=10000, help='Number of articles to sample')
+    parser.add_argument('--size', type=int, default=112640, help='Dictionary size in bytes')
+    args = parser.parse_args()
+    reader = WikipediaMultistreamReader(args.dump, args.index)
+    index_size = len(reader.get_binary_index())
+    step = max(1, index_size // args.samples)
+    texts = []
+    for position in itertools.islice(range(0, index_size, step), args.samples):
+        texts.extend(text for _, text in reader.list_articles_by_index(position, 1))
+    with open(args.output, 'wb') as f:
+        f.write(train_zstd_dictionary(texts, args.size))
+    print(f"Dictionary trained on {len(texts)} articles written to {args.output}")
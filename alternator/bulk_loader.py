@@ -0,0 +1,378 @@
+"""
+bulk_loader.py
+Bulk ingest of a Wikipedia multistream dump into the Alternator articles table.
+
+The load runs as a three stage pipeline connected by bounded queues:
+    read   - one thread walking the dump with WikipediaMultistreamReader.iter_pages,
+             producing batches of raw wikitext articles;
+    strip  - a process pool converting wikitext to plain text (mwparserfromhell by default,
+             see wikipedia.text_conversion), optionally through a persistent text cache;
+    write  - several threads, each with its own client, writing batches with add_articles.
+Bounded queues give backpressure: a slow stage blocks the stages before it instead of
+letting batches pile up in memory. Progress is checkpointed as the index position below
+which every article has been written, so an interrupted load can resume from there.
+Pages of dump streams that cannot be read completely (corrupt or truncated) are reported as
+failed_streams, and the checkpoint stays before the first of them, so a resumed load retries them.
+
+Usage:
+    python -m alternator.bulk_loader DUMP.xml.bz2 INDEX.bin --endpoint-url http://localhost:8000
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from alternator.alternator_client import AlternatorWikipediaClient
+from alternator.bulk_writer import BulkWriteResult
+from wikipedia.multistream import WikipediaMultistreamReader
+from wikipedia.text_conversion import CONVERTERS, StrippedTextCache, TextConverter
+
+_DONE = object()
+
+# Text converters of the strip worker processes, keyed by (converter, text cache path)
+_worker_converters = {}
+
+
+def _strip_batch(batch, converter='mwparserfromhell', text_cache_path=None):
+    """
+    Process pool worker: convert the wikitext of a batch to plain text.
+    """
+    seq, first_position, end_position, articles = batch
+    text_converter = _worker_converters.get((converter, text_cache_path))
+    if text_converter is None:
+        cache = StrippedTextCache(text_cache_path) if text_cache_path else None
+        text_converter = _worker_converters[(converter, text_cache_path)] = TextConverter(converter, cache)
+    stripped = [
+        {'title': title, 'text': text_converter.convert(text, page_id, revision_id)}
+        for page_id, revision_id, title, text in articles
+    ]
+    return seq, first_position, end_position, stripped
+
+
+class StageMetrics:
+    """
+    Thread-safe throughput counters of one pipeline stage.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.articles = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, articles, seconds):
+        with self._lock:
+            self.articles += articles
+            self.batches += 1
+            self.busy_seconds += seconds
+
+    def snapshot(self, elapsed):
+        with self._lock:
+            return {
+                'articles': self.articles,
+                'batches': self.batches,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'articles_per_second': round(self.articles / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+
+
+class LoadCheckpoint:
+    """
+    Tracks completed batches and persists the index position below which all articles
+    have been written. Batches may complete out of order; the checkpoint only advances
+    over a contiguous prefix of completed batches.
+    """
+
+    def __init__(self, path, start_position, every=10):
+        self.path = path
+        self.position = start_position
+        self.every = every
+        self._next_seq = 0
+        self._completed = {}
+        self._pending_saves = 0
+        self._limit = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path):
+        """
+        Return the position stored in a checkpoint file, or None if there is none.
+        """
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f).get('next_position')
+
+    def complete(self, seq, end_position):
+        with self._lock:
+            self._completed[seq] = end_position
+            while self._next_seq in self._completed:
+                self.position = self._completed.pop(self._next_seq)
+                if self._limit is not None:
+                    self.position = min(self.position, self._limit)
+                self._next_seq += 1
+                self._pending_saves += 1
+            if self._pending_saves >= self.every:
+                self._save()
+
+    def hold(self, position):
+        """
+        Never advance past position, e.g. the first of the pages that could not be read.
+        """
+        with self._lock:
+            self._limit = position if self._limit is None else min(self._limit, position)
+            self.position = min(self.position, self._limit)
+
+    def flush(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        self._pending_saves = 0
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'next_position': self.position, 'updated': time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+
+class BulkLoader:
+    """
+    Pipeline loading articles from a multistream dump into Alternator.
+    Args:
+        reader (WikipediaMultistreamReader): Reader of the dump.
+        client_factory (callable): Returns a new AlternatorWikipediaClient; called once per writer.
+        batch_size (int): Articles per batch passed between stages and to add_articles.
+        strip_workers (int): Processes of the strip stage.
+        writers (int): Concurrent writer threads.
+        queue_size (int): Capacity (in batches) of each queue between stages.
+        checkpoint_path (str, optional): File where the resume position is stored.
+        report_interval (float): Seconds between progress reports, 0 disables them.
+        converter (str): Name of the wikitext converter (see wikipedia.text_conversion.CONVERTERS).
+        text_cache_path (str, optional): StrippedTextCache database shared by the strip processes.
+        read_ahead (int): Streams the read stage decompresses ahead, in parallel (see
+            WikipediaMultistreamReader.iter_pages).
+    """
+
+    def __init__(self, reader, client_factory, batch_size=100, strip_workers=None, writers=4,
+                 queue_size=16, checkpoint_path=None, report_interval=10.0, converter='mwparserfromhell',
+                 text_cache_path=None, read_ahead=4):
+        self.reader = reader
+        self.read_ahead = read_ahead
+        self.converter = converter
+        self.text_cache_path = text_cache_path
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.strip_workers = strip_workers or os.cpu_count() or 1
+        self.writers = writers
+        self.queue_size = queue_size
+        self.checkpoint_path = checkpoint_path
+        self.report_interval = report_interval
+        self.metrics = {name: StageMetrics(name) for name in ('read', 'strip', 'write')}
+        self._stop = threading.Event()
+        self._errors = []
+        self._failed_streams = []
+
+    def _fail(self, error):
+        self._errors.append(error)
+        self._stop.set()
+
+    def _put(self, q, item):
+        """
+        Blocking put that gives up when the pipeline is stopping.
+        """
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _read_stage(self, start, stop, read_queue, checkpoint):
+        try:
+            seq = 0
+            batch = []
+            first_position = start
+            # Pages that could not be read leave a gap in the positions
+            expected = start
+            started = time.perf_counter()
+            pages = self.reader.iter_pages(start, stop, read_ahead=self.read_ahead, failures=self._failed_streams)
+            for position, page_id, revision_id, title, text in pages:
+                if position != expected:
+                    checkpoint.hold(expected)
+                expected = position + 1
+                if not batch:
+                    first_position = position
+                batch.append((page_id, revision_id, title, text))
+                if len(batch) >= self.batch_size:
+                    self.metrics['read'].record(len(batch), time.perf_counter() - started)
+                    if not self._put(read_queue, (seq, first_position, position + 1, batch)):
+                        return
+                    seq += 1
+                    batch = []
+                    started = time.perf_counter()
+                if self._stop.is_set():
+                    return
+            if batch:
+                self.metrics['read'].record(len(batch), time.perf_counter() - started)
+                self._put(read_queue, (seq, first_position, position + 1, batch))
+            if self._failed_streams:
+                # The unread pages may also be the last ones
+                checkpoint.hold(expected)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(read_queue, _DONE)
+
+    def _strip_stage(self, pool, read_queue, write_queue):
+        in_flight = deque()
+        try:
+            while True:
+                batch = self._get(read_queue)
+                if batch is _DONE:
+                    break
+                future = pool.submit(_strip_batch, batch, self.converter, self.text_cache_path)
+                in_flight.append((future, time.perf_counter()))
+                if len(in_flight) >= self.strip_workers * 2:
+                    self._forward_stripped(in_flight.popleft(), write_queue)
+            while in_flight and not self._stop.is_set():
+                self._forward_stripped(in_flight.popleft(), write_queue)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.writers):
+                self._put(write_queue, _DONE)
+
+    def _forward_stripped(self, item, write_queue):
+        future, submitted = item
+        result = future.result()
+        self.metrics['strip'].record(len(result[3]), time.perf_counter() - submitted)
+        self._put(write_queue, result)
+
+    def _write_stage(self, write_queue, checkpoint):
+        try:
+            client = self.client_factory()
+            while True:
+                batch = self._get(write_queue)
+                if batch is _DONE:
+                    return
+                seq, _, end_position, articles = batch
+                started = time.perf_counter()
+                result = client.add_articles(articles)
+                if isinstance(result, BulkWriteResult):
+                    result.raise_for_failures()
+                self.metrics['write'].record(len(articles), time.perf_counter() - started)
+                checkpoint.complete(seq, end_position)
+        except Exception as e:
+            self._fail(e)
+
+    def stats(self, elapsed, read_queue=None, write_queue=None):
+        """
+        Return per-stage throughput metrics and queue depths.
+        """
+        stats = {name: m.snapshot(elapsed) for name, m in self.metrics.items()}
+        if read_queue is not None:
+            stats['read_queue'] = read_queue.qsize()
+            stats['write_queue'] = write_queue.qsize()
+        stats['elapsed_seconds'] = round(elapsed, 1)
+        return stats
+
+    def run(self, start=0, stop=None, resume=False):
+        """
+        Load the articles at index positions start..stop-1.
+        With resume=True, start from the position stored in the checkpoint file (if any).
+        Returns the final statistics, with the dump streams that could not be read completely
+        as failed_streams; next_position then stays before their pages. Raises the first error
+        of any stage.
+        """
+        if resume:
+            saved = LoadCheckpoint.load(self.checkpoint_path)
+            if saved is not None:
+                start = saved
+        self.metrics = {name: StageMetrics(name) for name in self.metrics}
+        self._stop.clear()
+        self._errors = []
+        self._failed_streams = []
+        checkpoint = LoadCheckpoint(self.checkpoint_path, start)
+        read_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        began = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.strip_workers) as pool:
+            threads = [threading.Thread(target=self._read_stage, args=(start, stop, read_queue, checkpoint),
+                                        daemon=True),
+                       threading.Thread(target=self._strip_stage, args=(pool, read_queue, write_queue), daemon=True)]
+            threads += [threading.Thread(target=self._write_stage, args=(write_queue, checkpoint), daemon=True)
+                        for _ in range(self.writers)]
+            for thread in threads:
+                thread.start()
+            last_report = began
+            while any(thread.is_alive() for thread in threads):
+                threads[-1].join(0.5)
+                now = time.perf_counter()
+                if self.report_interval and now - last_report >= self.report_interval:
+                    last_report = now
+                    print(json.dumps(self.stats(now - began, read_queue, write_queue)))
+            if self._stop.is_set():
+                pool.shutdown(wait=True, cancel_futures=True)
+        checkpoint.flush()
+        if self._errors:
+            raise self._errors[0]
+        stats = self.stats(time.perf_counter() - began)
+        stats['next_position'] = checkpoint.position
+        stats['failed_streams'] = [{'offset': offset, 'error': message} for offset, message in self._failed_streams]
+        return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Bulk load a Wikipedia multistream dump into Alternator')
+    parser.add_argument('dump', help='Path to the multistream .xml.bz2 dump')
+    parser.add_argument('index', help='Path to the binary index built by --reindex')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000')
+    parser.add_argument('--start', type=int, default=0, help='First index position to load')
+    parser.add_argument('--stop', type=int, default=None, help='Index position to stop at (exclusive)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--strip-workers', type=int, default=None, help='Strip processes (default: CPU count)')
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads')
+    parser.add_argument('--queue-size', type=int, default=16, help='Batches buffered between stages')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint file for resuming')
+    parser.add_argument('--resume', action='store_true', help='Resume from the checkpoint file')
+    parser.add_argument('--converter', default='mwparserfromhell', choices=sorted(CONVERTERS),
+                        help='Wikitext to plain text conversion')
+    parser.add_argument('--text-cache', default=None, help='SQLite cache of converted text')
+    parser.add_argument('--read-ahead', type=int, default=4,
+                        help='Dump streams decompressed ahead in parallel by the read stage')
+    parser.add_argument('--codec', default=None, choices=['zlib', 'zstd'], help='Compress stored article text')
+    parser.add_argument('--codec-dictionary', default=None, help='Trained zstd dictionary for --codec zstd')
+    args = parser.parse_args()
+    loader = BulkLoader(
+        WikipediaMultistreamReader(args.dump, args.index),
+        lambda: AlternatorWikipediaClient(args.endpoint_url, codec=args.codec, codec_dictionary=args.codec_dictionary),
+        batch_size=args.batch_size,
+        strip_workers=args.strip_workers,
+        writers=args.writers,
+        queue_size=args.queue_size,
+        checkpoint_path=args.checkpoint,
+        converter=args.converter,
+        text_cache_path=args.text_cache,
+        read_ahead=args.read_ahead,
+    )
+    stats = loader.run(args.start, args.stop, resume=args.resume)
+    print(json.dumps(stats))
+    if stats['failed_streams']:
+        parser.exit(1, f"{len(stats['failed_streams'])} streams could not be read completely, "
+                       f"resume from position {stats['next_position']}\n")
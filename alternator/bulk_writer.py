@@ -0,0 +1,378 @@
+"""
+bulk_writer.py
+Concurrent, rate-adaptive batch writes for AlternatorClient.add_rows / remove_rows.
+
+Put and delete requests are packed into batch_write_item calls of at most 25 requests and
+max_batch_bytes of estimated item size, and the batches are sent over several connections at
+once. The number of batches in flight follows AIMD (additive increase, multiplicative
+decrease, as in TCP congestion control): it grows by one per window of successful batches
+and is halved when Alternator pushes back, i.e. a batch comes back with UnprocessedItems, fails
+with a throttling error, or the smoothed batch latency grows to latency_factor times its lowest
+value so far.
+The limit lives in the writer, so successive calls start from what the cluster accepted last.
+
+UnprocessedItems are retried with full-jitter exponential backoff. A batch rejected as a whole
+by validation (e.g. an item above the 400 KB limit, or the same key twice in one batch) is
+resent one request per batch, so that only the offending items fail. Every item gets its own
+outcome in the returned BulkWriteResult; errors that are not about particular items (missing
+table, bad credentials, connection failures) are raised as usual.
+"""
+import heapq
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+
+BATCH_WRITE_MAX_ITEMS = 25
+DEFAULT_MAX_BATCH_BYTES = 4 * 1024 * 1024
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_LATENCY_FACTOR = 4.0
+# Weight of the latest batch in the smoothed latency
+LATENCY_SMOOTHING = 0.2
+WRITE_MAX_RETRIES = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5.0
+THROTTLING_ERRORS = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+                     'InternalServerError', 'ServiceUnavailable'}
+
+
+class BulkWriteError(Exception):
+    """
+    Raised by BulkWriteResult.raise_for_failures when some items were not written.
+    """
+    def __init__(self, table_name, failures):
+        super().__init__(f"{len(failures)} items of table {table_name} not written: {failures[0][1]}")
+        self.table_name = table_name
+        self.failures = failures
+
+
+class BulkWriteResult:
+    """
+    Outcome of each item of a bulk write, in the order of the items: errors[i] is None when
+    item i was written, otherwise the reason it was not. Truthy when every item was written.
+    """
+    def __init__(self, table_name, count):
+        self.table_name = table_name
+        self.errors = [None] * count
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __bool__(self):
+        return not any(self.errors)
+
+    def __iter__(self):
+        return (error is None for error in self.errors)
+
+    def __getitem__(self, index):
+        return self.errors[index] is None
+
+    @property
+    def failures(self):
+        """
+        (index, error) pairs of the items that were not written.
+        """
+        return [(i, error) for i, error in enumerate(self.errors) if error is not None]
+
+    def raise_for_failures(self):
+        failures = self.failures
+        if failures:
+            raise BulkWriteError(self.table_name, failures)
+
+    def __repr__(self):
+        return f'BulkWriteResult({len(self.errors) - len(self.failures)}/{len(self.errors)} written)'
+
+
+def item_size(item) -> int:
+    """
+    Estimate the stored size of an item (or key) in bytes, following DynamoDB's rules:
+    attribute names plus values, strings as UTF-8, numbers about one byte per two digits.
+    """
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value)) // 2 + 2
+    if isinstance(value, dict):
+        return 3 + sum(len(str(name)) + _value_size(v) + 1 for name, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 3 + sum(_value_size(v) + 1 for v in value)
+    return len(str(value))
+
+
+def _fingerprint(value):
+    """
+    Hashable form of a request, equal for the values sent and their deserialized echo
+    (bytes and Binary, int and Decimal, ...).
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((name, _fingerprint(v)) for name, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ('L',) + tuple(_fingerprint(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return ('SS',) + tuple(sorted(repr(_fingerprint(v)) for v in value))
+    if isinstance(value, Binary):
+        return ('B', value.value)
+    if isinstance(value, (bytes, bytearray)):
+        return ('B', bytes(value))
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return ('N', str(Decimal(value).normalize()))
+    return (type(value).__name__, value)
+
+
+def _last_of_each_key(values, key_names):
+    """
+    Return the key identity of each value and, per identity, the index of its last value.
+    Requests of the same key cannot share a batch: only the last one of each key is sent.
+    Without key_names every value is its own key.
+    """
+    if key_names:
+        identities = [tuple(repr(value.get(name)) for name in key_names) for value in values]
+    else:
+        identities = list(range(len(values)))
+    return identities, {identity: i for i, identity in enumerate(identities)}
+
+
+def _share_outcomes(result, identities, owners):
+    """
+    Give the values that were not sent the outcome of the last value of their key.
+    """
+    if len(owners) < len(identities):
+        for i, identity in enumerate(identities):
+            result.errors[i] = result.errors[owners[identity]]
+
+
+def _pack_requests(request_type, field, values, indexes, result, max_batch_bytes):
+    """
+    Yield (requests, indexes) batches of the values at indexes, of at most 25 requests and
+    max_batch_bytes of estimated size. Items that do not fit a batch on their own fail right away.
+    """
+    requests, batch_indexes, batch_bytes = [], [], 0
+    for i in indexes:
+        size = item_size(values[i])
+        if size > max_batch_bytes:
+            result.errors[i] = f'item of {size} bytes exceeds the batch size limit'
+            continue
+        if requests and (len(requests) >= BATCH_WRITE_MAX_ITEMS or batch_bytes + size > max_batch_bytes):
+            yield requests, batch_indexes
+            requests, batch_indexes, batch_bytes = [], [], 0
+        requests.append({request_type: {field: values[i]}})
+        batch_indexes.append(i)
+        batch_bytes += size
+    if requests:
+        yield requests, batch_indexes
+
+
+def _match_unprocessed(requests, indexes, unprocessed):
+    """
+    Return the (requests, indexes) of a batch that came back in UnprocessedItems.
+    Unprocessed requests come back as sent, up to deserialization; they are matched by content.
+    """
+    pending = {}
+    for request, i in zip(requests, indexes):
+        pending.setdefault(_fingerprint(request), []).append((request, i))
+    retried = [pending[_fingerprint(request)].pop() for request in unprocessed]
+    return [request for request, _ in retried], [i for _, i in retried]
+
+
+class AIMDLimiter:
+    """
+    Adaptive limit of concurrent batches, shared by the calls of a writer.
+    """
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, maximum=DEFAULT_MAX_CONCURRENCY,
+                 latency_factor=DEFAULT_LATENCY_FACTOR):
+        self.maximum = maximum
+        self.limit = float(min(initial, maximum))
+        self.latency_factor = latency_factor
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def allowed(self) -> int:
+        return max(1, int(self.limit))
+
+    def on_success(self, latency, sent_at):
+        """
+        Account for a batch sent at sent_at that completed in latency seconds.
+        """
+        with self._lock:
+            if self.smoothed_latency is None:
+                self.smoothed_latency = latency
+            else:
+                self.smoothed_latency += LATENCY_SMOOTHING * (latency - self.smoothed_latency)
+            if self.baseline_latency is None or self.smoothed_latency < self.baseline_latency:
+                self.baseline_latency = self.smoothed_latency
+            elif self.latency_factor and self.smoothed_latency > self.baseline_latency * self.latency_factor:
+                self._decrease(sent_at)
+                return
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self, sent_at):
+        with self._lock:
+            self._decrease(sent_at)
+
+    def _decrease(self, sent_at):
+        # Batches sent before the last decrease saw the old limit; halving once per window
+        # keeps a burst of throttled replies from collapsing the limit to 1
+        if sent_at < self._last_decrease:
+            return
+        self.limit = max(1.0, self.limit / 2)
+        self._last_decrease = time.monotonic()
+
+
+class _Batch:
+    __slots__ = ('requests', 'indexes', 'attempt', 'sent_at')
+
+    def __init__(self, requests, indexes, attempt=0):
+        self.requests = requests
+        self.indexes = indexes
+        self.attempt = attempt
+        self.sent_at = 0.0
+
+
+class BulkWriter:
+    """
+    Writes put and delete requests through a botocore DynamoDB client (see the module docstring).
+    The writer is thread-safe; its thread pool is created on first concurrent use.
+    """
+    def __init__(self, client, max_concurrency=DEFAULT_MAX_CONCURRENCY, initial_concurrency=DEFAULT_INITIAL_CONCURRENCY,
+                 max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, max_retries=WRITE_MAX_RETRIES,
+                 latency_factor=DEFAULT_LATENCY_FACTOR):
+        self.client = client
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.limiter = AIMDLimiter(initial_concurrency, max_concurrency, latency_factor)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.limiter.maximum, thread_name_prefix='bulk-write')
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def put(self, table_name, items, key_names=None) -> BulkWriteResult:
+        """
+        Put items (dicts of Python values). With key_names, an item replaces earlier items of
+        the same key in the call, which then share its outcome.
+        """
+        return self.write(table_name, 'PutRequest', 'Item', items, key_names)
+
+    def delete(self, table_name, keys) -> BulkWriteResult:
+        """
+        Delete the items of the given primary keys. Repeated keys are deleted once.
+        """
+        return self.write(table_name, 'DeleteRequest', 'Key', keys, tuple(keys[0]) if keys else None)
+
+    def write(self, table_name, request_type, field, values, key_names=None) -> BulkWriteResult:
+        """
+        Send a 'PutRequest' (field 'Item') or 'DeleteRequest' (field 'Key') per value.
+        """
+        result = BulkWriteResult(table_name, len(values))
+        if not values:
+            return result
+        identities, owners = _last_of_each_key(values, key_names)
+        batches = deque(_Batch(requests, indexes) for requests, indexes in _pack_requests(
+            request_type, field, values, sorted(owners.values()), result, self.max_batch_bytes))
+        self._send_all(table_name, batches, result)
+        _share_outcomes(result, identities, owners)
+        return result
+
+    def _send_all(self, table_name, batches, result):
+        """
+        Send the batches, at most limiter.allowed at a time, until every item has an outcome.
+        Retries wait in a heap ordered by the time their backoff ends.
+        """
+        retries = []
+        in_flight = {}
+        sequence = 0
+        try:
+            while batches or retries or in_flight:
+                now = time.monotonic()
+                while retries and retries[0][0] <= now:
+                    batches.append(heapq.heappop(retries)[2])
+                while batches and len(in_flight) < self.limiter.allowed:
+                    batch = batches.popleft()
+                    batch.sent_at = time.monotonic()
+                    if not in_flight and not batches and not retries:
+                        # A lone batch (e.g. a single item) is sent without the thread hop
+                        self._complete(table_name, batch, lambda: self._send(table_name, batch), result, batches,
+                                       retries, sequence)
+                    else:
+                        in_flight[self._get_pool().submit(self._send, table_name, batch)] = batch
+                    sequence += 1
+                if not in_flight:
+                    if retries and not batches:
+                        time.sleep(max(0.0, retries[0][0] - time.monotonic()))
+                    continue
+                timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    self._complete(table_name, batch, future.result, result, batches, retries, sequence)
+                    sequence += 1
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _send(self, table_name, batch):
+        started = time.monotonic()
+        response = self.client.batch_write_item(RequestItems={table_name: batch.requests})
+        return response, time.monotonic() - started
+
+    def _complete(self, table_name, batch, outcome, result, batches, retries, sequence):
+        """
+        Record the outcome of a sent batch: outcome() returns (response, latency) or raises.
+        Unprocessed requests go to retries, validation failures are split into single requests.
+        """
+        try:
+            response, latency = outcome()
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code', '')
+            if code in THROTTLING_ERRORS:
+                self.limiter.on_throttle(batch.sent_at)
+                self._retry(batch, batch.requests, batch.indexes, result, retries, sequence, code)
+            elif code == 'ValidationException' and len(batch.requests) > 1:
+                batches.extend(_Batch([request], [i], batch.attempt)
+                               for request, i in zip(batch.requests, batch.indexes))
+            elif code == 'ValidationException':
+                result.errors[batch.indexes[0]] = e.response['Error'].get('Message', code)
+            else:
+                raise
+            return
+        unprocessed = (response.get('UnprocessedItems') or {}).get(table_name) or []
+        if not unprocessed:
+            self.limiter.on_success(latency, batch.sent_at)
+            return
+        self.limiter.on_throttle(batch.sent_at)
+        requests, indexes = _match_unprocessed(batch.requests, batch.indexes, unprocessed)
+        self._retry(batch, requests, indexes, result, retries, sequence, 'unprocessed')
+
+    def _retry(self, batch, requests, indexes, result, retries, sequence, reason):
+        if batch.attempt >= self.max_retries:
+            for i in indexes:
+                result.errors[i] = f'{reason} after {batch.attempt} retries'
+            return
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** batch.attempt)))
+        heapq.heappush(retries, (time.monotonic() + delay, sequence, _Batch(requests, indexes, batch.attempt + 1)))
@@ -0,0 +1,237 @@
+"""
+dump_sync.py
+Incremental sync of the Alternator articles table with a new Wikipedia dump.
+
+A local manifest (SQLite) records, for every article in the table, its page id, revision id and
+a hash of its wikitext. A sync walks the new dump with WikipediaMultistreamReader.iter_pages,
+compares every page against the manifest and writes only new or changed articles; articles in
+the manifest that are no longer in the dump are removed from the table, unless a stream of the
+dump could not be read completely (its pages would look vanished). The manifest is updated
+batch by batch after the writes succeed, so an interrupted sync can simply be run again.
+
+Usage:
+    python -m alternator.dump_sync DUMP.xml.bz2 INDEX.bin --manifest articles.manifest --endpoint-url http://localhost:8000
+
+For a table already loaded from this dump by the bulk loader, --record-only fills the manifest
+without writing anything, so the next dump can be synced incrementally.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+
+from alternator.alternator_client import AlternatorWikipediaClient
+from alternator.bulk_writer import BulkWriteResult
+from wikipedia.multistream import WikipediaMultistreamReader
+from wikipedia.text_conversion import CONVERTERS
+
+COMPARE_MODES = ('revision', 'hash')
+
+
+def text_hash(text: str) -> bytes:
+    """
+    Short hash of raw wikitext used to detect content changes.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+class SyncManifest:
+    """
+    The articles known to be in the table: title -> (page_id, revision_id, text hash), plus the
+    id of the last sync that saw each article in a dump.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS manifest ('
+            ' title TEXT PRIMARY KEY,'
+            ' page_id INTEGER NOT NULL,'
+            ' revision_id INTEGER,'
+            ' text_hash BLOB NOT NULL,'
+            ' sync_id INTEGER NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS manifest_sync ON manifest (sync_id)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS syncs (sync_id INTEGER PRIMARY KEY, started REAL, stats TEXT)')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM manifest').fetchone()[0]
+
+    def begin_sync(self) -> int:
+        with self.conn:
+            return self.conn.execute('INSERT INTO syncs (started) VALUES (?)', (time.time(),)).lastrowid
+
+    def finish_sync(self, sync_id: int, stats: dict):
+        with self.conn:
+            self.conn.execute('UPDATE syncs SET stats = ? WHERE sync_id = ?', (json.dumps(stats), sync_id))
+
+    def lookup(self, titles) -> dict:
+        """
+        Return {title: (page_id, revision_id, text_hash)} for the titles present in the manifest.
+        """
+        found = {}
+        titles = list(titles)
+        for i in range(0, len(titles), 500):
+            chunk = titles[i:i + 500]
+            rows = self.conn.execute(
+                f'SELECT title, page_id, revision_id, text_hash FROM manifest WHERE title IN ({",".join("?" * len(chunk))})',
+                chunk
+            )
+            for title, page_id, revision_id, digest in rows:
+                found[title] = (page_id, revision_id, digest)
+        return found
+
+    def record(self, rows, sync_id: int):
+        """
+        Store (title, page_id, revision_id, text_hash) rows as seen by sync_id.
+        """
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO manifest (title, page_id, revision_id, text_hash, sync_id) VALUES (?, ?, ?, ?, ?)',
+                [(title, page_id, revision_id, digest, sync_id) for title, page_id, revision_id, digest in rows]
+            )
+
+    def mark_seen(self, titles, sync_id: int):
+        with self.conn:
+            self.conn.executemany('UPDATE manifest SET sync_id = ? WHERE title = ?', [(sync_id, t) for t in titles])
+
+    def unseen_titles(self, sync_id: int):
+        """
+        Titles not seen by sync_id, i.e. articles that vanished from the dump.
+        """
+        return [row[0] for row in self.conn.execute('SELECT title FROM manifest WHERE sync_id != ?', (sync_id,))]
+
+    def remove(self, titles):
+        with self.conn:
+            self.conn.executemany('DELETE FROM manifest WHERE title = ?', [(t,) for t in titles])
+
+    def close(self):
+        self.conn.close()
+
+
+class DumpSync:
+    """
+    Brings the articles table in line with a dump, writing only the differences.
+    Written text is converted with the reader's converter.
+    Args:
+        reader (WikipediaMultistreamReader): Reader of the new dump.
+        client (AlternatorWikipediaClient): Client of the articles table.
+        manifest (SyncManifest): Manifest of the articles in the table.
+        batch_size (int): Pages compared, and articles written or removed, per batch.
+        compare (str): 'revision' treats a page as changed when its page or revision id differs,
+            'hash' when the hash of its wikitext differs.
+    """
+
+    def __init__(self, reader, client, manifest, batch_size=100, compare='revision'):
+        if compare not in COMPARE_MODES:
+            raise ValueError(f"Unknown compare mode: {compare}")
+        self.reader = reader
+        self.client = client
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.compare = compare
+
+    def _changed(self, known, page_id, revision_id, digest):
+        if known is None:
+            return True
+        if self.compare == 'hash' or revision_id is None:
+            return known[2] != digest
+        return known[0] != page_id or known[1] != revision_id
+
+    def _sync_batch(self, batch, sync_id, stats, record_only):
+        known = self.manifest.lookup(title for _, _, title, _ in batch)
+        changed = []
+        unchanged = []
+        for page_id, revision_id, title, text in batch:
+            digest = text_hash(text)
+            entry = known.get(title)
+            if self._changed(entry, page_id, revision_id, digest):
+                changed.append((page_id, revision_id, title, text, digest))
+                stats['updated' if entry is not None else 'added'] += 1
+            else:
+                unchanged.append(title)
+        stats['unchanged'] += len(unchanged)
+        if changed and not record_only:
+            result = self.client.add_articles([
+                {'title': title, 'text': self.reader.converter.convert(text, page_id, revision_id)}
+                for page_id, revision_id, title, text, _ in changed
+            ])
+            # Failed articles stay out of the manifest: the sync stops here and they are retried next time
+            if isinstance(result, BulkWriteResult):
+                result.raise_for_failures()
+        self.manifest.record([(title, page_id, revision_id, digest)
+                              for page_id, revision_id, title, _, digest in changed], sync_id)
+        self.manifest.mark_seen(unchanged, sync_id)
+
+    def run(self, remove_vanished=True, record_only=False, progress=False):
+        """
+        Sync the whole dump. Returns counts of added, updated, unchanged and removed articles,
+        and the streams that could not be read completely as failed_streams.
+        remove_vanished: delete articles that are in the manifest but not in the dump. Skipped
+        when a stream failed, as its unread pages cannot be told apart from vanished ones.
+        record_only: only update the manifest (the table already matches the dump).
+        """
+        sync_id = self.manifest.begin_sync()
+        stats = {'scanned': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        began = time.perf_counter()
+        batch = []
+        failures = []
+        for _, page_id, revision_id, title, text in self.reader.iter_pages(failures=failures):
+            batch.append((page_id, revision_id, title, text))
+            stats['scanned'] += 1
+            if len(batch) >= self.batch_size:
+                self._sync_batch(batch, sync_id, stats, record_only)
+                batch = []
+                if progress and stats['scanned'] % (self.batch_size * 100) == 0:
+                    print(json.dumps(dict(stats, elapsed_seconds=round(time.perf_counter() - began, 1))))
+        if batch:
+            self._sync_batch(batch, sync_id, stats, record_only)
+        stats['failed_streams'] = [{'offset': offset, 'error': message} for offset, message in failures]
+        if remove_vanished and failures:
+            print(f"Not removing vanished articles: {len(failures)} streams could not be read completely")
+        elif remove_vanished:
+            vanished = self.manifest.unseen_titles(sync_id)
+            for i in range(0, len(vanished), self.batch_size):
+                titles = vanished[i:i + self.batch_size]
+                if not record_only:
+                    result = self.client.remove_articles(titles)
+                    if isinstance(result, BulkWriteResult):
+                        result.raise_for_failures()
+                self.manifest.remove(titles)
+            stats['removed'] = len(vanished)
+        stats['elapsed_seconds'] = round(time.perf_counter() - began, 1)
+        self.manifest.finish_sync(sync_id, stats)
+        return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Incrementally sync the Alternator articles table with a dump')
+    parser.add_argument('dump', help='Path to the multistream .xml.bz2 dump')
+    parser.add_argument('index', help='Path to the binary index built by --reindex')
+    parser.add_argument('--manifest', required=True, help='SQLite manifest of the articles in the table')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--converter', default='mwparserfromhell', choices=sorted(CONVERTERS),
+                        help='Wikitext to plain text conversion')
+    parser.add_argument('--compare', default='revision', choices=COMPARE_MODES,
+                        help='Detect changes by revision id or by wikitext hash')
+    parser.add_argument('--keep-vanished', action='store_true', help='Do not remove articles missing from the dump')
+    parser.add_argument('--record-only', action='store_true',
+                        help='Only record the dump in the manifest (the table was already loaded from it)')
+    parser.add_argument('--codec', default=None, choices=['zlib', 'zstd'], help='Compress stored article text')
+    parser.add_argument('--codec-dictionary', default=None, help='Trained zstd dictionary for --codec zstd')
+    args = parser.parse_args()
+    manifest = SyncManifest(args.manifest)
+    sync = DumpSync(
+        WikipediaMultistreamReader(args.dump, args.index, converter=args.converter),
+        AlternatorWikipediaClient(args.endpoint_url, codec=args.codec, codec_dictionary=args.codec_dictionary),
+        manifest,
+        batch_size=args.batch_size,
+        compare=args.compare,
+    )
+    print(json.dumps(sync.run(remove_vanished=not args.keep_vanished, record_only=args.record_only, progress=True)))
+    manifest.close()
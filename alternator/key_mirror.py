@@ -0,0 +1,238 @@
+"""
+key_mirror.py
+Local mirror of the key set of the articles table, with the size of each article.
+
+KeyMirror keeps every title of the table and its text size (UTF-8 bytes) in a SQLite sidecar
+file that all processes of a host (e.g. gunicorn workers) share. AlternatorWikipediaClient
+updates it on every add/remove and rebuilds it with a titles-only scan (rebuild_key_mirror), so
+existence checks and title listings are answered locally with an indexed lookup instead of a
+network round-trip: titles the mirror does not know are reported missing without asking
+Alternator, only positive hits are confirmed with a projected batch_get_item (confirm_hits).
+
+Writes made by clients without the mirror (other hosts, other tools) only show up after the
+next rebuild; max_age bounds how long a mirror is trusted after its last rebuild.
+
+Usage:
+    python -m alternator.key_mirror --endpoint-url http://localhost:8000 mirror.sqlite
+"""
+import sqlite3
+import threading
+import time
+
+# A rebuild claimed longer ago than this is assumed to have died with its process
+REBUILD_TIMEOUT_SECONDS = 600.0
+# Bound on the number of SQL variables of one IN (...) lookup
+LOOKUP_CHUNK = 500
+
+
+class KeyMirror:
+    """
+    Sorted title -> size mirror of the articles table in a SQLite file.
+    Removals made while a rebuild runs are kept as tombstones, so the scan of the rebuild
+    cannot bring back a title removed after the scan passed it.
+    Args:
+        path (str): SQLite file of the mirror, created if needed.
+        max_age (float, optional): Seconds after a rebuild during which the mirror is trusted;
+            None trusts it until the next rebuild.
+        confirm_hits (bool): Confirm the titles found in the mirror with Alternator, so only
+            stale negatives (writes from outside the mirror) can be wrong.
+    """
+
+    def __init__(self, path: str, max_age: float = None, confirm_hits: bool = True):
+        self.path = path
+        self.max_age = max_age
+        self.confirm_hits = confirm_hits
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS keys ('
+            ' title TEXT PRIMARY KEY,'
+            ' size INTEGER,'
+            ' removed INTEGER NOT NULL DEFAULT 0,'
+            ' updated REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL)')
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, name: str):
+        row = self._connection().execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def built_at(self):
+        """
+        Start time of the scan of the last completed rebuild, None before the first one.
+        """
+        return self._meta('built_at')
+
+    @property
+    def ready(self) -> bool:
+        """
+        True when the mirror has been built and is not older than max_age.
+        """
+        built_at = self.built_at
+        if built_at is None:
+            return False
+        return self.max_age is None or time.time() - built_at < self.max_age
+
+    def add(self, rows):
+        """
+        Record written articles, rows of (title, size); size may be None when unknown.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO keys (title, size, removed, updated) VALUES (?, ?, 0, ?)',
+                             [(title, size, now) for title, size in rows])
+
+    def remove(self, titles):
+        """
+        Record removed articles.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            if self._meta('rebuild_started') is None:
+                conn.executemany('DELETE FROM keys WHERE title = ?', [(title,) for title in titles])
+            else:
+                conn.executemany('INSERT OR REPLACE INTO keys (title, size, removed, updated) VALUES (?, NULL, 1, ?)',
+                                 [(title, now) for title in titles])
+
+    def clear(self):
+        """
+        Record that the table is empty (e.g. it was deleted): the mirror stays ready.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM keys')
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('built_at', ?)", (time.time(),))
+
+    def contains(self, titles) -> list:
+        """
+        Return the titles from the given list that are in the mirror, in the order of titles.
+        """
+        found = set()
+        unique = list(dict.fromkeys(titles))
+        conn = self._connection()
+        for i in range(0, len(unique), LOOKUP_CHUNK):
+            chunk = unique[i:i + LOOKUP_CHUNK]
+            found.update(title for title, in conn.execute(
+                f'SELECT title FROM keys WHERE removed = 0 AND title IN ({",".join("?" * len(chunk))})', chunk))
+        return [title for title in titles if title in found]
+
+    def page(self, start_title: str = None, count: int = 10):
+        """
+        Return a page of (title, size) tuples in title order, after start_title (exclusive),
+        and the start title of the next page (None on the last page). An empty page (count <= 0)
+        continues at start_title.
+        """
+        if count <= 0:
+            return [], start_title
+        rows = self._connection().execute(
+            'SELECT title, size FROM keys WHERE removed = 0 AND title > ? ORDER BY title LIMIT ?',
+            (start_title or '', count + 1)
+        ).fetchall()
+        if len(rows) > count:
+            return rows[:count], rows[count - 1][0]
+        return rows, None
+
+    def begin_rebuild(self, timeout: float = REBUILD_TIMEOUT_SECONDS):
+        """
+        Claim the rebuild of the mirror, before scanning the table. Returns the start time to
+        pass to finish_rebuild, or None when another process is already rebuilding it.
+        """
+        conn = self._connection()
+        # Check and set under the write lock, so two processes cannot both claim it
+        conn.execute('BEGIN IMMEDIATE')
+        with conn:
+            now = time.time()
+            started = self._meta('rebuild_started')
+            if started is not None and now - started < timeout:
+                return None
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('rebuild_started', ?)", (now,))
+        return now
+
+    def finish_rebuild(self, started_at: float, rows) -> int:
+        """
+        Replace the mirror with the (title, size) rows of a scan started at started_at.
+        Entries added or removed since started_at win over the scanned rows.
+        Returns the number of titles in the mirror.
+        """
+        conn = self._connection()
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS scanned (title TEXT PRIMARY KEY, size INTEGER) WITHOUT ROWID')
+            conn.execute('DELETE FROM scanned')
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= 10000:
+                    conn.executemany('INSERT OR REPLACE INTO scanned (title, size) VALUES (?, ?)', batch)
+                    batch = []
+            conn.executemany('INSERT OR REPLACE INTO scanned (title, size) VALUES (?, ?)', batch)
+            with conn:
+                conn.execute('DELETE FROM keys WHERE updated < ?', (started_at,))
+                conn.execute('INSERT OR IGNORE INTO keys (title, size, removed, updated) '
+                             'SELECT title, size, 0, ? FROM scanned', (started_at,))
+                conn.execute('DELETE FROM keys WHERE removed = 1')
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('built_at', ?)", (started_at,))
+                conn.execute("DELETE FROM meta WHERE name = 'rebuild_started'")
+        except BaseException:
+            self.abort_rebuild()
+            raise
+        finally:
+            conn.execute('DELETE FROM scanned')
+            conn.commit()
+        return len(self)
+
+    def abort_rebuild(self):
+        conn = self._connection()
+        conn.rollback()
+        with conn:
+            conn.execute("DELETE FROM meta WHERE name = 'rebuild_started'")
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM keys WHERE removed = 0').fetchone()[0]
+
+    def stats(self) -> dict:
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM keys WHERE removed = 0').fetchone()
+        built_at = self.built_at
+        return {
+            'entries': entries,
+            'article_bytes': size,
+            'built_at': built_at,
+            'age': time.time() - built_at if built_at is not None else None,
+            'ready': self.ready,
+            'rebuilding': self._meta('rebuild_started') is not None,
+        }
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == '__main__':
+    import argparse
+    from alternator.alternator_client import AlternatorWikipediaClient
+
+    parser = argparse.ArgumentParser(description='Rebuild the key mirror of the articles table with a titles-only scan')
+    parser.add_argument('path', help='SQLite file of the mirror')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments')
+    args = parser.parse_args()
+    client = AlternatorWikipediaClient(args.endpoint_url, key_mirror=KeyMirror(args.path))
+    count = client.rebuild_key_mirror(total_segments=args.segments)
+    if count is None:
+        parser.exit(1, 'Another process is rebuilding the mirror\n')
+    print(f'{count} titles in {args.path}')
@@ -0,0 +1,91 @@
+"""
+Fixtures of the benchmark suite: a synthetic dump with its indexes, and an Alternator stand-in.
+
+Run from the repository root (requires pytest-benchmark, see benchmarks/requirements.txt):
+    python -m pytest benchmarks
+Results are saved as JSON under .benchmarks/ (see pytest.ini); compare runs with
+    python -m pytest benchmarks --benchmark-compare
+    pytest-benchmark compare --group-by name
+The dump size is set with --bench-streams, --bench-pages-per-stream and --bench-article-words.
+The Alternator benchmarks use an in-process moto server unless --bench-alternator-endpoint
+points them at a real cluster (a scratch table is created and deleted there).
+"""
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+from synthetic_dump import write_synthetic_dump
+from wikipedia.multistream import WikipediaMultistreamReader
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('wikipedia benchmarks')
+    group.addoption('--bench-streams', type=int, default=20, help='bzip2 streams in the synthetic dump')
+    group.addoption('--bench-pages-per-stream', type=int, default=100, help='Pages per stream')
+    group.addoption('--bench-article-words', type=int, default=300, help='Words per article')
+    group.addoption('--bench-alternator-endpoint', default=None,
+                    help='Benchmark against this Alternator endpoint instead of a moto server')
+
+
+class SyntheticDump:
+    """
+    A generated dump and its binary, title and search indexes.
+    """
+
+    def __init__(self, directory, streams, pages_per_stream, article_words):
+        self.path = os.path.join(directory, 'synthetic-multistream.xml.bz2')
+        self.index_path = os.path.join(directory, 'synthetic.bin')
+        summary = write_synthetic_dump(self.path, streams, pages_per_stream, article_words)
+        self.stream_offsets = summary['stream_offsets']
+        self.pages = summary['pages']
+        self.articles = summary['articles']
+        self.bytes = summary['bytes']
+        self.redirect_every = summary['redirect_every']
+        reader = WikipediaMultistreamReader(self.path, None, converter='regex')
+        reader.reindex_multistream(self.index_path, progress=False, title_index_path=f'{self.index_path}.titles',
+                                   search_index_path=f'{self.index_path}.search')
+        reader.close()
+
+    def reader(self, **options):
+        return WikipediaMultistreamReader(self.path, self.index_path, **options)
+
+    def info(self) -> dict:
+        return {'streams': len(self.stream_offsets), 'pages': self.pages, 'articles': self.articles,
+                'dump_bytes': self.bytes}
+
+    def article_page_id(self, page_id: int) -> int:
+        """
+        Return page_id, or the next page id when page_id is a redirect (not in the title index).
+        """
+        if self.redirect_every and page_id % self.redirect_every == 0:
+            return page_id + 1
+        return page_id
+
+
+@pytest.fixture(scope='session')
+def synthetic_dump(request, tmp_path_factory):
+    options = request.config.option
+    return SyntheticDump(str(tmp_path_factory.mktemp('dump')), options.bench_streams,
+                         options.bench_pages_per_stream, options.bench_article_words)
+
+
+@pytest.fixture(scope='session')
+def alternator_endpoint(request):
+    endpoint = request.config.option.bench_alternator_endpoint
+    if endpoint:
+        yield endpoint
+        return
+    server_module = pytest.importorskip('moto.server')
+    for name, value in (('AWS_DEFAULT_REGION', 'us-east-1'), ('AWS_ACCESS_KEY_ID', 'benchmark'),
+                        ('AWS_SECRET_ACCESS_KEY', 'benchmark')):
+        os.environ.setdefault(name, value)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = server_module.ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f'http://{host}:{port}'
+    server.stop()
@@ -0,0 +1,181 @@
+"""
+load_test.py
+Load test of the backend's production serving mode (gunicorn, see webui/backend/gunicorn.conf.py)
+against a synthetic dump, at increasing worker counts.
+
+For each worker count, a gunicorn server is started on a config pointing at the synthetic dump
+and its indexes, and --clients keep-alive clients send article reads (by title, scattered over
+the dump so most reads miss the stream cache) and full-text searches for --duration seconds.
+Requests per second and latency percentiles are printed per worker count; throughput should
+grow with the workers up to the number of CPUs.
+
+Usage:
+    python benchmarks/load_test.py --workers 1 2 4 --clients 16 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, '..', 'webui', 'backend')
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_dump import WORDS, article_title, write_synthetic_dump
+from wikipedia.multistream import WikipediaMultistreamReader
+
+
+def prepare_dump(directory: str, streams: int, pages_per_stream: int, article_words: int) -> dict:
+    path = os.path.join(directory, 'synthetic-multistream.xml.bz2')
+    index_path = os.path.join(directory, 'synthetic.bin')
+    summary = write_synthetic_dump(path, streams, pages_per_stream, article_words)
+    reader = WikipediaMultistreamReader(path, None, converter='regex')
+    reader.reindex_multistream(index_path, progress=False, title_index_path=f'{index_path}.titles',
+                               search_index_path=f'{index_path}.search')
+    reader.close()
+    summary.update({'dump': path, 'index': index_path})
+    return summary
+
+
+def write_config(path: str, dump: dict, converter: str, extract_workers: int):
+    wikipedia_cfg = {
+        'dump': dump['dump'],
+        'index': dump['index'],
+        'title_index': f"{dump['index']}.titles",
+        'search_index': f"{dump['index']}.search",
+        'converter': converter,
+        'extract_workers': extract_workers,
+    }
+    with open(path, 'w') as f:
+        json.dump({'deadline': '2025-05-22T13:00:00+02:00', 'wikipedia': wikipedia_cfg,
+                   'alternator': {'endpoint_url': 'http://localhost:8000'}}, f)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(config_path: str, workers: int, threads: int) -> tuple:
+    port = free_port()
+    env = dict(os.environ, BACKEND_CONFIG=config_path, BACKEND_WORKERS=str(workers), BACKEND_THREADS=str(threads),
+               BACKEND_BIND=f'127.0.0.1:{port}', BACKEND_ACCESS_LOG='')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/deadline')
+            if connection.getresponse().status == 200:
+                return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"gunicorn did not start on port {port}")
+
+
+def request_paths(rng: random.Random, pages: int):
+    while True:
+        if rng.random() < 0.8:
+            yield f'/api/wikipedia-article-by-title?title={article_title(rng.randint(1, pages)).replace(" ", "%20")}'
+        else:
+            yield f'/api/query-articles?q={rng.choice(WORDS)}%20{rng.choice(WORDS)}&limit=5'
+
+
+def run_load(port: int, clients: int, duration: float, pages: int) -> dict:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        own = []
+        for path in request_paths(rng, pages):
+            if time.perf_counter() >= stop_at:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 500
+            except OSError:
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                failed = True
+            if failed:
+                with lock:
+                    errors[0] += 1
+            else:
+                own.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+    return {'requests': len(latencies), 'errors': errors[0], 'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': percentile(0.5), 'p99_ms': percentile(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the backend under gunicorn at several worker counts')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per worker count')
+    parser.add_argument('--converter', default='mwparserfromhell')
+    parser.add_argument('--extract-workers', type=int, default=0, help='wikipedia.extract_workers of each worker')
+    parser.add_argument('--streams', type=int, default=50)
+    parser.add_argument('--pages-per-stream', type=int, default=100)
+    parser.add_argument('--article-words', type=int, default=600)
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump = prepare_dump(directory, args.streams, args.pages_per_stream, args.article_words)
+        config_path = os.path.join(directory, 'config.yaml')
+        write_config(config_path, dump, args.converter, args.extract_workers)
+        print(f"{dump['pages']} pages in {args.streams} streams, {os.cpu_count()} CPUs, {args.clients} clients")
+        results = []
+        for workers in args.workers:
+            server, port = start_server(config_path, workers, args.threads)
+            try:
+                # One untimed pass so every worker has opened its reader and indexes
+                run_load(port, args.clients, min(2.0, args.duration), dump['pages'])
+                result = run_load(port, args.clients, args.duration, dump['pages'])
+            finally:
+                server.terminate()
+                server.wait()
+            result['workers'] = workers
+            results.append(result)
+            print(f"workers={workers:<3} {result['requests_per_second']:>8} req/s  p50 {result['p50_ms']} ms  "
+                  f"p99 {result['p99_ms']} ms  errors {result['errors']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
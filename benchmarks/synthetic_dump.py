@@ -0,0 +1,121 @@
+"""
+synthetic_dump.py
+Generator of synthetic Wikipedia multistream dumps for the benchmarks.
+
+The dumps have the layout of the real ones (a siteinfo stream, bzip2 streams of
+pages_per_stream pages, a closing stream) and wikitext with the markup the converters deal with
+(links, bold, templates, references, headings), so reading, indexing and conversion costs scale
+like on a real dump. Generation is deterministic for a given seed.
+
+Usage:
+    python benchmarks/synthetic_dump.py OUT.xml.bz2 --streams 100 --pages-per-stream 100 --article-words 600 --reindex
+"""
+import bz2
+import os
+import random
+import sys
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SITEINFO = '<mediawiki xml:lang="en">\n  <siteinfo>\n    <sitename>Wikipedia</sitename>\n  </siteinfo>\n'
+WORDS = ('alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa', 'lambda', 'sigma', 'omega',
+         'river', 'mountain', 'city', 'history', 'century', 'music', 'science', 'language', 'island', 'empire',
+         'station', 'album', 'species', 'village', 'football', 'election', 'university', 'novel', 'bridge')
+
+
+def article_title(page_id: int) -> str:
+    return f'Synthetic article {page_id}'
+
+
+def article_wikitext(rng: random.Random, words: int) -> str:
+    """
+    Random wikitext of about the given number of words.
+    """
+    parts = []
+    for i in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f'[[{article_title(rng.randint(1, 100000))}|{word}]]'
+        elif roll < 0.07:
+            word = f"'''{word}'''"
+        elif roll < 0.08:
+            word = f'{{{{cite web|title={word}|url=https://example.org/{i}}}}}'
+        elif roll < 0.09:
+            word = f'{word}<ref>{rng.choice(WORDS)} {rng.choice(WORDS)}</ref>'
+        parts.append(word)
+        if i and i % 200 == 0:
+            parts.append(f'\n\n== {rng.choice(WORDS).title()} ==\n')
+    return '{{Infobox|name=synthetic}}\n' + ' '.join(parts)
+
+
+def page_xml(page_id: int, title: str, text: str, redirect: str = None) -> str:
+    redirect_xml = f'    <redirect title="{escape(redirect)}" />\n' if redirect else ''
+    encoded = escape(text)
+    return (
+        '  <page>\n'
+        f'    <title>{escape(title)}</title>\n'
+        '    <ns>0</ns>\n'
+        f'    <id>{page_id}</id>\n'
+        f'{redirect_xml}'
+        '    <revision>\n'
+        f'      <id>{page_id * 10}</id>\n'
+        f'      <text bytes="{len(text.encode("utf-8"))}" xml:space="preserve">{encoded}</text>\n'
+        '    </revision>\n'
+        '  </page>\n'
+    )
+
+
+def write_synthetic_dump(path: str, streams: int = 20, pages_per_stream: int = 100, article_words: int = 300,
+                         redirect_every: int = 50, seed: int = 25, compresslevel: int = 9) -> dict:
+    """
+    Write a synthetic multistream dump to path. Every redirect_every-th page is a redirect
+    (0 for none). Returns a summary: stream offsets, page, article and byte counts, redirect_every.
+    """
+    rng = random.Random(seed)
+    offsets = []
+    articles = 0
+    page_id = 1
+    with open(path, 'wb') as f:
+        f.write(bz2.compress(SITEINFO.encode('utf-8')))
+        for _ in range(streams):
+            offsets.append(f.tell())
+            pages = []
+            for _ in range(pages_per_stream):
+                if redirect_every and page_id % redirect_every == 0:
+                    target = article_title(page_id - 1)
+                    pages.append(page_xml(page_id, f'Redirect {page_id}', f'#REDIRECT [[{target}]]', target))
+                else:
+                    pages.append(page_xml(page_id, article_title(page_id), article_wikitext(rng, article_words)))
+                    articles += 1
+                page_id += 1
+            f.write(bz2.compress(''.join(pages).encode('utf-8'), compresslevel))
+        f.write(bz2.compress(b'</mediawiki>\n'))
+        size = f.tell()
+    return {'stream_offsets': offsets, 'pages': page_id - 1, 'articles': articles, 'bytes': size,
+            'redirect_every': redirect_every}
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='Write a synthetic multistream dump for benchmarking')
+    parser.add_argument('path', help='Output .xml.bz2 path')
+    parser.add_argument('--streams', type=int, default=20)
+    parser.add_argument('--pages-per-stream', type=int, default=100)
+    parser.add_argument('--article-words', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=25)
+    parser.add_argument('--reindex', action='store_true',
+                        help='Also build the binary, title and search indexes next to the dump')
+    args = parser.parse_args()
+    summary = write_synthetic_dump(args.path, args.streams, args.pages_per_stream, args.article_words, seed=args.seed)
+    if args.reindex:
+        from wikipedia.multistream import WikipediaMultistreamReader
+        index_path = f'{args.path}.index.bin'
+        reader = WikipediaMultistreamReader(args.path, None)
+        reader.reindex_multistream(index_path, progress=False, title_index_path=f'{index_path}.titles',
+                                   search_index_path=f'{index_path}.search')
+        summary['index'] = index_path
+    summary.pop('stream_offsets')
+    print(json.dumps(summary))
@@ -0,0 +1,62 @@
+"""
+Benchmarks of the Alternator client batch paths, against a moto server by default.
+The absolute numbers of the moto stand-in say little about a real cluster; they track the
+client-side cost (serialization, batching, codec) from commit to commit.
+"""
+import uuid
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from alternator.alternator_client import AlternatorWikipediaClient
+from synthetic_dump import article_title
+
+BATCH = 100
+
+
+@pytest.fixture(scope='module')
+def articles(synthetic_dump):
+    reader = synthetic_dump.reader(converter='regex')
+    texts = reader.get_articles_by_positions(range(min(BATCH, synthetic_dump.articles)))
+    reader.close()
+    return [{'title': title, 'text': text} for title, text in texts]
+
+
+@pytest.fixture(params=[None, 'zlib'])
+def client(request, alternator_endpoint):
+    client = AlternatorWikipediaClient(alternator_endpoint, codec=request.param)
+    client.TABLE_NAME = f'bench_{uuid.uuid4().hex[:8]}'
+    client.create_articles_table()
+    yield client
+    client.delete_articles_table()
+
+
+def record_items_per_second(benchmark, count):
+    benchmark.extra_info['batch'] = count
+    if benchmark.stats is None:
+        # --benchmark-disable: the benchmark ran once, untimed
+        return
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info['items_per_second'] = round(count / mean, 1) if mean else None
+
+
+def test_batch_put(benchmark, client, articles):
+    benchmark(client.add_articles, articles)
+    record_items_per_second(benchmark, len(articles))
+
+
+def test_batch_get(benchmark, client, articles):
+    client.add_articles(articles)
+    titles = [article['title'] for article in articles]
+    fetched = benchmark(client.get_articles, titles)
+    assert len(fetched) == len(articles)
+    record_items_per_second(benchmark, len(titles))
+
+
+def test_check_articles_exist(benchmark, client, articles):
+    client.add_articles(articles)
+    titles = [article['title'] for article in articles] + [article_title(10 ** 9 + i) for i in range(10)]
+    existing = benchmark(client.check_articles_exist, titles)
+    assert len(existing) == len(articles)
+    record_items_per_second(benchmark, len(titles))
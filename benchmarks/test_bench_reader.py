@@ -0,0 +1,110 @@
+"""
+Benchmarks of the dump reader and its indexes against the synthetic dump.
+Throughput figures (ms/article, streams/s, ...) derived from the mean time are stored in each
+benchmark's extra_info, next to the raw timings in the JSON results.
+"""
+import random
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from synthetic_dump import article_title
+from wikipedia.multistream import WikipediaMultistreamReader
+
+
+def record_rate(benchmark, name, amount):
+    """
+    Store amount per second of mean benchmark time in extra_info under name.
+    Nothing is stored without timings (--benchmark-disable).
+    """
+    if benchmark.stats is None:
+        return
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info[name] = round(amount / mean, 2) if mean else None
+
+
+def record_ms_per(benchmark, name, amount, scale=1000):
+    if benchmark.stats is None:
+        return
+    benchmark.extra_info[name] = round(benchmark.stats.stats.mean * scale / amount, 4)
+
+
+@pytest.mark.parametrize('converter', ['raw', 'regex', 'mwparserfromhell'])
+def test_list_articles_by_index(benchmark, synthetic_dump, converter):
+    """
+    A page load: 10 consecutive articles, cold (no stream cache), converted.
+    """
+    reader = synthetic_dump.reader(converter=converter)
+    start = synthetic_dump.articles // 2
+    articles = benchmark(reader.list_articles_by_index, start, 10)
+    assert len(articles) == 10
+    record_ms_per(benchmark, 'ms_per_article', 10)
+    benchmark.extra_info.update(synthetic_dump.info())
+    reader.close()
+
+
+@pytest.mark.parametrize('fetch_workers', [1, 4])
+def test_get_articles_by_positions_scattered(benchmark, synthetic_dump, fetch_workers):
+    """
+    50 random positions spread over the whole dump, raw text.
+    """
+    reader = synthetic_dump.reader(converter='raw', fetch_workers=fetch_workers)
+    positions = random.Random(7).sample(range(synthetic_dump.articles), min(50, synthetic_dump.articles))
+    articles = benchmark(reader.get_articles_by_positions, positions)
+    assert len(articles) == len(positions)
+    record_ms_per(benchmark, 'ms_per_article', len(positions))
+    benchmark.extra_info['streams'] = len({int(entry[0]) for entry in reader.get_binary_index().take(positions)})
+    reader.close()
+
+
+@pytest.mark.parametrize('read_ahead', [0, 4])
+def test_iter_pages_full_dump(benchmark, synthetic_dump, read_ahead):
+    """
+    Bulk extraction of every article's raw wikitext.
+    """
+    reader = synthetic_dump.reader(converter='raw')
+    count = benchmark.pedantic(lambda: sum(1 for _ in reader.iter_pages(read_ahead=read_ahead)), rounds=3)
+    assert count == synthetic_dump.articles
+    record_rate(benchmark, 'streams_per_second', len(synthetic_dump.stream_offsets))
+    record_rate(benchmark, 'articles_per_second', count)
+    record_rate(benchmark, 'dump_megabytes_per_second', synthetic_dump.bytes / 1e6)
+    reader.close()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_reindex_multistream(benchmark, synthetic_dump, tmp_path, workers):
+    reader = WikipediaMultistreamReader(synthetic_dump.path, None)
+    output = str(tmp_path / 'reindexed.bin')
+    count = benchmark.pedantic(reader.reindex_multistream, args=(output,),
+                               kwargs={'progress': False, 'workers': workers}, rounds=3)
+    assert count == synthetic_dump.articles
+    record_rate(benchmark, 'streams_per_second', len(synthetic_dump.stream_offsets))
+    record_rate(benchmark, 'pages_per_second', synthetic_dump.pages)
+
+
+def test_binary_index_take(benchmark, synthetic_dump):
+    index = synthetic_dump.reader().get_binary_index()
+    positions = random.Random(3).sample(range(len(index)), min(1000, len(index)))
+    benchmark(index.take, positions)
+    record_ms_per(benchmark, 'us_per_lookup', len(positions), scale=1e6)
+
+
+def test_binary_index_find_page_id(benchmark, synthetic_dump):
+    index = synthetic_dump.reader().get_binary_index()
+    index.find_page_id(1)
+    _, page_id, _ = index.slice(len(index) // 2, 1)[0]
+    assert benchmark(index.find_page_id, page_id) is not None
+
+
+def test_title_index_lookup(benchmark, synthetic_dump):
+    title_index = synthetic_dump.reader().get_title_index()
+    title = article_title(synthetic_dump.article_page_id(synthetic_dump.pages // 3 + 1))
+    assert benchmark(title_index.lookup, title) is not None
+
+
+@pytest.mark.parametrize('query', ['river', 'mountain history century'])
+def test_search_index_query(benchmark, synthetic_dump, query):
+    search_index = synthetic_dump.reader().get_search_index()
+    matches = benchmark(search_index.search, query, 10)
+    assert len(matches) == 10
@@ -0,0 +1,238 @@
+"""
+metrics.py
+In-process metrics for the dump reader, the Alternator client and the backend.
+
+Stages of the hot paths are timed with span() (or record() when the time is accumulated by hand,
+e.g. across the yields of a generator). Every timing goes to a latency histogram of the
+process-wide REGISTRY, rendered in the Prometheus text format by REGISTRY.render(), and to the
+timing collector of the current request when one is active (see collect_timings), from which
+the backend builds a Server-Timing header.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=()) -> str:
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, one value per combination of label values.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram:
+    """
+    Latency histogram with fixed bucket bounds, one series per combination of label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels):
+        """
+        Return (count, sum) of one series.
+        """
+        series = self._series.get(tuple(labels.get(name, '') for name in self.labelnames))
+        return (series[2], series[1]) if series else (0, 0.0)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {total!r}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+class MetricsRegistry:
+    """
+    The metrics of a process, created on first use by name.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **options):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str = '', labelnames=()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str = '', labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('wikipedia_stage_seconds', 'Time spent in each stage of dump reads', ('stage',))
+STAGE_BYTES = REGISTRY.counter('wikipedia_stage_bytes_total', 'Bytes processed by each stage of dump reads',
+                               ('stage', 'direction'))
+
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class TimingCollector:
+    """
+    Total time and number of spans per stage within one request.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def server_timing(self) -> str:
+        """
+        Render the collected stages as a Server-Timing header value (durations in ms).
+        """
+        with self._lock:
+            stages = list(self.stages.items())
+        return ', '.join(f'{stage};dur={total * 1000:.2f};desc="{count}x"' for stage, (total, count) in stages)
+
+
+def start_timings() -> TimingCollector:
+    """
+    Start collecting the spans of this context into a new TimingCollector, until stop_timings.
+    """
+    collector = TimingCollector()
+    collector.token = _request_timings.set(collector)
+    return collector
+
+
+def stop_timings(collector: TimingCollector):
+    _request_timings.reset(collector.token)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the spans recorded in the block (and by work submitted with propagate) into a
+    TimingCollector, yielded by the context manager.
+    """
+    collector = start_timings()
+    try:
+        yield collector
+    finally:
+        stop_timings(collector)
+
+
+def propagate(fn):
+    """
+    Wrap fn to run in a copy of the current context, so spans recorded in a pool thread still
+    reach the current request's collector.
+    """
+    context = contextvars.copy_context()
+
+    def call(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return call
+
+
+def record(stage: str, seconds: float, histogram: Histogram = STAGE_SECONDS, **labels):
+    """
+    Record seconds spent in stage: observed in histogram and added to the request's collector.
+    """
+    histogram.observe(seconds, stage=stage, **labels)
+    collector = _request_timings.get()
+    if collector is not None:
+        collector.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str, histogram: Histogram = STAGE_SECONDS, **labels):
+    """
+    Time the enclosed block as stage (see record).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, histogram, **labels)
+
+
+def count_bytes(stage: str, compressed: int, decompressed: int):
+    STAGE_BYTES.inc(compressed, stage=stage, direction='in')
+    STAGE_BYTES.inc(decompressed, stage=stage, direction='out')
@@ -0,0 +1,104 @@
+"""
+profiler.py
+A sampling profiler for the running process, cheap enough to switch on in production.
+
+A background thread snapshots the stacks of all other threads every interval seconds and counts
+them as collapsed stacks ('outer;...;inner count' lines, the input of flamegraph.pl and
+speedscope). The sampled code is never traced, so the overhead is bounded by the sampling rate.
+Frames are identified by function and file only, so stacks repeat across samples; once there
+are more than max_stacks distinct stacks, the rarest half is dropped, bounding the memory used
+by a profiler left running on a server.
+"""
+import collections
+import sys
+import threading
+import time
+
+DEFAULT_MAX_STACKS = 10000
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Start with start(), stop with stop(); samples accumulate across runs until clear().
+    """
+
+    def __init__(self, interval: float = 0.005, max_stacks: int = DEFAULT_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.dropped_samples = 0
+        self.started_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = None):
+        with self._lock:
+            if self.running:
+                return
+            if interval:
+                self.interval = interval
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def clear(self):
+        with self._lock:
+            self.samples.clear()
+            self.sample_count = 0
+            self.dropped_samples = 0
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = [_collapse(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_id]
+            with self._lock:
+                self.samples.update(stacks)
+                self.sample_count += 1
+                if len(self.samples) > self.max_stacks:
+                    self._drop_rare_stacks()
+
+    def _drop_rare_stacks(self):
+        kept = self.samples.most_common(self.max_stacks // 2)
+        self.dropped_samples += sum(self.samples.values()) - sum(count for _, count in kept)
+        self.samples = collections.Counter(dict(kept))
+
+    def collapsed(self) -> str:
+        """
+        The samples as collapsed stacks, one 'frame;frame;... count' line per distinct stack.
+        """
+        with self._lock:
+            samples = sorted(self.samples.items())
+        return ''.join(f'{stack} {count}\n' for stack, count in samples)
+
+    def top(self, count: int = 20) -> list:
+        """
+        Return [(function, samples)] of the functions most often on top of a sampled stack.
+        """
+        leaves = collections.Counter()
+        with self._lock:
+            for stack, samples in self.samples.items():
+                leaves[stack.rsplit(';', 1)[-1]] += samples
+        return leaves.most_common(count)
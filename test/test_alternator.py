@@ -32,3 +32,39 @@ def test_write_and_read_article(alternator_client):
     assert result["text"] == "This is a test."
     # Clean up after test
     alternator_client.remove_articles(["TestArticle"])
+
+def test_scan_page_never_sends_a_non_positive_limit():
+    from botocore.stub import Stubber
+    client = AlternatorWikipediaClient('http://localhost:1', {'region_name': 'us-east-1'})
+    with Stubber(client.client) as stubber:
+        # No request at all for an empty page, which continues where it was asked to
+        assert client.scan_page('t', {'title': 'B'}, limit=0) == ([], {'title': 'B'})
+        stubber.add_response('scan', {'Items': [{'title': {'S': 'A'}}], 'LastEvaluatedKey': {'title': {'S': 'A'}}},
+                             {'TableName': 't', 'Limit': 2})
+        stubber.add_response('scan', {'Items': [{'title': {'S': 'B'}}], 'LastEvaluatedKey': {'title': {'S': 'B'}}},
+                             {'TableName': 't', 'Limit': 1, 'ExclusiveStartKey': {'title': 'A'}})
+        assert client.scan_page('t', limit=2) == ([{'title': 'A'}, {'title': 'B'}], {'title': 'B'})
+        stubber.assert_no_pending_responses()
+
+def test_get_rows_fetches_chunks_in_one_pool_per_client():
+    import threading
+    client = AlternatorWikipediaClient('http://localhost:1', {'region_name': 'us-east-1'})
+    threads = set()
+
+    def batch_get_chunk(table_name, keys, projection_expression, max_retries):
+        assert len(keys) <= 100
+        threads.add(threading.current_thread().name)
+        return [dict(key, text=key['title'].lower()) for key in keys]
+    client._batch_get_chunk = batch_get_chunk
+    keys = [{'title': f'T{i:03d}'} for i in range(250)]
+    items = client.get_rows('t', keys=keys + keys[:10], ordered=True, max_workers=2)
+    assert [item['title'] for item in items] == [key['title'] for key in keys]
+    pool = client._get_pool
+    assert pool is not None and all(name.startswith('batch-get') for name in threads)
+    # Later calls reuse the pool, close() stops it and the next call starts a new one
+    assert len(client.get_rows('t', keys=keys)) == 250
+    assert client._get_pool is pool
+    client.close()
+    assert client._get_pool is None
+    assert len(client.get_rows('t', keys=keys)) == 250
+    client.close()
@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from alternator.article_cache import CachingAlternatorWikipediaClient
+
+class CountingArticlesClient:
+    """
+    In-memory stand-in for AlternatorWikipediaClient counting the calls that reach it.
+    """
+    def __init__(self):
+        self.articles = {}
+        self.calls = []
+
+    def get_article(self, title):
+        self.calls.append(('get_article', title))
+        text = self.articles.get(title)
+        return {'title': title, 'text': text} if text is not None else None
+
+    def get_articles(self, titles):
+        self.calls.append(('get_articles', tuple(titles)))
+        return [{'title': t, 'text': self.articles[t]} for t in titles if t in self.articles]
+
+    def check_articles_exist(self, titles):
+        self.calls.append(('check_articles_exist', tuple(titles)))
+        return [t for t in titles if t in self.articles]
+
+    def add_articles(self, articles):
+        for article in articles:
+            self.articles[article['title']] = article['text']
+        return True
+
+    def remove_articles(self, titles):
+        for title in titles:
+            self.articles.pop(title, None)
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_caching_client_read_through_and_invalidation(tmp_path, shared):
+    backend = CountingArticlesClient()
+    backend.articles = {'A': 'a', 'B': 'b'}
+    client = CachingAlternatorWikipediaClient(backend, shared_path=str(tmp_path / 'cache.sqlite') if shared else None)
+
+    assert client.get_article('A') == {'title': 'A', 'text': 'a'}
+    assert client.get_article('A') == {'title': 'A', 'text': 'a'}
+    assert client.get_article('Missing') is None
+    assert client.get_article('Missing') is None
+    assert backend.calls == [('get_article', 'A'), ('get_article', 'Missing')]
+
+    # Existence is answered from entries cached by the article lookups
+    assert client.check_articles_exist(['A', 'Missing', 'B']) == ['A', 'B']
+    assert backend.calls[-1] == ('check_articles_exist', ('B',))
+    assert client.get_articles(['B', 'A', 'Missing']) == [{'title': 'B', 'text': 'b'}, {'title': 'A', 'text': 'a'}]
+    assert backend.calls[-1] == ('get_articles', ('B',))
+
+    # Writes through the wrapper update the existence cache; written articles are read back
+    # once, as the backend stores them
+    calls = len(backend.calls)
+    client.add_articles([{'title': 'Missing', 'text': 'now here'}])
+    client.remove_articles(['A'])
+    assert client.check_articles_exist(['A', 'Missing']) == ['Missing']
+    assert client.get_article('A') is None
+    assert len(backend.calls) == calls
+    backend.articles['Missing'] = 'as stored'
+    assert client.get_article('Missing') == {'title': 'Missing', 'text': 'as stored'}
+    assert client.get_article('Missing') == {'title': 'Missing', 'text': 'as stored'}
+    assert backend.calls[calls:] == [('get_article', 'Missing')]
+
+    stats = client.cache_stats()
+    assert stats['articles']['hits'] >= 4 and stats['exists']['hits'] >= 4
+    assert 0 < stats['articles']['hit_rate'] < 1
+
+def test_caching_client_entries_expire():
+    backend = CountingArticlesClient()
+    backend.articles = {'A': 'a'}
+    client = CachingAlternatorWikipediaClient(backend, ttl=0, negative_ttl=0)
+    client.get_article('A')
+    backend.articles['A'] = 'changed'
+    assert client.get_article('A')['text'] == 'changed'
+
+def test_shared_cache_stores_articles_with_decimal_attributes(tmp_path):
+    # Numeric attributes, e.g. the 'size' written with a key mirror, are read back as Decimal
+    from decimal import Decimal
+    backend = CountingArticlesClient()
+    backend.get_article = lambda title: {'title': title, 'text': 'a', 'size': Decimal('1')}
+    client = CachingAlternatorWikipediaClient(backend, shared_path=str(tmp_path / 'cache.sqlite'))
+    assert client.get_article('A') == {'title': 'A', 'text': 'a', 'size': 1}
+    assert client.get_article('A') == {'title': 'A', 'text': 'a', 'size': 1}
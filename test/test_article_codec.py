@@ -0,0 +1,24 @@
+import pytest
+from boto3.dynamodb.types import Binary
+
+from alternator.article_codec import ArticleCodecs, ZlibCodec, get_codec
+
+
+def test_codecs_round_trip_and_mixed_items():
+    codecs = ArticleCodecs(ZlibCodec())
+    text = 'Zażółć gęślą jaźń ' * 100
+    encoded = codecs.encode_item({'title': 'A', 'text': text})
+    assert encoded['codec'] == 'zlib'
+    assert isinstance(encoded['text'], bytes) and len(encoded['text']) < len(text.encode('utf-8'))
+    # Items come back from boto3 with binary attributes wrapped in Binary
+    stored = dict(encoded, text=Binary(encoded['text']))
+    assert codecs.decode_item(stored) == {'title': 'A', 'text': text}
+    # Plain items (no codec attribute) pass through unchanged
+    plain_reader = ArticleCodecs()
+    assert plain_reader.encode_item({'title': 'B', 'text': 'b'}) == {'title': 'B', 'text': 'b'}
+    assert plain_reader.decode_items([{'title': 'B', 'text': 'b'}, stored])[1]['text'] == text
+    # Projections without text keep only the other attributes
+    assert codecs.decode_item({'title': 'A', 'codec': 'zlib'}) == {'title': 'A'}
+    with pytest.raises(ValueError):
+        plain_reader.decode_item({'title': 'C', 'text': b'', 'codec': 'zstd:d1'})
+    assert get_codec(None) is None
@@ -0,0 +1,153 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import contextlib
+import logging
+from types import SimpleNamespace
+import pytest
+pytest.importorskip('aiobotocore')
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+from alternator import alternator_async_client
+from alternator.alternator_async_client import AsyncAlternatorClient, AsyncAlternatorWikipediaClient
+from alternator.alternator_client import REQUEST_SECONDS
+from alternator.bulk_writer import BulkWriteResult
+
+class FakeAsyncDynamoDB:
+    """
+    aiobotocore client stand-in whose batch_write_item stores wire-format items by 'title'.
+    Titles in reject fail the whole batch with a ValidationException, titles in
+    unprocessed_rounds come back unprocessed that many times, and throttle_calls calls fail
+    with a throttling error first.
+    """
+    def __init__(self, reject=(), unprocessed_rounds=None, throttle_calls=0):
+        self.meta = SimpleNamespace(events=HierarchicalEmitter())
+        self.items = {}
+        self.reject = set(reject)
+        self.unprocessed_rounds = dict(unprocessed_rounds or {})
+        self.throttle_calls = throttle_calls
+        self.batches = []
+
+    async def batch_write_item(self, RequestItems):
+        await asyncio.sleep(0)
+        (table_name, requests), = RequestItems.items()
+        assert len(requests) <= 25
+        self.batches.append(len(requests))
+        if self.throttle_calls:
+            self.throttle_calls -= 1
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'BatchWriteItem')
+        titles = [self._title(request) for request in requests]
+        if len(set(titles)) < len(titles) or self.reject & set(titles):
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'bad item'}}, 'BatchWriteItem')
+        unprocessed = []
+        for request, title in zip(requests, titles):
+            if self.unprocessed_rounds.get(title, 0) > 0:
+                self.unprocessed_rounds[title] -= 1
+                unprocessed.append(request)
+            elif 'PutRequest' in request:
+                self.items[title] = request['PutRequest']['Item']
+            else:
+                self.items.pop(title, None)
+        return {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+
+    @staticmethod
+    def _title(request):
+        body = request.get('PutRequest', {}).get('Item') or request['DeleteRequest']['Key']
+        return body['title']['S']
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(alternator_async_client, 'BACKOFF_BASE_SECONDS', 0.0)
+
+def _stub_session(client, fake):
+    created = []
+
+    @contextlib.asynccontextmanager
+    async def create_client(*args, **kwargs):
+        # Yield to the loop, as creating a real client does
+        await asyncio.sleep(0.01)
+        created.append(fake)
+        yield fake
+    client.session = SimpleNamespace(create_client=create_client)
+    return created
+
+def test_writes_report_each_item_like_the_bulk_writer():
+    fake = FakeAsyncDynamoDB(reject={'bad'}, unprocessed_rounds={'slow': 2, 'stuck': 100}, throttle_calls=1)
+    client = AsyncAlternatorClient('http://localhost:1', {'region_name': 'us-east-1'}, max_concurrency=4,
+                                   max_batch_bytes=10000, max_write_retries=3)
+    created = _stub_session(client, fake)
+    items = [{'title': f'a{i}', 'text': b'\x00compressed'} for i in range(40)]
+    items += [{'title': 'slow', 'text': b'\x01'}, {'title': 'bad', 'text': 'x'}, {'title': 'stuck', 'text': b'\x02'},
+              {'title': 'a0', 'text': 'replaced'}, {'title': 'huge', 'text': 'z' * 20000}]
+
+    async def run():
+        # Concurrent first calls share one client
+        results = await asyncio.gather(client.add_rows('t', items, key_names=('title',)),
+                                       client.remove_rows('t', []), client.remove_rows('t', []))
+        removed = await client.remove_rows('t', [{'title': 'a1'}, {'title': 'a1'}, {'title': 'missing'}])
+        await client.close()
+        return results[0], results[1], removed
+
+    result, empty, removed = asyncio.run(run())
+    assert len(created) == 1
+    assert isinstance(result, BulkWriteResult) and len(result) == len(items)
+    assert dict(result.failures) == {41: 'bad item', 42: 'unprocessed after 3 retries',
+                                     44: 'item of 20013 bytes exceeds the batch size limit'}
+    # The replaced a0 shares the outcome of the write that replaced it
+    assert result[0] and result[43]
+    assert fake.items['a0'] == {'title': {'S': 'a0'}, 'text': {'S': 'replaced'}}
+    assert 'slow' in fake.items and len(fake.items) == 40
+    assert isinstance(empty, BulkWriteResult) and len(empty) == 0
+    assert removed and len(removed) == 3 and 'a1' not in fake.items
+
+@pytest.fixture(scope='module')
+def moto_endpoint():
+    server_module = pytest.importorskip('moto.server')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = server_module.ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f'http://{host}:{port}'
+    server.stop()
+
+def test_wikipedia_client_against_moto(moto_endpoint, monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test')):
+        monkeypatch.setenv(name, value)
+    articles = [{'title': f'Article {i:02d}', 'text': f'text {i} zażółć'} for i in range(30)]
+    articles.append({'title': 'Article 00', 'text': 'rewritten'})
+    writes_before = REQUEST_SECONDS.snapshot(operation='BatchWriteItem')[0]
+
+    async def run():
+        async with AsyncAlternatorWikipediaClient(moto_endpoint, {'region_name': 'us-east-1'}) as client:
+            await client.delete_articles_table()
+            written = await client.add_articles(articles)
+            single = await client.add_article('Single', 'one')
+            fetched = await client.get_articles(['Article 05', 'Missing', 'Article 00'])
+            article = await client.get_article('Single')
+            existing = await client.check_articles_exist(['Missing', 'Article 29', 'Single'])
+            paged, start = [], None
+            while True:
+                page, start = await client.get_articles_page(start, 7, attributes=('title',))
+                paged.extend(a['title'] for a in page)
+                if start is None:
+                    break
+            empty_page = await client.scan_page(client.TABLE_NAME, None, 0)
+            scanned = [a async for a in client.scan_articles(total_segments=3, page_size=4)]
+            removed = await client.remove_articles(['Single', 'Missing'])
+            remaining = await client.check_articles_exist(['Single', 'Article 01'])
+            await client.delete_articles_table()
+            return written, single, fetched, article, existing, paged, empty_page, scanned, removed, remaining
+
+    written, single, fetched, article, existing, paged, empty_page, scanned, removed, remaining = asyncio.run(run())
+    assert isinstance(written, BulkWriteResult) and written and len(written) == 31
+    assert single and len(single) == 1
+    assert fetched == [{'title': 'Article 05', 'text': 'text 5 zażółć'}, {'title': 'Article 00', 'text': 'rewritten'}]
+    assert article == {'title': 'Single', 'text': 'one'}
+    assert sorted(existing) == ['Article 29', 'Single']
+    assert sorted(paged) == sorted({a['title'] for a in articles} | {'Single'})
+    assert empty_page == ([], None)
+    assert len(scanned) == 31 and {a['text'] for a in scanned} >= {'rewritten', 'one'}
+    assert removed and len(removed) == 2
+    assert remaining == ['Article 01']
+    assert REQUEST_SECONDS.snapshot(operation='BatchWriteItem')[0] > writes_before
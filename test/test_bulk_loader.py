@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+from alternator.bulk_loader import BulkLoader, LoadCheckpoint
+from wikipedia.multistream import WikipediaMultistreamReader
+from test_multistream import write_multistream_dump, make_streams
+
+class FakeArticlesClient:
+    """
+    Stands in for AlternatorWikipediaClient, recording written articles.
+    """
+    articles = {}
+    lock = threading.Lock()
+
+    def add_articles(self, articles):
+        with self.lock:
+            for article in articles:
+                self.articles[article['title']] = article['text']
+        return True
+
+def test_bulk_loader_writes_all_articles_and_checkpoints(tmp_path):
+    path = str(tmp_path / 'dump.xml.bz2')
+    index_path = str(tmp_path / 'index.bin')
+    checkpoint_path = str(tmp_path / 'load.checkpoint')
+    write_multistream_dump(path, make_streams(stream_count=6, pages_per_stream=5))
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False)
+    FakeArticlesClient.articles = {}
+    loader = BulkLoader(reader, FakeArticlesClient, batch_size=4, strip_workers=2, writers=3,
+                        queue_size=2, checkpoint_path=checkpoint_path, report_interval=0)
+    stats = loader.run(stop=20)
+    assert stats['write']['articles'] == 20
+    assert stats['next_position'] == 20
+    assert LoadCheckpoint.load(checkpoint_path) == 20
+    assert FakeArticlesClient.articles['Article 3'] == 'Article 3 is a test page.'
+    stats = loader.run(resume=True)
+    assert stats['next_position'] == 30
+    assert len(FakeArticlesClient.articles) == 30
+
+def test_bulk_loader_checkpoint_stays_before_a_broken_stream(tmp_path):
+    import bz2
+    from test_multistream import page_xml
+    path = str(tmp_path / 'dump.xml.bz2')
+    index_path = str(tmp_path / 'index.bin')
+    checkpoint_path = str(tmp_path / 'load.checkpoint')
+    streams = make_streams(stream_count=3, pages_per_stream=4)
+    offsets = write_multistream_dump(path, streams)
+    WikipediaMultistreamReader(path, index_path).reindex_multistream(index_path, progress=False)
+    # The second stream is damaged in place: it ends in an XML error after its first page
+    broken = bz2.compress((page_xml(**streams[1][0]) + '<page><id>6</broken>').encode('utf-8'))
+    with open(path, 'r+b') as f:
+        f.seek(offsets[1])
+        f.write(broken.ljust(offsets[2] - offsets[1], b'\0'))
+    for read_ahead in (0, 2):
+        FakeArticlesClient.articles = {}
+        loader = BulkLoader(WikipediaMultistreamReader(path, index_path), FakeArticlesClient, batch_size=2,
+                            strip_workers=1, writers=2, checkpoint_path=checkpoint_path, report_interval=0,
+                            read_ahead=read_ahead)
+        stats = loader.run()
+        assert stats['write']['articles'] == 9 and len(FakeArticlesClient.articles) == 9
+        assert stats['failed_streams'] == [{'offset': offsets[1], 'error': '3 of 4 indexed pages could not be read'}]
+        # Positions 5-7 were not read: a resumed load starts at the first of them
+        assert stats['next_position'] == 5
+        assert LoadCheckpoint.load(checkpoint_path) == 5
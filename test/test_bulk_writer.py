@@ -0,0 +1,116 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import pytest
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+from alternator import bulk_writer
+from alternator.bulk_writer import AIMDLimiter, BulkWriteError, BulkWriter
+
+class FakeBatchClient:
+    """
+    batch_write_item stand-in storing items by 'title'. Titles in reject are refused with a
+    ValidationException failing the whole batch, titles in unprocessed_rounds come back
+    unprocessed that many times (as deserialized echoes), and throttle_calls calls fail with
+    a throttling error first.
+    """
+    def __init__(self, reject=(), unprocessed_rounds=None, throttle_calls=0):
+        self.items = {}
+        self.reject = set(reject)
+        self.unprocessed_rounds = dict(unprocessed_rounds or {})
+        self.throttle_calls = throttle_calls
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        (table_name, requests), = RequestItems.items()
+        assert len(requests) <= 25
+        with self.lock:
+            self.batches.append(len(requests))
+            if self.throttle_calls:
+                self.throttle_calls -= 1
+                raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow down'}},
+                                  'BatchWriteItem')
+            titles = [self._title(request) for request in requests]
+            if len(set(titles)) < len(titles) or self.reject & set(titles):
+                raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'bad item'}}, 'BatchWriteItem')
+            unprocessed = []
+            for request, title in zip(requests, titles):
+                if self.unprocessed_rounds.get(title, 0) > 0:
+                    self.unprocessed_rounds[title] -= 1
+                    unprocessed.append(_echo(request))
+                elif 'PutRequest' in request:
+                    self.items[title] = request['PutRequest']['Item']
+                else:
+                    self.items.pop(title, None)
+        return {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+
+    @staticmethod
+    def _title(request):
+        body = request.get('PutRequest', {}).get('Item') or request['DeleteRequest']['Key']
+        return body['title']
+
+def _echo(request):
+    # What botocore hands back for a request: bytes as Binary
+    (kind, body), = request.items()
+    (field, item), = body.items()
+    return {kind: {field: {name: Binary(v) if isinstance(v, bytes) else v for name, v in item.items()}}}
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(bulk_writer, 'BACKOFF_BASE_SECONDS', 0.0)
+
+def test_batches_by_count_and_bytes_and_keeps_last_write_of_a_key():
+    client = FakeBatchClient()
+    writer = BulkWriter(client, max_batch_bytes=10000, initial_concurrency=2)
+    items = [{'title': f'a{i}', 'text': 'x' * 10} for i in range(60)]
+    items += [{'title': f'big{i}', 'text': 'y' * 4000} for i in range(6)]
+    items += [{'title': 'a0', 'text': 'replaced'}, {'title': 'huge', 'text': 'z' * 20000}]
+    result = writer.put('t', items, key_names=('title',))
+    assert len(result) == len(items)
+    assert not result
+    assert result.failures == [(len(items) - 1, 'item of 20013 bytes exceeds the batch size limit')]
+    assert result[0] and result[len(items) - 2]
+    assert client.items['a0']['text'] == 'replaced'
+    assert len(client.items) == 66
+    # 25-item batches, then at most two 4 KB items per 10 KB batch
+    assert sorted(client.batches) == [2, 3, 11, 25, 25]
+    assert writer.limiter.limit > 2
+    with pytest.raises(BulkWriteError) as error:
+        result.raise_for_failures()
+    assert error.value.failures == result.failures
+    assert writer.delete('t', [{'title': 'a1'}, {'title': 'a1'}, {'title': 'missing'}])
+    assert 'a1' not in client.items
+    writer.close()
+
+def test_retries_unprocessed_and_throttled_batches_and_isolates_rejected_items():
+    client = FakeBatchClient(reject={'bad'}, unprocessed_rounds={'slow': 2, 'stuck': 100}, throttle_calls=1)
+    writer = BulkWriter(client, initial_concurrency=8, max_retries=3)
+    items = [{'title': f'a{i}', 'text': b'\x00compressed'} for i in range(40)]
+    items += [{'title': 'slow', 'text': b'\x01'}, {'title': 'bad', 'text': 'x'}, {'title': 'stuck', 'text': b'\x02'}]
+    result = writer.put('t', items)
+    assert dict(result.failures) == {41: 'bad item', 42: 'unprocessed after 3 retries'}
+    assert 'slow' in client.items and len(client.items) == 41
+    assert writer.limiter.limit < 8
+
+def test_aimd_limiter_grows_per_window_and_halves_once_per_window():
+    limiter = AIMDLimiter(initial=4, maximum=6, latency_factor=0)
+    for _ in range(4):
+        limiter.on_success(0.01, sent_at=0.0)
+    assert limiter.allowed == 4
+    limiter.on_success(0.01, sent_at=0.0)
+    assert limiter.allowed == 5
+    for _ in range(100):
+        limiter.on_success(0.01, sent_at=0.0)
+    assert limiter.allowed == 6
+    limiter.on_throttle(sent_at=1e12)
+    assert limiter.allowed == 3
+    # Replies to batches sent before the decrease do not decrease again
+    limiter.on_throttle(sent_at=0.0)
+    assert limiter.allowed == 3
+    slow = AIMDLimiter(initial=8, latency_factor=2)
+    slow.on_success(0.01, sent_at=1e12)
+    for _ in range(10):
+        slow.on_success(1.0, sent_at=1e12)
+    assert slow.allowed == 1
@@ -0,0 +1,85 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from alternator.dump_sync import DumpSync, SyncManifest
+from wikipedia.multistream import WikipediaMultistreamReader
+from test_multistream import write_multistream_dump, make_streams
+
+class RecordingArticlesClient:
+    """
+    In-memory stand-in for AlternatorWikipediaClient recording every write.
+    """
+    def __init__(self):
+        self.articles = {}
+        self.written = []
+        self.removed = []
+
+    def add_articles(self, articles):
+        for article in articles:
+            self.articles[article['title']] = article['text']
+            self.written.append(article['title'])
+        return True
+
+    def remove_articles(self, titles):
+        for title in titles:
+            self.articles.pop(title, None)
+            self.removed.append(title)
+
+def load_dump(tmp_path, name, streams):
+    path = str(tmp_path / f'{name}.xml.bz2')
+    index_path = str(tmp_path / f'{name}.bin')
+    write_multistream_dump(path, streams)
+    reader = WikipediaMultistreamReader(path, index_path, converter='regex')
+    reader.reindex_multistream(index_path, progress=False)
+    return reader
+
+def test_dump_sync_writes_only_changes(tmp_path):
+    client = RecordingArticlesClient()
+    manifest = SyncManifest(str(tmp_path / 'manifest.sqlite'))
+    streams = make_streams(stream_count=3, pages_per_stream=4)
+    stats = DumpSync(load_dump(tmp_path, 'v1', streams), client, manifest, batch_size=5).run()
+    assert stats['added'] == 12 and len(client.articles) == 12 and len(manifest) == 12
+
+    # Next dump: one edited page, one deleted page, one new page
+    streams[0][1].update(text="'''Article 2''' was edited.", revision_id=999)
+    del streams[2][0]
+    streams[2].append({'page_id': 50, 'title': 'Article 50', 'text': 'New page.'})
+    client.written = []
+    stats = DumpSync(load_dump(tmp_path, 'v2', streams), client, manifest, batch_size=5).run()
+    assert (stats['added'], stats['updated'], stats['removed'], stats['unchanged']) == (1, 1, 1, 10)
+    assert sorted(client.written) == ['Article 2', 'Article 50']
+    assert client.removed == ['Article 9']
+    assert client.articles['Article 2'] == 'Article 2 was edited.'
+    assert len(manifest) == 12
+
+    # Syncing the same dump again is a no-op
+    client.written = []
+    stats = DumpSync(load_dump(tmp_path, 'v3', streams), client, manifest, compare='hash').run()
+    assert stats['unchanged'] == 12 and client.written == []
+
+def test_dump_sync_keeps_articles_of_a_broken_stream(tmp_path):
+    import bz2
+    from test_multistream import page_xml
+    client = RecordingArticlesClient()
+    manifest = SyncManifest(str(tmp_path / 'manifest.sqlite'))
+    streams = make_streams(stream_count=3, pages_per_stream=4)
+    path = str(tmp_path / 'dump.xml.bz2')
+    index_path = str(tmp_path / 'dump.bin')
+    offsets = write_multistream_dump(path, streams)
+    WikipediaMultistreamReader(path, index_path).reindex_multistream(index_path, progress=False)
+    assert DumpSync(WikipediaMultistreamReader(path, index_path), client, manifest).run()['added'] == 12
+
+    # The second stream is damaged in place: it ends in an XML error after its first page
+    broken = bz2.compress((page_xml(**streams[1][0]) + '<page><id>6</broken>').encode('utf-8'))
+    with open(path, 'r+b') as f:
+        assert len(broken) <= offsets[2] - offsets[1]
+        f.seek(offsets[1])
+        f.write(broken.ljust(offsets[2] - offsets[1], b'\0'))
+    reader = WikipediaMultistreamReader(path, index_path)
+    stats = DumpSync(reader, client, manifest).run()
+    assert stats['scanned'] == 9 and stats['removed'] == 0 and client.removed == []
+    assert stats['failed_streams'] == [{'offset': offsets[1], 'error': '3 of 4 indexed pages could not be read'}]
+    assert len(manifest) == 12
+    failures = []
+    assert len(list(reader.iter_pages(read_ahead=2, failures=failures))) == 9
+    assert failures == [(offsets[1], '3 of 4 indexed pages could not be read')]
@@ -0,0 +1,95 @@
+import sys
+import os
+import threading
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from alternator.alternator_client import AlternatorWikipediaClient
+from alternator.bulk_writer import BulkWriteResult
+from alternator.key_mirror import KeyMirror
+
+
+def test_key_mirror_lookups_pages_and_rebuild_keeps_concurrent_writes(tmp_path):
+    mirror = KeyMirror(str(tmp_path / 'keys.sqlite'))
+    assert not mirror.ready
+    mirror.finish_rebuild(mirror.begin_rebuild(), [('B', 2), ('A', 1), ('C', None)])
+    assert mirror.ready and len(mirror) == 3
+    assert mirror.contains(['C', 'Missing', 'A', 'C']) == ['C', 'A', 'C']
+    assert mirror.page(None, 2) == ([('A', 1), ('B', 2)], 'B')
+    assert mirror.page('B', 2) == ([('C', None)], None)
+    assert mirror.page('B', 0) == ([], 'B')
+
+    # A second process sees the same file and cannot claim a running rebuild
+    other = KeyMirror(mirror.path)
+    started_at = mirror.begin_rebuild()
+    assert other.begin_rebuild() is None
+    # Written while the scan runs: D added, A removed, neither in the scan result
+    other.add([('D', 4)])
+    other.remove(['A'])
+    assert mirror.contains(['A', 'D']) == ['D']
+    assert mirror.finish_rebuild(started_at, [('A', 1), ('B', 20), ('C', 3)]) == 3
+    assert other.page(None, 10) == ([('B', 20), ('C', 3), ('D', 4)], None)
+    assert other.stats()['article_bytes'] == 27 and not other.stats()['rebuilding']
+
+    mirror.remove(['B'])
+    assert other.contains(['B', 'C']) == ['C']
+    mirror.clear()
+    assert len(other) == 0 and other.ready
+
+
+def test_only_one_process_claims_a_rebuild(tmp_path):
+    mirrors = [KeyMirror(str(tmp_path / 'keys.sqlite')) for _ in range(8)]
+    barrier = threading.Barrier(len(mirrors))
+    claims = []
+
+    def claim(mirror):
+        barrier.wait()
+        claims.append(mirror.begin_rebuild())
+    threads = [threading.Thread(target=claim, args=(mirror,)) for mirror in mirrors]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claims) == len(mirrors) and sum(started is not None for started in claims) == 1
+
+
+def test_client_answers_from_the_mirror_and_confirms_hits(tmp_path, monkeypatch):
+    client = AlternatorWikipediaClient('http://localhost:1', {'region_name': 'us-east-1'},
+                                       key_mirror={'path': str(tmp_path / 'keys.sqlite')})
+    table = {}
+    requests = []
+
+    def add_rows(table_name, items, key_names=None):
+        table.update((item['title'], item) for item in items)
+        return BulkWriteResult(table_name, len(items))
+
+    def get_rows(table_name, keys=None, projection_expression=None, **kwargs):
+        requests.append([key['title'] for key in keys])
+        return [{'title': key['title']} for key in keys if key['title'] in table]
+
+    monkeypatch.setattr(client, 'add_rows', add_rows)
+    monkeypatch.setattr(client, 'get_rows', get_rows)
+    monkeypatch.setattr(client, 'scan_articles', lambda attributes, *args: iter(list(table.values())))
+
+    assert client.add_articles([{'title': 'A', 'text': 'zażółć'}, {'title': 'B', 'text': 'b'}])
+    assert table['A']['size'] == 10
+    # Without a rebuild the mirror is not trusted
+    assert client.check_articles_exist(['A', 'X']) == ['A']
+    assert requests == [['A', 'X']]
+
+    assert client.rebuild_key_mirror() == 2
+    assert client.check_articles_exist(['X', 'Y']) == []
+    assert client.check_articles_exist(['B', 'X', 'A']) == ['B', 'A']
+    assert requests[1:] == [['B', 'A']]
+    assert client.get_articles_page(None, 10, attributes=('title',)) == (
+        [{'title': 'A', 'size': 10}, {'title': 'B', 'size': 1}], None)
+
+    # A title removed behind the mirror's back is confirmed missing and dropped
+    del table['B']
+    assert client.check_articles_exist(['B']) == []
+    assert client.key_mirror.contains(['A', 'B']) == ['A']
+
+
+def test_rebuild_without_a_key_mirror_is_refused():
+    client = AlternatorWikipediaClient('http://localhost:1', {'region_name': 'us-east-1'})
+    with pytest.raises(ValueError, match='no key mirror configured'):
+        client.rebuild_key_mirror()
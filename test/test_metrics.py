@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from telemetry.metrics import MetricsRegistry, collect_timings, propagate, record, span
+from telemetry.profiler import SamplingProfiler
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram('op_seconds', 'Operation latency', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, op='get')
+    registry.counter('errors_total', 'Errors', ('status',)).inc(2, status='5"00')
+    assert registry.histogram('op_seconds') is latency
+    with pytest.raises(ValueError):
+        registry.counter('op_seconds')
+    lines = registry.render().splitlines()
+    assert lines[:3] == ['# HELP errors_total Errors', '# TYPE errors_total counter', 'errors_total{status="5\\"00"} 2']
+    assert 'op_seconds_bucket{op="get",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{op="get",le="1.0"} 3' in lines
+    assert 'op_seconds_bucket{op="get",le="+Inf"} 4' in lines
+    assert 'op_seconds_sum{op="get"} 4.05' in lines
+    assert 'op_seconds_count{op="get"} 4' in lines
+
+def test_timings_are_collected_per_context_and_across_pools():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('stage_seconds', labelnames=('stage',))
+    record('outside', 1.0, histogram)
+    with collect_timings() as timings:
+        with span('work', histogram):
+            time.sleep(0.01)
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(propagate(lambda _: record('pooled', 0.25, histogram)), range(3)))
+            pool.submit(record, 'lost', 1.0, histogram).result()
+    assert set(timings.stages) == {'work', 'pooled'}
+    assert timings.stages['pooled'] == (0.75, 3)
+    assert timings.stages['work'][0] >= 0.01
+    assert timings.server_timing().endswith('pooled;dur=750.00;desc="3x"')
+    assert histogram.snapshot(stage='lost') == (1, 1.0)
+
+def test_sampling_profiler_collects_stacks():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    assert not profiler.running
+    assert profiler.sample_count > 0
+    assert 'busy_loop' in profiler.collapsed()
+    # Functions, not lines: the loop is a single frame however many lines were sampled
+    assert {function for function, _ in profiler.top(50) if 'busy_loop' in function} == {'busy_loop (test_metrics.py)'}
+    profiler.clear()
+    assert profiler.collapsed() == ''
+
+    profiler = SamplingProfiler(max_stacks=4)
+    for i in range(10):
+        profiler.samples.update({f'stack{i}': i + 1})
+        if len(profiler.samples) > profiler.max_stacks:
+            profiler._drop_rare_stacks()
+    assert len(profiler.samples) <= 4 and 'stack9' in profiler.samples
+    assert profiler.dropped_samples + sum(profiler.samples.values()) == sum(range(1, 11))
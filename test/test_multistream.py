@@ -0,0 +1,381 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import bz2
+import struct
+import pytest
+from wikipedia.binary_index import BinaryIndex, dump_checksum
+from wikipedia.multistream import WikipediaMultistreamReader, find_stream_offsets
+from wikipedia.stream_cache import StreamCache
+
+SITEINFO = '<mediawiki xml:lang="en">\n  <siteinfo>\n    <sitename>Wikipedia</sitename>\n  </siteinfo>\n'
+
+def page_xml(page_id, title, text, ns=0, redirect=None, revision_id=None):
+    redirect_xml = f'    <redirect title="{redirect}" />\n' if redirect else ''
+    return (
+        '  <page>\n'
+        f'    <title>{title}</title>\n'
+        f'    <ns>{ns}</ns>\n'
+        f'    <id>{page_id}</id>\n'
+        f'{redirect_xml}'
+        '    <revision>\n'
+        f'      <id>{revision_id or page_id * 10}</id>\n'
+        f'      <text bytes="{len(text)}" xml:space="preserve">{text}</text>\n'
+        '    </revision>\n'
+        '  </page>\n'
+    )
+
+def write_multistream_dump(path, streams, compresslevel=9):
+    """
+    Write a synthetic multistream dump. streams is a list of lists of page dicts
+    (keyword arguments of page_xml). Returns the offsets of the page streams.
+    compresslevel sets the bzip2 block size (100k to 900k).
+    """
+    offsets = []
+    with open(path, 'wb') as f:
+        f.write(bz2.compress(SITEINFO.encode('utf-8')))
+        for pages in streams:
+            offsets.append(f.tell())
+            xml = ''.join(page_xml(**page) for page in pages)
+            f.write(bz2.compress(xml.encode('utf-8'), compresslevel))
+        f.write(bz2.compress(b'</mediawiki>\n'))
+    return offsets
+
+def make_streams(stream_count=5, pages_per_stream=4):
+    streams = []
+    page_id = 1
+    for _ in range(stream_count):
+        pages = []
+        for _ in range(pages_per_stream):
+            pages.append({'page_id': page_id, 'title': f'Article {page_id}',
+                          'text': f"'''Article {page_id}''' is a [[test]] page."})
+            page_id += 1
+        streams.append(pages)
+    # Pages that the reindexer must skip
+    streams[0].append({'page_id': 1000, 'title': 'Redirect page', 'text': '#REDIRECT [[Article 1]]',
+                       'redirect': 'Article 1'})
+    streams[1].append({'page_id': 1001, 'title': 'Template:Infobox', 'text': '{{{1}}}', 'ns': 10})
+    return streams
+
+@pytest.fixture
+def dump(tmp_path):
+    path = str(tmp_path / 'dump-multistream.xml.bz2')
+    offsets = write_multistream_dump(path, make_streams())
+    return path, offsets
+
+def test_find_stream_offsets(dump):
+    path, offsets = dump
+    found = find_stream_offsets(path)
+    assert set(offsets) <= set(found)
+    assert found[0] == 0
+
+def test_reindex_and_read_articles(dump, tmp_path):
+    path, offsets = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    assert reader.reindex_multistream(index_path, progress=False) == 20
+    entries = reader.list_binary_index_entries(0, 100)
+    assert [page_id for _, page_id, _ in entries] == list(range(1, 21))
+    assert entries[4][0] == offsets[1]
+    articles = reader.list_articles_by_index(start=3, count=3)
+    assert [title for title, _ in articles] == ['Article 4', 'Article 5', 'Article 6']
+    assert articles[0][1] == 'Article 4 is a test page.'
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_reindex_matches_serial(dump, tmp_path, workers):
+    path, _ = dump
+    serial_path = str(tmp_path / 'serial.bin')
+    parallel_path = str(tmp_path / 'parallel.bin')
+    reader = WikipediaMultistreamReader(path, None)
+    serial_count = reader.reindex_multistream(serial_path, progress=False)
+    parallel_count = reader.reindex_multistream(parallel_path, progress=False, workers=workers)
+    assert parallel_count == serial_count
+    with open(serial_path, 'rb') as a, open(parallel_path, 'rb') as b:
+        assert a.read() == b.read()
+
+def test_stream_cache_serves_repeated_and_adjacent_reads(dump, tmp_path):
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    cache = StreamCache(max_bytes=1024 * 1024, max_entries=2)
+    reader = WikipediaMultistreamReader(path, index_path, stream_cache=cache)
+    reader.reindex_multistream(index_path, progress=False)
+    first = reader.list_articles_by_index(start=0, count=1)
+    assert cache.stats()['misses'] == 1
+    assert reader.list_articles_by_index(start=1, count=1) != first
+    assert reader.list_articles_by_index(start=0, count=1) == first
+    assert cache.stats()['hits'] == 2
+    reader.list_articles_by_index(start=4, count=12)
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 2
+
+def test_binary_index_lookups(dump, tmp_path):
+    path, offsets = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False)
+    index = reader.get_binary_index()
+    assert len(index) == 20
+    assert index.take([7, 0, 19]) == [(offsets[1], 8, 3), (offsets[0], 1, 0), (offsets[4], 20, 3)]
+    assert list(index.positions_for_page_ids([20, 1000, 1])) == [19, -1, 0]
+    assert reader.find_index_position(6) == 5
+    assert reader.find_index_position(12345) is None
+    with pytest.raises(IndexError):
+        index.take([20])
+
+def test_binary_index_v2_metadata_and_counts(dump, tmp_path):
+    path, offsets = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False)
+    index = BinaryIndex(index_path)
+    assert index.version == 2
+    assert index.dump_size == os.path.getsize(path)
+    assert index.checksum == dump_checksum(path)
+    assert index.stream_count == 5
+    assert len(index.records) == 22
+    assert index.count() == 20
+    assert index.count(include_redirects=True) == 21
+    assert index.count(namespaces=None, include_redirects=True) == 22
+    assert index.namespace_counts() == {0: 21, 10: 1}
+    assert index.title_at(19) == 'Article 20'
+    assert list(index.stream_offsets()) == offsets
+    # Views over other selections share the same file
+    everything = BinaryIndex(index_path, namespaces=None, include_redirects=True)
+    assert len(everything) == 22
+    assert everything.slice(4, 1) == [(offsets[0], 1000, 4)]
+    assert everything.title_at(9) == 'Template:Infobox'
+    assert index.select(min_text_length=36).size == 11
+
+def test_binary_index_reads_version_1_files(dump, tmp_path):
+    path, offsets = dump
+    index_path = str(tmp_path / 'legacy.bin')
+    with open(index_path, 'wb') as f:
+        for page_number, page_id in enumerate([1, 2, 3]):
+            f.write(struct.pack('>QQQ', offsets[0], page_number, page_id))
+    index = BinaryIndex(index_path)
+    assert index.version == 1 and not index.has_metadata
+    assert len(index) == 3
+    assert index.slice(1, 5) == [(offsets[0], 2, 1), (offsets[0], 3, 2)]
+    assert index.title_at(0) is None
+    with pytest.raises(ValueError):
+        index.count()
+    reader = WikipediaMultistreamReader(path, index_path)
+    assert [title for title, _ in reader.list_articles_by_index(0, 3)] == ['Article 1', 'Article 2', 'Article 3']
+
+def test_title_index_lookup_and_prefix_search(dump, tmp_path):
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False, workers=2, title_index_path=f'{index_path}.titles')
+    title, text = reader.get_article_by_title('Article 17')
+    assert title == 'Article 17'
+    assert text == 'Article 17 is a test page.'
+    assert reader.get_article_by_title('Template:Infobox') is None
+    assert reader.search_titles('Article 1', count=3) == [('Article 1', 0), ('Article 10', 9), ('Article 11', 10)]
+    assert reader.search_titles('Nothing') == []
+
+def test_title_and_search_indexes_follow_a_reindex(tmp_path):
+    path = str(tmp_path / 'dump.xml.bz2')
+    index_path = str(tmp_path / 'index.bin')
+    paths = {'title_index_path': f'{index_path}.titles', 'search_index_path': f'{index_path}.search'}
+    write_multistream_dump(path, make_streams())
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False, **paths)
+    assert reader.search_titles('Article 2', count=1) == [('Article 2', 1)]
+    assert reader.search_articles('volcano') == []
+
+    # The dump is replaced and reindexed by another process: a new first stream shifts every position
+    streams = make_streams()
+    streams.insert(0, [{'page_id': 500, 'title': 'Volcano', 'text': 'A volcano.'}])
+    write_multistream_dump(path, streams)
+    WikipediaMultistreamReader(path, index_path).reindex_multistream(index_path, progress=False, **paths)
+    assert reader.search_titles('Article 2', count=1) == [('Article 2', 2)]
+    assert reader.get_article_by_title('Article 2')[0] == 'Article 2'
+    assert [position for position, _ in reader.search_articles('volcano')] == [0]
+
+def test_title_index_writer_merges_spilled_runs(tmp_path):
+    from wikipedia.title_index import TitleIndex, TitleIndexWriter
+    path = str(tmp_path / 'titles')
+    titles = [f'Title {i:03d}' for i in range(100)]
+    with TitleIndexWriter(path, run_size=7) as writer:
+        for position, title in reversed(list(enumerate(titles))):
+            writer.add(title, position)
+    index = TitleIndex(path)
+    assert len(index) == 100
+    assert [index.title_at(i) for i in range(100)] == titles
+    assert index.lookup('Title 042') == 42
+
+def test_text_index_checkpoints(tmp_path):
+    from wikipedia.index_checkpoints import IndexCheckpoints
+    index_path = str(tmp_path / 'index.txt.bz2')
+    with open(index_path, 'wb') as f:
+        for stream in range(5):
+            lines = ''.join(f'{stream * 1000}:{n}:Title {n}\n' for n in range(stream * 10, stream * 10 + 10))
+            f.write(bz2.compress(lines.encode('utf-8')))
+    reader = WikipediaMultistreamReader(None, index_path)
+    assert reader.list_index_entries(start=37, count=4) == [
+        ('3000', 37, 'Title 37'), ('3000', 38, 'Title 38'), ('3000', 39, 'Title 39'), ('4000', 40, 'Title 40')
+    ]
+    checkpoints = IndexCheckpoints(f'{index_path}.checkpoints', index_path)
+    assert len(checkpoints) == 5
+    offset, first_line = checkpoints.locate(37)
+    assert first_line == 30
+    assert offset > 0
+    assert reader.list_index_entries(start=0, count=2)[1] == ('0', 1, 'Title 1')
+
+def test_iter_articles_streams_and_resumes(dump, tmp_path):
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False)
+    articles = list(reader.iter_articles())
+    assert [page_id for page_id, _, _ in articles] == list(range(1, 21))
+    assert articles[0][2] == 'Article 1 is a test page.'
+    resumed = list(reader.iter_articles(start=6, stop=10, strip_code=False))
+    assert [title for _, title, _ in resumed] == ['Article 7', 'Article 8', 'Article 9', 'Article 10']
+    assert resumed[0][2] == "'''Article 7''' is a [[test]] page."
+    assert list(reader.iter_pages(read_ahead=2)) == list(reader.iter_pages())
+    reader.close()
+
+@pytest.mark.parametrize('convert_workers, extract_workers', [(0, 0), (2, 0), (0, 2)])
+def test_get_articles_by_positions_keeps_request_order(dump, tmp_path, convert_workers, extract_workers):
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path, fetch_workers=4, convert_workers=convert_workers,
+                                        extract_workers=extract_workers)
+    reader.reindex_multistream(index_path, progress=False)
+    articles = reader.get_articles_by_positions([17, 2, 9, 2, 0])
+    assert [title for title, _ in articles] == ['Article 18', 'Article 3', 'Article 10', 'Article 3', 'Article 1']
+    assert articles[0][1] == 'Article 18 is a test page.'
+    assert reader.get_articles_by_positions([5], strip_code=False) == [('Article 6', "'''Article 6''' is a [[test]] page.")]
+    assert reader.get_articles_by_positions([]) == []
+    with pytest.raises(IndexError):
+        reader.get_articles_by_positions([3, 20])
+    reader.close()
+
+def test_text_converters_and_persistent_cache(dump, tmp_path):
+    from wikipedia.text_conversion import StrippedTextCache, regex_strip
+    assert regex_strip("'''Bold''' [[Link|label]] {{Infobox|a={{b}}}} text<ref>cite</ref>\n== Head ==") == \
+        'Bold label  text\nHead'
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    raw_reader = WikipediaMultistreamReader(path, index_path, converter='raw')
+    raw_reader.reindex_multistream(index_path, progress=False)
+    assert raw_reader.list_articles_by_index(0, 1) == [('Article 1', "'''Article 1''' is a [[test]] page.")]
+    cache = StrippedTextCache(str(tmp_path / 'text.sqlite'))
+    reader = WikipediaMultistreamReader(path, index_path, converter='regex', text_cache=cache)
+    first = reader.list_articles_by_index(0, 3)
+    assert first[0] == ('Article 1', 'Article 1 is a test page.')
+    assert reader.list_articles_by_index(0, 3) == first
+    assert cache.stats()['hits'] == 3
+    assert cache.get(1, 10, 'regex') == 'Article 1 is a test page.'
+    assert cache.get(1, 11, 'regex') is None
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_reindex_reports_broken_streams(tmp_path, workers):
+    path = str(tmp_path / 'broken.xml.bz2')
+    write_multistream_dump(path, make_streams(stream_count=3))
+    # Append a stream whose second page is cut in the middle, then a valid stream
+    broken = (page_xml(5000, 'Before break', 'ok') + '  <page>\n    <title>Cut</title>\n  </revision>\n').encode()
+    with open(path, 'r+b') as f:
+        data = f.read()
+        closing = bz2.compress(b'</mediawiki>\n')
+        f.seek(len(data) - len(closing))
+        broken_offset = f.tell()
+        f.write(bz2.compress(broken))
+        f.write(bz2.compress(page_xml(6000, 'After break', 'ok').encode()))
+        f.write(closing)
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    assert reader.reindex_multistream(index_path, progress=False, workers=workers) == 14
+    assert [offset for offset, _ in reader.reindex_failures] == [broken_offset]
+    assert 'mismatched tag' in reader.reindex_failures[0][1]
+    ids = [page_id for _, page_id, _ in reader.list_binary_index_entries(0, 100)]
+    assert ids[-2:] == [5000, 6000]
+
+def test_reindex_runs_as_a_script(dump, tmp_path):
+    import subprocess
+    path, _ = dump
+    script = os.path.join(os.path.dirname(__file__), '..', 'wikipedia', 'multistream.py')
+    index_path = str(tmp_path / 'index.bin')
+    # Outside the repository, with nothing on PYTHONPATH
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONPATH'}
+    completed = subprocess.run([sys.executable, script, '--reindex', path, index_path], cwd=str(tmp_path), env=env,
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert 'Reindexing complete. 20 articles' in completed.stdout
+
+def test_block_index_reads_pages_from_the_nearest_block(tmp_path):
+    import random
+    from wikipedia.block_index import BlockIndex
+    rng = random.Random(0)
+    words = [f'w{rng.getrandbits(32):08x}' for _ in range(3000)]
+    # One large stream with 100k bzip2 blocks, as in a dump that is not split into streams
+    pages = [{'page_id': i, 'title': f'Article {i}', 'text': ' '.join(rng.choices(words, k=150))}
+             for i in range(1, 301)]
+    path = str(tmp_path / 'single-stream.xml.bz2')
+    index_path = str(tmp_path / 'index.bin')
+    write_multistream_dump(path, [pages], compresslevel=1)
+    plain = WikipediaMultistreamReader(path, index_path, converter='raw')
+    plain.reindex_multistream(index_path, progress=False, block_index_path=f'{index_path}.blocks')
+    block_index = BlockIndex(f'{index_path}.blocks', path)
+    assert len(block_index) > 3
+    level, start_bit, _, _ = block_index.locate(block_index.blocks[0]['stream_offset'], 280)
+    assert start_bit > block_index.blocks[0]['bit_offset']
+
+    reader = WikipediaMultistreamReader(path, index_path, converter='raw')
+    assert reader.get_block_index() is not None
+    for position in (0, 150, 299):
+        assert reader.list_articles_by_index(position, 2) == [
+            (page['title'], page['text']) for page in pages[position:position + 2]]
+    assert [page_id for _, page_id, _, _, _ in reader.iter_pages(200, 210)] == list(range(201, 211))
+
+def test_search_index_ranks_articles_and_merges_runs(tmp_path):
+    from wikipedia.search_index import SearchIndex, SearchIndexWriter, decode_varints, encode_varints
+    values = [0, 1, 127, 128, 300, 2 ** 32, 2 ** 63]
+    assert decode_varints(encode_varints(values)).tolist() == values
+    path = str(tmp_path / 'dump.xml.bz2')
+    streams = make_streams()
+    streams[2][1]['text'] = 'Volcanoes erupt. A volcano is a [[mountain]]; this volcano is active.'
+    streams[3][0]['text'] = 'A lake near a volcano.'
+    write_multistream_dump(path, streams)
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path)
+    reader.reindex_multistream(index_path, progress=False, search_index_path=f'{index_path}.search')
+    matches = reader.search_articles('Volcano')
+    assert [position for position, _ in matches] == [9, 12]
+    assert matches[0][1] > matches[1][1] > 0
+    assert reader.search_articles('volcano mountain', count=1)[0][0] == 9
+    assert reader.search_articles('nothing matches') == []
+    positions = [position for position, _ in reader.search_articles('test page', count=3)]
+    assert [title for title, _ in reader.get_articles_by_positions(positions)] == ['Article 1', 'Article 2', 'Article 3']
+    # A writer spilling a run every few postings produces the same index
+    single = SearchIndex(f'{index_path}.search')
+    spilled_path = str(tmp_path / 'spilled.search')
+    with SearchIndexWriter(spilled_path, run_postings=7) as writer:
+        for position, _, title, text in reader.iter_articles(with_positions=True):
+            writer.add(position, f'{title}\n{text}')
+    with open(f'{index_path}.search', 'rb') as a, open(spilled_path, 'rb') as b:
+        assert a.read() == b.read()
+    assert single.document_frequency('article') == 20
+    writer = SearchIndexWriter(str(tmp_path / 'unordered.search'))
+    writer.add(3, 'text')
+    with pytest.raises(ValueError):
+        writer.add(2, 'text')
+    reader.close()
+
+def test_reader_records_stage_timings_across_fetch_threads(dump, tmp_path):
+    from telemetry import metrics
+    path, _ = dump
+    index_path = str(tmp_path / 'index.bin')
+    reader = WikipediaMultistreamReader(path, index_path, fetch_workers=4, converter='regex')
+    reader.reindex_multistream(index_path, progress=False)
+    decompressed_before = metrics.STAGE_BYTES.value(stage='decompress', direction='out')
+    with metrics.collect_timings() as timings:
+        reader.get_articles_by_positions([0, 5, 10, 15])
+    assert set(timings.stages) == {'decompress', 'parse', 'strip'}
+    assert timings.stages['decompress'][1] == 4
+    assert metrics.STAGE_BYTES.value(stage='decompress', direction='out') > decompressed_before
+    assert 'wikipedia_stage_seconds_count{stage="parse"}' in metrics.REGISTRY.render()
+    reader.close()
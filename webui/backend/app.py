@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 import yaml
 from datetime import datetime
@@ -10,29 +10,272 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from alternator.alternator_client import AlternatorWikipediaClient
+from alternator.article_cache import CachingAlternatorWikipediaClient
+from telemetry import metrics
+from telemetry.profiler import SamplingProfiler
 
 app = Flask(__name__)
 CORS(app)
 
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.yaml')
+CONFIG_PATH = os.environ.get('BACKEND_CONFIG', os.path.join(os.path.dirname(__file__), 'config.yaml'))
+# Seconds between checks of config.yaml for changes
+CONFIG_RELOAD_INTERVAL = float(os.environ.get('BACKEND_CONFIG_RELOAD_INTERVAL', 2))
 TEST_RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'pytest_results.json')
 TEST_RUNNING_FLAG = os.path.join(os.path.dirname(__file__), 'pytest_running.flag')
 
-def load_config():
+_config = None
+_config_mtime = None
+_config_lock = threading.Lock()
+_config_watcher_pid = None
+
+def _read_config():
+    mtime = os.stat(CONFIG_PATH).st_mtime_ns
     with open(CONFIG_PATH, 'r') as f:
-        return yaml.safe_load(f)
-    
+        return yaml.safe_load(f) or {}, mtime
+
+def _watch_config():
+    """
+    Reload config.yaml when its modification time changes. A file that fails to parse is
+    reported and the previous configuration stays in use.
+    """
+    global _config, _config_mtime
+    seen_mtime = _config_mtime
+    while True:
+        time.sleep(CONFIG_RELOAD_INTERVAL)
+        try:
+            mtime = os.stat(CONFIG_PATH).st_mtime_ns
+            if mtime == seen_mtime:
+                continue
+            seen_mtime = mtime
+            config, mtime = _read_config()
+        except (OSError, yaml.YAMLError) as e:
+            app.logger.warning("Keeping the current configuration, %s could not be reloaded: %s", CONFIG_PATH, e)
+            continue
+        with _config_lock:
+            _config, _config_mtime = config, mtime
+        app.logger.info("Reloaded %s", CONFIG_PATH)
+
+def load_config():
+    """
+    Return the parsed config.yaml. The file is parsed on first use; afterwards a watcher thread
+    of each (worker) process swaps in the new configuration when the file changes, so requests
+    never touch the file.
+    """
+    global _config, _config_mtime, _config_watcher_pid
+    config = _config
+    if config is not None and (_config_watcher_pid == os.getpid() or CONFIG_RELOAD_INTERVAL <= 0):
+        return config
+    with _config_lock:
+        if _config is None:
+            _config, _config_mtime = _read_config()
+        if _config_watcher_pid != os.getpid() and CONFIG_RELOAD_INTERVAL > 0:
+            _config_watcher_pid = os.getpid()
+            threading.Thread(target=_watch_config, name='config-watcher', daemon=True).start()
+        return _config
+
+_cached_clients = {}
+_cached_clients_lock = threading.Lock()
+
 def get_client():
-    return AlternatorWikipediaClient(load_config().get('alternator', {})['endpoint_url'])
+    """
+    Return the process-wide Alternator client for the configured endpoint.
+    Optional botocore settings (max_pool_connections, read_timeout, retries, ...) are read
+    from the 'client_config' section of the 'alternator' config, the optional article text
+    compression from 'codec' ('zlib' or 'zstd') and 'codec_dictionary', the bulk writer settings
+    (max_concurrency, max_batch_bytes, ...) from 'writer' and the key mirror (path, max_age,
+    confirm_hits) from 'key_mirror'; a key mirror that is not ready is rebuilt in the background.
+    With a 'cache' section (ttl, negative_ttl, max_bytes, shared_path), the client is wrapped
+    in a CachingAlternatorWikipediaClient.
+    """
+    alternator_cfg = load_config().get('alternator', {})
+    client = AlternatorWikipediaClient.shared(
+        alternator_cfg['endpoint_url'],
+        codec=alternator_cfg.get('codec'),
+        codec_dictionary=alternator_cfg.get('codec_dictionary'),
+        writer_options=alternator_cfg.get('writer'),
+        key_mirror=alternator_cfg.get('key_mirror'),
+        **(alternator_cfg.get('client_config') or {})
+    )
+    if client.key_mirror is not None and not client.key_mirror.ready:
+        start_key_mirror_rebuild(client)
+    cache_cfg = alternator_cfg.get('cache')
+    if not cache_cfg:
+        return client
+    key = (id(client), repr(sorted(cache_cfg.items())))
+    with _cached_clients_lock:
+        if key not in _cached_clients:
+            _cached_clients[key] = CachingAlternatorWikipediaClient(client, **cache_cfg)
+        return _cached_clients[key]
 #client.create_articles_table()
 
+_key_mirror_rebuilds = set()
+
+def start_key_mirror_rebuild(client):
+    """
+    Rebuild the client's key mirror in a background thread, unless this process is already
+    rebuilding it (other processes are kept out by KeyMirror.begin_rebuild).
+    """
+    with _cached_clients_lock:
+        if id(client) in _key_mirror_rebuilds:
+            return
+        _key_mirror_rebuilds.add(id(client))
+
+    def rebuild():
+        try:
+            count = client.rebuild_key_mirror()
+            if count is not None:
+                app.logger.info("Rebuilt the Alternator key mirror, %d titles", count)
+        except Exception:
+            app.logger.exception("Could not rebuild the Alternator key mirror")
+        finally:
+            with _cached_clients_lock:
+                _key_mirror_rebuilds.discard(id(client))
+    threading.Thread(target=rebuild, name='key-mirror-rebuild', daemon=True).start()
+
+_stream_cache = None
+_stream_cache_lock = threading.Lock()
+
+def get_stream_cache(wikipedia_cfg):
+    """
+    Return the process-wide cache of parsed dump streams, shared by all readers.
+    Configured by the optional 'stream_cache' section of the 'wikipedia' config
+    (max_bytes, max_entries, policy).
+    """
+    global _stream_cache
+    from wikipedia.stream_cache import StreamCache
+    with _stream_cache_lock:
+        if _stream_cache is None:
+            _stream_cache = StreamCache(**(wikipedia_cfg.get('stream_cache') or {}))
+        return _stream_cache
+
+_text_caches = {}
+
+def get_text_cache(wikipedia_cfg):
+    """
+    Return the persistent cache of converted article text configured by 'text_cache', or None.
+    """
+    from wikipedia.text_conversion import StrippedTextCache
+    path = wikipedia_cfg.get('text_cache')
+    if not path:
+        return None
+    with _stream_cache_lock:
+        if path not in _text_caches:
+            _text_caches[path] = StrippedTextCache(path)
+        return _text_caches[path]
+
+_reader = None
+_reader_cfg = None
+# Seconds a reader replaced after a config change stays open
+READER_CLOSE_DELAY = 60
+
 def get_reader():
+    """
+    Return the dump reader shared by the threads of this process, rebuilt only when the
+    'wikipedia' config section changes. Keeping it alive keeps its memory-mapped indexes open
+    between requests. Its pools are sized by fetch_workers, convert_workers and extract_workers
+    (see WikipediaMultistreamReader); extract_workers moves the CPU-bound parsing of articles
+    out of the request threads into processes.
+    """
+    global _reader, _reader_cfg
     from wikipedia.multistream import WikipediaMultistreamReader
     config = load_config()
     wikipedia_cfg = config.get('wikipedia', {})
+    with _stream_cache_lock:
+        if _reader is not None and _reader_cfg == wikipedia_cfg:
+            return _reader
     xml_path = wikipedia_cfg.get('dump')
     index_path = wikipedia_cfg.get('index')
-    return WikipediaMultistreamReader(xml_path, index_path)
+    reader = WikipediaMultistreamReader(xml_path, index_path, stream_cache=get_stream_cache(wikipedia_cfg),
+                                        title_index_path=wikipedia_cfg.get('title_index'),
+                                        search_index_path=wikipedia_cfg.get('search_index'),
+                                        converter=wikipedia_cfg.get('converter', 'mwparserfromhell'),
+                                        text_cache=get_text_cache(wikipedia_cfg),
+                                        fetch_workers=wikipedia_cfg.get('fetch_workers'),
+                                        convert_workers=wikipedia_cfg.get('convert_workers', 0),
+                                        extract_workers=wikipedia_cfg.get('extract_workers', 0))
+    with _stream_cache_lock:
+        previous, _reader, _reader_cfg = _reader, reader, wikipedia_cfg
+    if previous is not None:
+        # Requests in flight may still be reading with the replaced reader
+        timer = threading.Timer(READER_CLOSE_DELAY, previous.close)
+        timer.daemon = True
+        timer.start()
+    return reader
+
+HTTP_REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'http_request_seconds', 'Latency of backend API requests', ('endpoint', 'method', 'status'))
+
+profiler = SamplingProfiler()
+
+def metrics_config():
+    """
+    The optional 'metrics' config section: server_timing (add a Server-Timing header to every
+    response) and profiler (start the sampling profiler with the backend).
+    """
+    return load_config().get('metrics') or {}
+
+@app.before_request
+def start_request_timings():
+    g.request_start = time.perf_counter()
+    g.timings = metrics.start_timings()
+
+@app.after_request
+def record_request_timings(response):
+    """
+    Record the request latency and, when enabled in the config or asked for with
+    ?server_timing=1, report the time spent per stage in a Server-Timing header.
+    """
+    start = g.pop('request_start', None)
+    timings = g.pop('timings', None)
+    if start is None or timings is None:
+        return response
+    metrics.stop_timings(timings)
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if request.args.get('server_timing') == '1' or metrics_config().get('server_timing'):
+        stages = timings.server_timing()
+        total = f'total;dur={elapsed * 1000:.2f}'
+        response.headers['Server-Timing'] = f'{stages}, {total}' if stages else total
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    API endpoint exporting the backend, reader and Alternator client metrics in the Prometheus text format.
+    """
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiler', methods=['GET'])
+def get_profiler():
+    """
+    API endpoint returning the sampling profiler state and its hottest functions, or with
+    ?format=collapsed the samples as collapsed stacks (for flamegraph.pl or speedscope).
+    """
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    return jsonify({'running': profiler.running, 'interval': profiler.interval,
+                    'samples': profiler.sample_count, 'dropped_samples': profiler.dropped_samples,
+                    'top': profiler.top(int(request.args.get('count', 20)))})
+
+@app.route('/api/profiler', methods=['POST'])
+def toggle_profiler():
+    """
+    API endpoint starting, stopping or clearing the sampling profiler.
+    JSON body: {"action": "start" | "stop" | "clear", "interval": seconds between samples (optional)}
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action == 'start':
+        profiler.start(data.get('interval'))
+    elif action == 'stop':
+        profiler.stop()
+    elif action == 'clear':
+        profiler.clear()
+    else:
+        return jsonify({'error': 'action must be start, stop or clear'}), 400
+    return jsonify({'running': profiler.running, 'samples': profiler.sample_count})
 
 @app.route('/api/deadline')
 def get_deadline():
@@ -63,7 +306,33 @@ def get_wikipedia_articles():
         {'index': start + i, 'title': title, 'text': text, 'alternator': title in existing_titles}
         for i, (title, text) in enumerate(articles)
     ]
-    return jsonify({'articles': articles_json})
+    return jsonify({'articles': articles_json, 'totalCount': len(reader.get_binary_index())})
+
+@app.route('/api/wikipedia-article-by-title')
+def get_wikipedia_article_by_title():
+    title = request.args.get('title')
+    if not title:
+        return jsonify({'error': 'Missing title'}), 400
+    reader = get_reader()
+    try:
+        article = reader.get_article_by_title(title)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    if article is None:
+        return jsonify({'error': 'Article not found'}), 404
+    title, text = article
+    return jsonify({'title': title, 'text': text})
+
+@app.route('/api/wikipedia-title-search')
+def search_wikipedia_titles():
+    prefix = request.args.get('prefix', '')
+    count = int(request.args.get('count', 10))
+    reader = get_reader()
+    try:
+        matches = reader.search_titles(prefix, count)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify({'titles': [{'index': index, 'title': title} for title, index in matches]})
 
 @app.route('/api/alternator-wikipedia-table', methods=['DELETE'])
 def delete_alternator_wikipedia_table():
@@ -80,7 +349,9 @@ def add_alternator_wikipedia_article():
         return jsonify({'error': 'Article not found'}), 404
     title, text = articles[0]
     client = get_client()
-    client.add_article(title, text)
+    result = client.add_article(title, text)
+    if not result:
+        return jsonify({'error': result.errors[0], 'title': title}), 502
     return jsonify({'status': 'added', 'title': title})
 
 @app.route('/api/alternator-wikipedia-article', methods=['DELETE'])
@@ -89,36 +360,62 @@ def remove_alternator_wikipedia_article():
     if not title:
         return jsonify({'error': 'Missing title'}), 400
     client = get_client()
-    client.remove_articles([title])
+    result = client.remove_articles([title])
+    if result is not None and not result:
+        return jsonify({'error': result.errors[0], 'title': title}), 502
     return jsonify({'status': 'removed', 'title': title})
 
 @app.route('/api/get_articles_page_from', methods=['GET'])
 def get_alternator_wikipedia_articles_page():
     """
-    API endpoint to fetch a page of articles from Alternator using the new paging method.
+    API endpoint to fetch a page of articles from Alternator in table scan order.
     Query params:
-        start_title (optional): The title to start from (exclusive).
+        start_title (optional): Continuation key, the title to start after (exclusive).
         count (optional): Number of articles to fetch (default 10).
-        forward (optional): 'true' for A-Z, 'false' for Z-A (default 'true').
+        titles_only (optional): 'true' to skip the article text; served from the key mirror
+            when configured, in title order and with the size of each article.
+    Returns the articles and next_start_title, the continuation key of the next page
+    (null on the last page).
     """
     start_title = request.args.get('start_title')
     count = int(request.args.get('count', 10))
+    attributes = ('title',) if request.args.get('titles_only') == 'true' else ('title', 'text')
     client = get_client()
-    articles = client.get_articles_page_from(start_title=start_title, page_size=count)
-    return jsonify({'articles': articles})
+    articles, next_start_title = client.get_articles_page(start_title=start_title, page_size=count,
+                                                          attributes=attributes)
+    return jsonify({'articles': articles, 'next_start_title': next_start_title})
 
 @app.route('/api/query-articles', methods=['GET'])
 def query_articles():
     """
-    Query articles in Alternator using a KeyConditionExpression string and return a list of articles (title, text).
+    Query articles in Alternator using a KeyConditionExpression string and return a list of articles (title, text),
+    or search the local full-text index of the dump.
     Query params:
-        string_query (required): The KeyConditionExpression as a string (e.g., "boto3.dynamodb.conditions.Key('title').eq('SomeTitle')")
-        limit (optional): Max number of results to return.
+        string_query: The KeyConditionExpression as a string (e.g., "boto3.dynamodb.conditions.Key('title').eq('SomeTitle')")
+        q: Words to search for in the local full-text index instead (BM25 ranking, no cluster needed).
+            Each result also has its index position and score.
+        limit (optional): Max number of results to return (default 10 for q).
     """
     string_query = request.args.get('string_query')
-    if not string_query:
-        return jsonify({'error': 'Missing string_query parameter'}), 400
+    text_query = request.args.get('q')
+    if not string_query and not text_query:
+        return jsonify({'error': 'Missing string_query or q parameter'}), 400
     limit = request.args.get('limit')
+    if text_query:
+        try:
+            count = int(limit) if limit else 10
+        except ValueError:
+            count = 10
+        reader = get_reader()
+        try:
+            matches = reader.search_articles(text_query, count)
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        articles = reader.get_articles_by_positions([position for position, _ in matches])
+        return jsonify({'articles': [
+            {'index': position, 'score': round(score, 4), 'title': title, 'text': text}
+            for (position, score), (title, text) in zip(matches, articles)
+        ]})
     client = get_client()
     kwargs = {}
     if limit:
@@ -187,11 +484,62 @@ def api_test_results():
                 results = None
     return jsonify({'running': running, 'results': results, 'partial': partial})
 
+@app.route('/api/wikipedia-stream-cache', methods=['GET'])
+def wikipedia_stream_cache_stats():
+    """
+    API endpoint returning hit/miss statistics of the dump stream cache.
+    """
+    if _stream_cache is None:
+        return jsonify({'stats': None})
+    return jsonify({'stats': _stream_cache.stats()})
+
+@app.route('/api/alternator-cache', methods=['GET'])
+def alternator_cache_stats():
+    """
+    API endpoint returning hit/miss statistics of the Alternator article caches.
+    """
+    client = get_client()
+    if not isinstance(client, CachingAlternatorWikipediaClient):
+        return jsonify({'stats': None})
+    return jsonify({'stats': client.cache_stats()})
+
+@app.route('/api/alternator-key-mirror', methods=['GET'])
+def alternator_key_mirror_stats():
+    """
+    API endpoint returning the size and age of the Alternator key mirror (null when not configured).
+    """
+    client = get_client()
+    if client.key_mirror is None:
+        return jsonify({'stats': None})
+    return jsonify({'stats': client.key_mirror.stats()})
+
+@app.route('/api/alternator-key-mirror', methods=['POST'])
+def rebuild_alternator_key_mirror():
+    """
+    API endpoint rebuilding the Alternator key mirror with a titles-only scan of the table.
+    """
+    client = get_client()
+    if client.key_mirror is None:
+        return jsonify({'error': 'No key_mirror configured'}), 404
+    count = client.rebuild_key_mirror()
+    if count is None:
+        return jsonify({'error': 'The key mirror is already being rebuilt'}), 409
+    return jsonify({'status': 'rebuilt', 'titles': count})
+
 @app.route('/api/has-wikipedia-config', methods=['GET'])
 def has_wikipedia_config():
     config = load_config()
     has_wikipedia = 'wikipedia' in config and config['wikipedia'] is not None
     return jsonify({'has_wikipedia': has_wikipedia})
 
+def start_profiler_if_configured():
+    """
+    Start the sampling profiler of this process when metrics.profiler is set in the config.
+    """
+    if metrics_config().get('profiler'):
+        profiler.start()
+
 if __name__ == '__main__':
+    # Development server; see gunicorn.conf.py for the production serving mode
+    start_profiler_if_configured()
     app.run(debug=True)
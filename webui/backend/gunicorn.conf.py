@@ -0,0 +1,29 @@
+"""
+gunicorn.conf.py
+Production serving mode of the backend:
+    gunicorn -c gunicorn.conf.py app:app
+
+Each worker process imports the app after the fork (no preload), so it builds its own dump
+reader, Alternator client, caches and pools on first use and shares them between its request
+threads. Size with BACKEND_WORKERS (default: CPU count) and BACKEND_THREADS (default 8); the
+CPU-heavy article parsing can further be moved to processes with wikipedia.extract_workers and
+wikipedia.convert_workers in config.yaml.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BACKEND_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('BACKEND_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('BACKEND_THREADS', 8))
+preload_app = False
+# Bulk loads and cold reads of large streams can take a while
+timeout = int(os.environ.get('BACKEND_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('BACKEND_ACCESS_LOG', '-') or None
+
+
+def post_worker_init(worker):
+    from app import start_profiler_if_configured
+    start_profiler_if_configured()
@@ -102,7 +102,7 @@ export class WikipediaBrowserComponent implements OnInit {
   loadAlternatorArticles() {
     this.alternatorLoading = true;
     let startTitle = this.alternatorStartTitle;
-    let count = this.alternatorCount + 1; // Fetch one extra for navigation
+    let count = this.alternatorCount;
     const params = [
       startTitle ? `start_title=${encodeURIComponent(startTitle)}` : '',
       `count=${count}`
@@ -110,14 +110,8 @@ export class WikipediaBrowserComponent implements OnInit {
     this.http.get<any>(`/api/get_articles_page_from?${params}`)
       .subscribe(res => {
         let articles = res.articles || [];
-        let hasExtra = articles.length > this.alternatorCount;
-        if (hasExtra) {
-          this.alternatorNextKey = articles[this.alternatorCount].title;
-          articles = articles.slice(0, this.alternatorCount);
-        } else {
-          this.alternatorNextKey = null;
-        }
-        this.alternatorStartTitle = articles.length > 0 ? articles[0].title : "";
+        // The backend returns the scan continuation key of the next page
+        this.alternatorNextKey = res.next_start_title || null;
         this.alternatorArticles = articles;
         this.alternatorLoading = false;
         this.alternatorExpandedRows.clear();
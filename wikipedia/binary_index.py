@@ -0,0 +1,354 @@
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Version 1: a bare sequence of three big-endian 64-bit unsigned ints per entry
+# (stream_offset, page_number, page_id), one entry per article.
+ENTRY_DTYPE = np.dtype([
+    ('stream_offset', '>u8'),
+    ('page_number', '>u8'),
+    ('page_id', '>u8'),
+])
+
+# Version 2: a header, one record per page of the dump (every namespace, redirects
+# included), the record positions of the articles (main namespace, no redirects) and an
+# optional title table:
+#   header:   magic, version (u16), flags (u16), record size (u32), entry count,
+#             article count, stream count, dump size, records offset, articles offset,
+#             titles offset (u64 each), dump checksum (16 bytes), padding to 96 bytes
+#   records:  RECORD_DTYPE, in dump order
+#   articles: article count big-endian u64 record positions
+#   titles:   entry count + 1 big-endian u64 offsets into the UTF-8 title blob that follows
+#             (only with FLAG_TITLES)
+INDEX_MAGIC = b'WIKIIDX2'
+INDEX_VERSION = 2
+HEADER_FORMAT = '>8sHHI7Q16s8x'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+FLAG_TITLES = 1
+RECORD_DTYPE = np.dtype([
+    ('stream_offset', '>u8'),
+    ('page_number', '>u8'),
+    ('page_id', '>u8'),
+    ('text_length', '>u4'),
+    ('ns', '>i2'),
+    ('redirect', 'u1'),
+    ('reserved', 'u1'),
+])
+ARTICLE_NAMESPACES = (0,)
+
+
+def dump_checksum(path: str, chunk_size: int = 8 * 1024 * 1024) -> bytes:
+    """
+    128-bit BLAKE2b checksum of a dump file, stored in the index header.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return digest.digest()
+            digest.update(chunk)
+
+
+class BinaryIndexWriter:
+    """
+    Write a version 2 binary index. Records are added in dump order; the article position
+    list and the title table are spilled to temporary files and appended on close, so
+    memory stays bounded whatever the number of pages.
+    """
+
+    def __init__(self, path: str, with_titles: bool = True, batch_size: int = 10000):
+        self.path = path
+        self.with_titles = with_titles
+        self.batch_size = batch_size
+        self.entry_count = 0
+        self.article_count = 0
+        self.stream_count = 0
+        self._last_stream_offset = None
+        self._batch = []
+        self._out = open(path, 'wb')
+        self._out.write(b'\0' * HEADER_SIZE)
+        tmp_dir = os.path.dirname(os.path.abspath(path))
+        self._articles = tempfile.TemporaryFile(dir=tmp_dir)
+        self._title_offsets = tempfile.TemporaryFile(dir=tmp_dir) if with_titles else None
+        self._title_blob = tempfile.TemporaryFile(dir=tmp_dir) if with_titles else None
+        self._title_bytes = 0
+
+    def add(self, stream_offset: int, page_number: int, page_id: int, ns: Optional[int], is_redirect: bool,
+            text_length: int, title: str) -> Optional[int]:
+        """
+        Add the record of one page. Pages without a namespace count as main namespace.
+        Returns the article position of the page, or None if it is not an article.
+        """
+        ns = 0 if ns is None else ns
+        if stream_offset != self._last_stream_offset:
+            self._last_stream_offset = stream_offset
+            self.stream_count += 1
+        self._batch.append((stream_offset, page_number, page_id, min(text_length, 0xffffffff), ns,
+                            1 if is_redirect else 0, 0))
+        if self.with_titles:
+            self._title_offsets.write(struct.pack('>Q', self._title_bytes))
+            encoded = title.encode('utf-8')
+            self._title_blob.write(encoded)
+            self._title_bytes += len(encoded)
+        position = None
+        if ns in ARTICLE_NAMESPACES and not is_redirect:
+            self._articles.write(struct.pack('>Q', self.entry_count))
+            position = self.article_count
+            self.article_count += 1
+        self.entry_count += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        return position
+
+    def _flush(self):
+        self._out.write(np.array(self._batch, dtype=RECORD_DTYPE).tobytes())
+        self._batch = []
+
+    def close(self, dump_size: int = 0, checksum: bytes = b'') -> int:
+        """
+        Finish the file and write its header. Returns the number of articles.
+        """
+        self._flush()
+        articles_offset = HEADER_SIZE + self.entry_count * RECORD_DTYPE.itemsize
+        self._articles.seek(0)
+        shutil.copyfileobj(self._articles, self._out)
+        self._articles.close()
+        titles_offset = 0
+        if self.with_titles:
+            titles_offset = self._out.tell()
+            self._title_offsets.seek(0)
+            shutil.copyfileobj(self._title_offsets, self._out)
+            self._out.write(struct.pack('>Q', self._title_bytes))
+            self._title_blob.seek(0)
+            shutil.copyfileobj(self._title_blob, self._out)
+            self._title_offsets.close()
+            self._title_blob.close()
+        self._out.seek(0)
+        self._out.write(struct.pack(
+            HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, FLAG_TITLES if self.with_titles else 0,
+            RECORD_DTYPE.itemsize, self.entry_count, self.article_count, self.stream_count, dump_size,
+            HEADER_SIZE, articles_offset, titles_offset, checksum
+        ))
+        self._out.close()
+        return self.article_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._out.closed:
+            self.close()
+
+
+class BinaryIndex:
+    """
+    Memory-mapped view of a binary multistream index (version 1 or 2).
+    The file is mapped as a structured NumPy array, so opening it costs no Python objects
+    per entry; tuples are only created for the entries actually returned.
+    Positions are positions in a view of the records: for version 2 files the articles by
+    default (main namespace, no redirects, precomputed in the file), or the pages selected
+    by namespaces and include_redirects. Version 1 files only contain articles.
+    Lookups by page_id use a sorted copy of the page ids (and the permutation that sorts
+    them), built once on first use.
+    Entries are returned as (stream_offset, page_id, page_number) tuples, the same shape as
+    WikipediaMultistreamReader.list_binary_index_entries.
+    """
+
+    def __init__(self, path: str, namespaces: Sequence[int] = ARTICLE_NAMESPACES, include_redirects: bool = False):
+        self.path = path
+        stat = os.stat(path)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.version = 1
+        self.stream_count = None
+        self.dump_size = None
+        self.checksum = None
+        self._view = None
+        self._title_offsets = None
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(INDEX_MAGIC)] == INDEX_MAGIC:
+            self._open_v2(header, namespaces, include_redirects)
+        else:
+            count = stat.st_size // ENTRY_DTYPE.itemsize
+            if count:
+                self.records = np.memmap(path, dtype=ENTRY_DTYPE, mode='r', shape=(count,))
+            else:
+                self.records = np.zeros(0, dtype=ENTRY_DTYPE)
+            self.entry_count = count
+        self._page_id_order = None
+        self._sorted_page_ids = None
+        self._lock = threading.Lock()
+
+    def _open_v2(self, header: bytes, namespaces, include_redirects):
+        (_, self.version, flags, record_size, self.entry_count, self.article_count, self.stream_count,
+         self.dump_size, records_offset, articles_offset, titles_offset, self.checksum) = struct.unpack(
+            HEADER_FORMAT, header)
+        if self.version != INDEX_VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported binary index version {self.version}: {self.path}")
+        self.records = self._memmap(RECORD_DTYPE, records_offset, self.entry_count)
+        if namespaces is not None and tuple(namespaces) == ARTICLE_NAMESPACES and not include_redirects:
+            self._view = self._memmap(np.dtype('>u8'), articles_offset, self.article_count)
+        elif namespaces is not None or not include_redirects:
+            self._view = self.select(namespaces, include_redirects)
+        if flags & FLAG_TITLES:
+            self._title_offsets = self._memmap(np.dtype('>u8'), titles_offset, self.entry_count + 1)
+            self._titles_blob_offset = titles_offset + (self.entry_count + 1) * 8
+
+    def _memmap(self, dtype, offset: int, count: int):
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+    def __len__(self):
+        return len(self._view) if self._view is not None else len(self.records)
+
+    @property
+    def has_metadata(self) -> bool:
+        """
+        True for version 2 files, which record namespace, redirect flag and text length.
+        """
+        return self.version >= 2
+
+    def is_stale(self) -> bool:
+        """
+        Return True if the file on disk changed since it was mapped.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != self.signature
+
+    def _rows(self, selection):
+        """
+        Records at view positions (a slice or an array of positions).
+        """
+        if self._view is None:
+            return self.records[selection]
+        return self.records[np.asarray(self._view[selection], dtype=np.int64)]
+
+    @staticmethod
+    def _to_tuples(records) -> List[Tuple[int, int, int]]:
+        return list(zip(
+            records['stream_offset'].tolist(),
+            records['page_id'].tolist(),
+            records['page_number'].tolist(),
+        ))
+
+    def slice(self, start: int = 0, count: int = 10) -> List[Tuple[int, int, int]]:
+        """
+        Return up to count entries starting at position start.
+        """
+        if start < 0 or count <= 0:
+            return []
+        return self._to_tuples(self._rows(slice(start, start + count)))
+
+    def take(self, positions: Sequence[int]) -> List[Tuple[int, int, int]]:
+        """
+        Return the entries at the given positions, in the given order, in one vectorized lookup.
+        Raises IndexError for positions outside the index.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size and (positions.min() < 0 or positions.max() >= len(self)):
+            raise IndexError('index position out of range')
+        return self._to_tuples(self._rows(positions))
+
+    def stream_offsets(self) -> np.ndarray:
+        """
+        Return the distinct stream offsets of all records, sorted.
+        """
+        return np.unique(self.records['stream_offset'])
+
+    def _require_metadata(self):
+        if not self.has_metadata:
+            raise ValueError(f"{self.path} is a version 1 index without page metadata, rebuild it with --reindex")
+
+    def _mask(self, namespaces: Optional[Sequence[int]], include_redirects: bool, min_text_length: int = 0):
+        self._require_metadata()
+        mask = np.ones(len(self.records), dtype=bool)
+        if namespaces is not None:
+            mask &= np.isin(self.records['ns'], np.asarray(namespaces, dtype=np.int16))
+        if not include_redirects:
+            mask &= self.records['redirect'] == 0
+        if min_text_length:
+            mask &= self.records['text_length'] >= min_text_length
+        return mask
+
+    def select(self, namespaces: Optional[Sequence[int]] = ARTICLE_NAMESPACES, include_redirects: bool = False,
+               min_text_length: int = 0) -> np.ndarray:
+        """
+        Return the record positions of the pages in the given namespaces (None for all),
+        optionally including redirects and skipping texts shorter than min_text_length bytes.
+        Version 2 only.
+        """
+        return np.flatnonzero(self._mask(namespaces, include_redirects, min_text_length))
+
+    def count(self, namespaces: Optional[Sequence[int]] = ARTICLE_NAMESPACES, include_redirects: bool = False,
+              min_text_length: int = 0) -> int:
+        """
+        Count the pages matching a filter (see select) without reading the dump. Version 2 only;
+        the default article count is read from the header.
+        """
+        if (namespaces is not None and tuple(namespaces) == ARTICLE_NAMESPACES and not include_redirects
+                and not min_text_length):
+            self._require_metadata()
+            return self.article_count
+        return int(np.count_nonzero(self._mask(namespaces, include_redirects, min_text_length)))
+
+    def namespace_counts(self) -> dict:
+        """
+        Return {namespace: page count} over all records. Version 2 only.
+        """
+        self._require_metadata()
+        namespaces, counts = np.unique(self.records['ns'], return_counts=True)
+        return dict(zip(namespaces.tolist(), counts.tolist()))
+
+    def title_at(self, position: int) -> Optional[str]:
+        """
+        Return the title at a view position from the title table, or None if the index has
+        no title table.
+        """
+        if self._title_offsets is None:
+            return None
+        record = int(self._view[position]) if self._view is not None else position
+        start, end = (int(v) for v in self._title_offsets[record:record + 2])
+        with open(self.path, 'rb') as f:
+            f.seek(self._titles_blob_offset + start)
+            return f.read(end - start).decode('utf-8')
+
+    def _build_page_id_lookup(self):
+        with self._lock:
+            if self._sorted_page_ids is None:
+                page_ids = self._rows(slice(None))['page_id'].astype(np.uint64)
+                order = np.argsort(page_ids, kind='stable')
+                self._page_id_order = order
+                self._sorted_page_ids = page_ids[order]
+
+    def positions_for_page_ids(self, page_ids: Sequence[int]) -> np.ndarray:
+        """
+        Return the index positions of the given page ids as an int64 array (-1 for unknown ids).
+        """
+        if self._sorted_page_ids is None:
+            self._build_page_id_lookup()
+        wanted = np.asarray(page_ids, dtype=np.uint64)
+        found = np.searchsorted(self._sorted_page_ids, wanted)
+        in_range = found < len(self._sorted_page_ids)
+        matches = np.zeros(len(wanted), dtype=bool)
+        matches[in_range] = self._sorted_page_ids[found[in_range]] == wanted[in_range]
+        positions = np.full(len(wanted), -1, dtype=np.int64)
+        positions[matches] = self._page_id_order[found[matches]]
+        return positions
+
+    def find_page_id(self, page_id: int) -> Optional[int]:
+        """
+        Return the index position of page_id, or None if the page is not indexed.
+        """
+        position = int(self.positions_for_page_ids([page_id])[0])
+        return position if position >= 0 else None
@@ -0,0 +1,273 @@
+import bz2
+import mmap
+import os
+import re
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# bzip2 blocks are not byte aligned: each one starts with the 48-bit block magic (pi) at an
+# arbitrary bit offset, followed by the 32-bit block CRC. A stream ends with the 48-bit
+# end-of-stream magic (sqrt(pi)), the combined CRC of all its blocks and padding to a byte.
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+
+BLOCK_INDEX_MAGIC = b'WIKIBLK1'
+HEADER_FORMAT = '>8sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+BLOCK_DTYPE = np.dtype([
+    ('stream_offset', '>u8'),
+    ('bit_offset', '>u8'),
+    ('end_bit', '>u8'),
+    ('open_page_id', '>u8'),
+    ('crc', '>u4'),
+    ('level', 'u1'),
+])
+
+# On-disk layout of a block index:
+#   header:  magic, size of the dump file it was built for (u64)
+#   records: one per bzip2 block, sorted by stream offset then bit offset:
+#            stream_offset - byte offset of the bzip2 stream containing the block
+#            bit_offset    - bit offset of the block magic in the dump file
+#            end_bit       - bit offset of the next block (or end-of-stream) magic
+#            open_page_id  - id of the last page starting before the block (0 if none)
+#            crc           - block CRC
+#            level         - stream block size digit ('1'..'9')
+# Only streams with more than one block are recorded, and only when their page ids
+# increase, which is what makes open_page_id searchable.
+
+ALIGN_CHUNK_SIZE = 262144
+_PAGE_START_RE = re.compile(rb'<page>.*?<id>(\d+)</id>', re.S)
+_PAGE_TAG = b'<page>'
+
+
+def _magic_patterns():
+    """
+    For every bit shift 0..7 of both magics, the 5 bytes that are fully covered by the
+    48-bit magic when it starts at that shift within a byte.
+    """
+    patterns = {}
+    for kind, magic in (('block', BLOCK_MAGIC), ('eos', EOS_MAGIC)):
+        for shift in range(8):
+            pattern = (magic << (8 - shift)).to_bytes(7, 'big')[1:6]
+            patterns.setdefault(pattern, []).append((shift, kind))
+    return patterns
+
+
+_MAGIC_PATTERNS = _magic_patterns()
+_MAGIC_RE = re.compile(b'(?=(' + b'|'.join(re.escape(p) for p in _MAGIC_PATTERNS) + b'))')
+
+
+def read_bits(buf, bit: int, count: int) -> int:
+    """
+    Return count bits of buf starting at the given bit offset, as an integer.
+    """
+    start = bit // 8
+    end = (bit + count + 7) // 8
+    value = int.from_bytes(buf[start:end], 'big')
+    return (value >> (end * 8 - bit - count)) & ((1 << count) - 1)
+
+
+def _iter_magic_candidates(buf, start_bit: int):
+    """
+    Yield (bit_offset, kind) of the block and end-of-stream magics found at or after
+    start_bit, in file order. kind is 'block' or 'eos'. Hits inside compressed data are
+    possible, callers validate them by decompressing.
+    """
+    for match in _MAGIC_RE.finditer(buf, max(1, start_bit // 8)):
+        pos = match.start()
+        for shift, kind in sorted(_MAGIC_PATTERNS[match.group(1)]):
+            bit = (pos - 1) * 8 + shift
+            magic = BLOCK_MAGIC if kind == 'block' else EOS_MAGIC
+            if bit >= start_bit and read_bits(buf, bit, 48) == magic:
+                yield bit, kind
+
+
+def combine_crcs(crcs) -> int:
+    """
+    Combined stream CRC of a sequence of block CRCs.
+    """
+    combined = 0
+    for crc in crcs:
+        combined = (((combined << 1) | (combined >> 31)) & 0xffffffff) ^ int(crc)
+    return combined
+
+
+def iter_aligned_stream(buf, level: bytes, start_bit: int, end_bit: int, combined_crc: int):
+    """
+    Yield a standalone, byte-aligned bzip2 stream made of the blocks in bits
+    start_bit..end_bit of buf: a stream header, the blocks shifted to byte alignment, and an
+    end-of-stream marker with the given combined CRC.
+    """
+    yield b'BZh' + level
+    total_bits = end_bit - start_bit
+    full_bytes = total_bits // 8
+    shift = start_bit % 8
+    base = start_bit // 8
+    for i in range(0, full_bytes, ALIGN_CHUNK_SIZE):
+        n = min(ALIGN_CHUNK_SIZE, full_bytes - i)
+        data = buf[base + i:base + i + n + 1]
+        value = int.from_bytes(data, 'big') << (8 * (n + 1 - len(data)))
+        yield ((value >> (8 - shift)) & ((1 << (8 * n)) - 1)).to_bytes(n, 'big')
+    tail_bits = total_bits % 8
+    tail = read_bits(buf, start_bit + full_bytes * 8, tail_bits) if tail_bits else 0
+    value = (((tail << 48) | EOS_MAGIC) << 32) | combined_crc
+    bits = tail_bits + 80
+    padding = -bits % 8
+    yield (value << padding).to_bytes((bits + padding) // 8, 'big')
+
+
+def _decompress_block(buf, level: bytes, start_bit: int, end_bit: int) -> Optional[bytes]:
+    """
+    Decompress the single block in bits start_bit..end_bit, or return None if those bits
+    are not exactly one valid block.
+    """
+    crc = read_bits(buf, start_bit + 48, 32)
+    try:
+        data = bz2.decompress(b''.join(iter_aligned_stream(buf, level, start_bit, end_bit, crc)))
+    except (OSError, EOFError, ValueError):
+        return None
+    return data
+
+
+def _index_stream_blocks(buf, stream_offset: int) -> list:
+    """
+    Locate the blocks of the bzip2 stream at stream_offset and the page open at the start of
+    each. Returns block records, or [] if the stream has a single block, is not a valid
+    stream, or its page ids do not increase.
+    """
+    level = bytes(buf[stream_offset + 3:stream_offset + 4])
+    bit = (stream_offset + 4) * 8
+    if buf[stream_offset:stream_offset + 3] != b'BZh' or read_bits(buf, bit, 48) != BLOCK_MAGIC:
+        return []
+    candidates = _iter_magic_candidates(buf, bit + 80)
+    blocks = []
+    pending = []
+    last_page_id = 0
+    carry = b''
+    carry_offset = 0
+    uncompressed_offset = 0
+    while True:
+        for end_bit, kind in candidates:
+            data = _decompress_block(buf, level, bit, end_bit)
+            if data is not None:
+                break
+        else:
+            return []
+        blocks.append([stream_offset, bit, end_bit, 0, read_bits(buf, bit + 48, 32), level[0]])
+        pending.append((len(blocks) - 1, uncompressed_offset))
+        uncompressed_offset += len(data)
+        # Find the pages starting in this block (the page tag or its id may straddle blocks)
+        text = carry + data
+        scanned = 0
+        for match in _PAGE_START_RE.finditer(text):
+            page_offset = carry_offset + match.start()
+            page_id = int(match.group(1))
+            if page_id <= last_page_id:
+                return []
+            while pending and pending[0][1] <= page_offset:
+                blocks[pending.pop(0)[0]][3] = last_page_id
+            last_page_id = page_id
+            scanned = match.end()
+        keep = text.find(_PAGE_TAG, scanned)
+        if keep < 0:
+            keep = max(scanned, len(text) - len(_PAGE_TAG) + 1)
+        carry = text[keep:]
+        carry_offset += keep
+        if kind == 'eos':
+            break
+        bit = end_bit
+    for index, _ in pending:
+        blocks[index][3] = last_page_id
+    return blocks if len(blocks) > 1 else []
+
+
+def build_block_index(xml_bz2_path: str, block_index_path: str, stream_offsets, progress: bool = False) -> int:
+    """
+    Scan the bzip2 streams at the given offsets of a dump and write a block index for the
+    streams made of several blocks. Returns the number of blocks recorded.
+    """
+    records = []
+    with open(xml_bz2_path, 'rb') as f:
+        dump_size = os.fstat(f.fileno()).st_size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i, stream_offset in enumerate(sorted(set(int(o) for o in stream_offsets))):
+                records.extend(tuple(block) for block in _index_stream_blocks(mm, stream_offset))
+                if progress and (i + 1) % 1000 == 0:
+                    print(f"Scanned {i + 1} streams, {len(records)} blocks...", end='\r')
+    array = np.array(records, dtype=BLOCK_DTYPE)
+    with open(block_index_path, 'wb') as out:
+        out.write(struct.pack(HEADER_FORMAT, BLOCK_INDEX_MAGIC, dump_size))
+        out.write(array.tobytes())
+    return len(array)
+
+
+class BlockIndex:
+    """
+    Block-level index of the large bzip2 streams of a dump.
+    locate(stream_offset, page_id) tells where to start decompressing to reach a page
+    without decompressing its stream from the beginning.
+    """
+
+    def __init__(self, path: str, xml_bz2_path: str = None):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, self.dump_size = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+            if magic != BLOCK_INDEX_MAGIC:
+                raise ValueError(f"Not a block index file: {path}")
+            self.blocks = np.frombuffer(f.read(), dtype=BLOCK_DTYPE)
+        if xml_bz2_path is not None and os.path.getsize(xml_bz2_path) != self.dump_size:
+            raise ValueError(f"Block index {path} does not match {xml_bz2_path}")
+        self._stream_offsets = self.blocks['stream_offset'].astype(np.uint64)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def locate(self, stream_offset: int, page_id: int) -> Optional[Tuple[bytes, int, int, int]]:
+        """
+        Return (level, start_bit, end_bit, combined_crc) describing the blocks from the one
+        where page_id starts to the end of the stream, or None if the stream has no blocks
+        in the index.
+        """
+        lo = int(np.searchsorted(self._stream_offsets, np.uint64(stream_offset), side='left'))
+        hi = int(np.searchsorted(self._stream_offsets, np.uint64(stream_offset), side='right'))
+        if lo == hi:
+            return None
+        blocks = self.blocks[lo:hi]
+        k = int(np.searchsorted(blocks['open_page_id'].astype(np.uint64), np.uint64(page_id), side='left')) - 1
+        k = max(k, 0)
+        level = bytes([int(blocks['level'][k])])
+        return level, int(blocks['bit_offset'][k]), int(blocks['end_bit'][-1]), combine_crcs(blocks['crc'][k:])
+
+    def block_offsets(self) -> List[Tuple[int, int]]:
+        """
+        Return (stream_offset, bit_offset) of every indexed block.
+        """
+        return list(zip(self.blocks['stream_offset'].tolist(), self.blocks['bit_offset'].tolist()))
+
+
+def iter_block_chunks(infile, location: Tuple[bytes, int, int, int]):
+    """
+    Decompress from the block given by BlockIndex.locate to the end of its stream, yielding
+    the data chunk by chunk starting at the first page tag.
+    """
+    level, start_bit, end_bit, combined_crc = location
+    decompressor = bz2.BZ2Decompressor()
+    skipped = True
+    pending = b''
+    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for piece in iter_aligned_stream(mm, level, start_bit, end_bit, combined_crc):
+            data = decompressor.decompress(piece)
+            if not data:
+                continue
+            if skipped:
+                pending += data
+                start = pending.find(_PAGE_TAG)
+                if start < 0:
+                    pending = pending[-len(_PAGE_TAG) + 1:]
+                    continue
+                data = pending[start:]
+                pending = b''
+                skipped = False
+            yield data
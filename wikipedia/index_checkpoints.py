@@ -0,0 +1,109 @@
+import bz2
+import os
+import struct
+from typing import Tuple
+
+import numpy as np
+
+CHECKPOINTS_MAGIC = b'WIKICHK1'
+HEADER_FORMAT = '>8sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CHECKPOINT_DTYPE = np.dtype([
+    ('offset', '>u8'),
+    ('line', '>u8'),
+])
+
+# On-disk layout of a checkpoint file:
+#   header:      magic, size of the text index file it was built for (u64)
+#   checkpoints: (compressed_offset, line_number) big-endian u64 pairs, one per bzip2
+#                stream of the text index that starts at a line boundary
+
+
+def build_index_checkpoints(index_bz2_path: str, checkpoints_path: str, read_chunk_size: int = 262144) -> int:
+    """
+    Scan a multistream text index (index.txt.bz2) once and write a checkpoint file recording
+    the compressed offset and the first line number of every bzip2 stream.
+    Returns the number of checkpoints written.
+    """
+    checkpoints = []
+    line_count = 0
+    at_line_start = True
+    with open(index_bz2_path, 'rb') as infile:
+        index_size = os.fstat(infile.fileno()).st_size
+        stream_offset = 0
+        while stream_offset < index_size:
+            infile.seek(stream_offset)
+            decompressor = bz2.BZ2Decompressor()
+            last_byte = b''
+            end_offset = index_size
+            while True:
+                chunk_offset = infile.tell()
+                chunk = infile.read(read_chunk_size)
+                if not chunk:
+                    break
+                data = decompressor.decompress(chunk)
+                if data:
+                    if last_byte == b'' and at_line_start:
+                        checkpoints.append((stream_offset, line_count))
+                    line_count += data.count(b'\n')
+                    last_byte = data[-1:]
+                if decompressor.eof:
+                    end_offset = chunk_offset + len(chunk) - len(decompressor.unused_data)
+                    break
+            if last_byte:
+                at_line_start = last_byte == b'\n'
+            if end_offset <= stream_offset:
+                break
+            stream_offset = end_offset
+    records = np.array(checkpoints, dtype=CHECKPOINT_DTYPE)
+    with open(checkpoints_path, 'wb') as out:
+        out.write(struct.pack(HEADER_FORMAT, CHECKPOINTS_MAGIC, index_size))
+        out.write(records.tobytes())
+    return len(records)
+
+
+class IndexCheckpoints:
+    """
+    Seekable checkpoints of a multistream text index.
+    locate(line) returns the compressed offset of the bzip2 stream containing the line and the
+    number of the first line of that stream, so reading can start there instead of at line 0.
+    """
+
+    def __init__(self, checkpoints_path: str, index_bz2_path: str = None):
+        self.path = checkpoints_path
+        with open(checkpoints_path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            magic, self.index_size = struct.unpack(HEADER_FORMAT, header)
+            if magic != CHECKPOINTS_MAGIC:
+                raise ValueError(f"Not an index checkpoint file: {checkpoints_path}")
+            self.checkpoints = np.frombuffer(f.read(), dtype=CHECKPOINT_DTYPE)
+        self._lines = self.checkpoints['line'].astype(np.uint64)
+        if index_bz2_path is not None and os.path.getsize(index_bz2_path) != self.index_size:
+            raise ValueError(f"Checkpoints {checkpoints_path} do not match {index_bz2_path}")
+
+    @classmethod
+    def load_or_build(cls, index_bz2_path: str, checkpoints_path: str = None) -> 'IndexCheckpoints':
+        """
+        Load the checkpoints of a text index, building the checkpoint file first if it is
+        missing or was built for a different index file.
+        """
+        if checkpoints_path is None:
+            checkpoints_path = f'{index_bz2_path}.checkpoints'
+        try:
+            return cls(checkpoints_path, index_bz2_path)
+        except (FileNotFoundError, ValueError, struct.error):
+            build_index_checkpoints(index_bz2_path, checkpoints_path)
+            return cls(checkpoints_path, index_bz2_path)
+
+    def __len__(self):
+        return len(self.checkpoints)
+
+    def locate(self, line: int) -> Tuple[int, int]:
+        """
+        Return (compressed_offset, first_line) of the checkpoint at or before the given line.
+        """
+        i = int(np.searchsorted(self._lines, np.uint64(line), side='right')) - 1
+        if i < 0:
+            return 0, 0
+        checkpoint = self.checkpoints[i]
+        return int(checkpoint['offset']), int(checkpoint['line'])
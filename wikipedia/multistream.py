@@ -1,67 +1,680 @@
+import bisect
 import bz2
+import itertools
+import mmap
+import os
+import re
+import threading
+import time
 import xml.etree.ElementTree as ET
+from xml.parsers import expat
 from typing import List, Tuple
-from collections import defaultdict
-import mwparserfromhell
-import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Pool
+
+if __name__ == '__main__':
+    # Run as a script (python wikipedia/multistream.py): make the repository root importable
+    import sys
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from telemetry import metrics
+from wikipedia.binary_index import BinaryIndex, BinaryIndexWriter, dump_checksum
+from wikipedia.block_index import BlockIndex, build_block_index, iter_block_chunks
+from wikipedia.index_checkpoints import IndexCheckpoints, build_index_checkpoints
+from wikipedia.search_index import SearchIndex, build_search_index
+from wikipedia.stream_cache import StreamCache
+from wikipedia.text_conversion import StrippedTextCache, TextConverter
+from wikipedia.title_index import TitleIndex, TitleIndexWriter
+
+READ_CHUNK_SIZE = 262144
+MAX_OUTPUT_CHUNK_SIZE = 1048576
+
+# A bzip2 stream starts with 'BZh' + block size digit, followed by either the
+# block magic (pi) or, for an empty stream, the end-of-stream magic (sqrt(pi)).
+# Multistream dumps concatenate byte-aligned streams, so a regex over the raw
+# file finds every stream start (plus the odd false positive inside compressed
+# data, which the reindexer discards while chaining stream ends).
+STREAM_MAGIC_RE = re.compile(rb'BZh[1-9](?:1AY&SY|\x17rE8P\x90)')
+
+_TAG_MISMATCH = expat.errors.codes[expat.errors.XML_ERROR_TAG_MISMATCH]
+
+
+def _file_signature(path: str):
+    """
+    (size, mtime) of the file at path, the same change check as BinaryIndex.is_stale;
+    None when there is no such file.
+    """
+    try:
+        stat = os.stat(path) if path else None
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns) if stat else None
+
+
+def find_stream_offsets(path: str) -> List[int]:
+    """
+    Return the candidate file offsets of bzip2 streams in a multistream file.
+    The list is sorted and may contain false positives, but never misses a stream.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [m.start() for m in STREAM_MAGIC_RE.finditer(mm)]
+
+
+def _iter_stream_chunks(infile, offset: int, end: list = None):
+    """
+    Decompress the bzip2 stream starting at the given file offset, yielding the
+    decompressed data chunk by chunk. Chunks are at most MAX_OUTPUT_CHUNK_SIZE bytes, however
+    well the data compresses. If end is a list, the file offset right after the stream is
+    appended to it once the stream is exhausted. The time spent reading and decompressing
+    (not at the yields) and the bytes in and out are recorded as the 'decompress' stage.
+    """
+    infile.seek(offset)
+    decompressor = bz2.BZ2Decompressor()
+    chunk_offset = offset
+    chunk = b''
+    elapsed = 0.0
+    compressed = decompressed = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            if decompressor.needs_input:
+                chunk_offset = infile.tell()
+                chunk = infile.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    end_offset = chunk_offset
+                    break
+                compressed += len(chunk)
+                data = decompressor.decompress(chunk, MAX_OUTPUT_CHUNK_SIZE)
+            else:
+                data = decompressor.decompress(b'', MAX_OUTPUT_CHUNK_SIZE)
+            elapsed += time.perf_counter() - start
+            if data:
+                decompressed += len(data)
+                yield data
+            if decompressor.eof:
+                end_offset = chunk_offset + len(chunk) - len(decompressor.unused_data)
+                compressed -= len(decompressor.unused_data)
+                break
+    finally:
+        metrics.record('decompress', elapsed)
+        metrics.count_bytes('decompress', compressed, decompressed)
+    if end is not None:
+        end.append(end_offset)
+
+
+class _PageFieldScanner:
+    """
+    expat handlers collecting the id, title, namespace, redirect flag and text length of each
+    page. Character data is only kept inside those fields, the article text is never buffered;
+    its length comes from the 'bytes' attribute, or is counted when the attribute is missing.
+    """
+
+    FIELDS = ('id', 'title', 'ns')
+
+    def __init__(self):
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        self.parser.CharacterDataHandler = self._characters
+        self.depth = 0
+        self.pages = []
+        self._page = None
+        self._page_depth = 0
+        self._field = None
+        self._buffer = []
+        self._counting_text = False
+        self.parser.Parse(b'<root>', False)
+
+    def _start(self, name, attributes):
+        self.depth += 1
+        if name == 'page':
+            self._page = {'id': None, 'title': None, 'ns': None, 'redirect': False, 'text_length': 0}
+            self._page_depth = self.depth
+        elif self._page is not None and self.depth == self._page_depth + 1:
+            if name in self.FIELDS:
+                self._field = name
+                self._buffer = []
+            elif name == 'redirect':
+                self._page['redirect'] = True
+        elif self._page is not None and name == 'text' and self.depth == self._page_depth + 2:
+            length = attributes.get('bytes')
+            if length is not None and length.isdigit():
+                self._page['text_length'] = int(length)
+            else:
+                self._counting_text = True
+
+    def _characters(self, data):
+        if self._field is not None:
+            self._buffer.append(data)
+        elif self._counting_text:
+            self._page['text_length'] += len(data.encode('utf-8'))
+
+    def _end(self, name):
+        if self._counting_text and name == 'text':
+            self._counting_text = False
+        elif self._field is not None and name == self._field:
+            self._page[self._field] = ''.join(self._buffer)
+            self._field = None
+        elif name == 'page' and self._page is not None:
+            page = self._page
+            self.pages.append((page['id'], page['title'] or '', page['ns'], page['redirect'], page['text_length']))
+            self._page = None
+        self.depth -= 1
+
+    def feed(self, data: bytes):
+        self.parser.Parse(data, False)
+
+    def close(self):
+        # The handlers reference the scanner: break the cycle so the parser buffers are freed now
+        self.parser = None
+
+    def pop_pages(self) -> list:
+        pages, self.pages = self.pages, []
+        return pages
+
+
+def _iter_index_pages(chunks, errors: list):
+    """
+    Incrementally parse decompressed stream data (an iterable of bytes chunks) and yield
+    (page_number, page_id, title, ns, is_redirect, text_length) tuples for every page with a
+    valid id. Only these fields are extracted, so memory stays constant whatever the stream size.
+    Problems are appended to errors as messages. After an XML error the pages parsed so far
+    are kept and the rest of the stream is still consumed, so its end offset is known.
+    """
+    scanner = _PageFieldScanner()
+    page_number = 0
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            error = None
+            try:
+                scanner.feed(chunk)
+            except expat.ExpatError as e:
+                error = e
+            for page_id_text, title, ns_text, is_redirect, text_length in scanner.pop_pages():
+                try:
+                    page_id = int(page_id_text)
+                except (TypeError, ValueError):
+                    errors.append(f"invalid page id {page_id_text!r} of page {title!r}")
+                    continue
+                ns = int(ns_text) if ns_text and ns_text.lstrip('-').isdigit() else None
+                yield page_number, page_id, title, ns, is_redirect, text_length
+                page_number += 1
+            if error is not None:
+                # The closing </mediawiki> of the dump ends the document, it is not a failure
+                if not (error.code == _TAG_MISMATCH and scanner.depth == 1):
+                    errors.append(f"XML error: {expat.ErrorString(error.code)} at line {error.lineno}, "
+                                  f"{page_number} pages indexed before it")
+                for _ in chunks:
+                    pass
+                return
+    finally:
+        scanner.close()
+
+
+def _iter_stream_pages(chunks):
+    """
+    Incrementally parse decompressed stream data (an iterable of bytes chunks) and yield
+    (page_id, title, text, revision_id) tuples, where text is the raw wikitext. Parsed pages are cleared
+    as soon as they are yielded, so memory stays bounded by the largest page. Pages without
+    a valid id are skipped; parsing stops quietly at the first XML error (e.g. the trailing
+    '</mediawiki>' stream), after yielding the pages that parsed fine.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    parser.feed(b'<root>')
+    root = None
+    elapsed = 0.0
+    try:
+        for chunk in chunks:
+            start = time.perf_counter()
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if root is None:
+                    root = elem
+                    continue
+                if event != 'end' or elem.tag != 'page':
+                    continue
+                page_id_text = elem.findtext('id')
+                title = elem.findtext('title') or ''
+                text = elem.findtext('revision/text') or ''
+                revision_id_text = elem.findtext('revision/id')
+                root.clear()
+                try:
+                    page_id = int(page_id_text)
+                except Exception:
+                    continue
+                revision_id = int(revision_id_text) if revision_id_text and revision_id_text.isdigit() else None
+                elapsed += time.perf_counter() - start
+                yield page_id, title, text, revision_id
+                start = time.perf_counter()
+            elapsed += time.perf_counter() - start
+    except ET.ParseError:
+        return
+    finally:
+        metrics.record('parse', elapsed)
+
+
+def _unread_pages_failure(offset: int, missing: int, wanted: int) -> Tuple[int, str]:
+    return offset, f"{missing} of {wanted} indexed pages could not be read"
+
+
+def _index_stream(infile, offset: int, errors: list):
+    """
+    Yield the (page_number, page_id, title, ns, is_redirect, text_length) entries of the
+    stream at offset; see
+    _iter_index_pages. Returns the file offset right after the stream, or None if the
+    data at offset could not be decompressed (the error is appended to errors).
+    """
+    end = []
+    try:
+        yield from _iter_index_pages(_iter_stream_chunks(infile, offset, end), errors)
+    except (OSError, EOFError) as e:
+        errors.append(f"decompression failed: {e}")
+        return None
+    return end[0] if end else None
+
+
+def _reindex_stream_worker(task: Tuple[str, int]) -> Tuple[int, int, list, list]:
+    """
+    Process pool worker for the parallel reindexer.
+    Returns (stream_offset, end_offset, entries, errors) with entries as yielded by
+    _iter_index_pages. end_offset is None when the offset turned out not to be
+    the start of a valid bzip2 stream.
+    """
+    xml_bz2_path, stream_offset = task
+    errors = []
+    with open(xml_bz2_path, 'rb') as infile:
+        indexer = _index_stream(infile, stream_offset, errors)
+        entries = []
+        while True:
+            try:
+                entries.append(next(indexer))
+            except StopIteration as stop:
+                end_offset = stop.value
+                break
+    return stream_offset, end_offset, entries, errors
+
+
+def _read_stream_worker(task: Tuple[str, int, tuple, set]) -> list:
+    """
+    Process pool worker of the reader's extraction pool.
+    Returns the (page_id, title, text, revision_id) pages of the stream at stream_offset, read
+    from the block at location when it is not None; only the pages whose id is in wanted when
+    wanted is not None, stopping after the last of them.
+    """
+    xml_bz2_path, stream_offset, location, wanted = task
+    with open(xml_bz2_path, 'rb') as infile:
+        if location is not None:
+            pages = _iter_stream_pages(iter_block_chunks(infile, location))
+        else:
+            pages = _iter_stream_pages(_iter_stream_chunks(infile, stream_offset))
+        if wanted is None:
+            return list(pages)
+        found = []
+        for page in pages:
+            if page[0] in wanted:
+                found.append(page)
+                if len(found) == len(wanted):
+                    break
+        pages.close()
+        return found
+
 
 class WikipediaMultistreamReader:
-    def __init__(self, xml_bz2_path: str, index_bz2_path: str):
+    def __init__(self, xml_bz2_path: str, index_bz2_path: str, stream_cache: StreamCache = None,
+                 title_index_path: str = None, converter='mwparserfromhell',
+                 text_cache: StrippedTextCache = None, block_index_path: str = None,
+                 fetch_workers: int = None, convert_workers: int = 0, search_index_path: str = None,
+                 extract_workers: int = 0):
+        """
+        stream_cache: optional StreamCache holding parsed streams between calls. The cache may be
+        shared by several readers, entries are keyed by (dump path, stream offset).
+        title_index_path: title index written by reindex_multistream, defaults to '<index>.titles'.
+        converter: wikitext conversion, a name from text_conversion.CONVERTERS ('raw', 'regex',
+        'mwparserfromhell') or a callable taking and returning a string.
+        text_cache: optional StrippedTextCache persisting converted text by page and revision id.
+        block_index_path: bzip2 block index written by reindex_multistream, defaults to
+        '<index>.blocks'. When present, reads of multi-block streams start at the block
+        containing the page instead of at the start of the stream.
+        fetch_workers: threads decompressing and parsing the distinct streams of a batched read
+        in parallel (bz2 releases the GIL), defaults to the CPU count up to 8.
+        convert_workers: processes converting the wikitext of batched reads; 0 converts in the
+        calling thread, which is faster for the few articles of a page load.
+        search_index_path: full-text index written by reindex_multistream, defaults to '<index>.search'.
+        extract_workers: processes decompressing and parsing the streams of random reads, so that
+        parsing does not hold the GIL of the calling process (e.g. a server's request threads);
+        0 parses in the fetch threads. iter_pages without read_ahead always parses in-process.
+        """
         self.xml_bz2_path = xml_bz2_path
         self.index_bz2_path = index_bz2_path
+        self.stream_cache = stream_cache
+        self.converter = TextConverter(converter, text_cache)
+        if title_index_path is None and index_bz2_path:
+            title_index_path = f'{index_bz2_path}.titles'
+        self.title_index_path = title_index_path
+        if block_index_path is None and index_bz2_path:
+            block_index_path = f'{index_bz2_path}.blocks'
+        self.block_index_path = block_index_path
+        if search_index_path is None and index_bz2_path:
+            search_index_path = f'{index_bz2_path}.search'
+        self.search_index_path = search_index_path
+        self._search_index = None
+        self._block_index = None
+        self._title_index = None
+        self._index_signatures = {}
+        self.reindex_failures = []
+        self._index_checkpoints = None
+        self._binary_indexes = {}
+        self._index_lock = threading.Lock()
+        self.fetch_workers = fetch_workers if fetch_workers is not None else min(8, os.cpu_count() or 1)
+        self.convert_workers = convert_workers
+        self.extract_workers = extract_workers
+        self._fetch_pool = None
+        self._convert_pool = None
+        self._extract_pool = None
+        self._local = threading.local()
+        self._open_files = []
+
+    def _dump_file(self):
+        """
+        Return this thread's handle of the dump file, opened on first use and kept open.
+        """
+        infile = getattr(self._local, 'infile', None)
+        if infile is None:
+            infile = open(self.xml_bz2_path, 'rb')
+            self._local.infile = infile
+            with self._index_lock:
+                self._open_files.append(infile)
+        return infile
+
+    def _get_fetch_pool(self):
+        with self._index_lock:
+            if self._fetch_pool is None:
+                self._fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers,
+                                                      thread_name_prefix='dump-fetch')
+            return self._fetch_pool
+
+    def _get_convert_pool(self):
+        if self.convert_workers <= 0:
+            return None
+        with self._index_lock:
+            if self._convert_pool is None:
+                self._convert_pool = ProcessPoolExecutor(max_workers=self.convert_workers)
+            return self._convert_pool
+
+    def _get_extract_pool(self):
+        if self.extract_workers <= 0:
+            return None
+        with self._index_lock:
+            if self._extract_pool is None:
+                self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_workers)
+            return self._extract_pool
+
+    def close(self):
+        """
+        Shut down the fetch, conversion and extraction pools and close the dump file handles.
+        """
+        with self._index_lock:
+            pools = [self._fetch_pool, self._convert_pool, self._extract_pool]
+            self._fetch_pool = self._convert_pool = self._extract_pool = None
+            files, self._open_files = self._open_files, []
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        for infile in files:
+            infile.close()
+        self._local = threading.local()
 
     def list_index_entries(self, start: int = 0, count: int = 10) -> List[Tuple[str, str, str]]:
         """
         List entries from the multistream index file.
+        Reading starts at the bzip2 stream containing line start, located with the index
+        checkpoints (built into '<index>.checkpoints' on first use).
         Returns a list of tuples: (offset, article_id, article_title)
         """
-        entries = []
-        with bz2.open(self.index_bz2_path, 'rt', encoding='utf-8', errors='replace') as f:
-            for i, line in enumerate(f):
-                if i < start:
-                    continue
-                if len(entries) >= count:
-                    break
-                parts = line.strip().split(':', 2)
-                if len(parts) == 3:
-                    entries.append((parts[0], int(parts[1]), parts[2]))
-        return entries
+        return list(itertools.islice(self._iter_index_entries(start), count))
 
-    def list_binary_index_entries(self, start: int = 0, count: int = 10, index_path: str = None) -> list:
+    def _iter_index_entries(self, start: int = 0):
+        """
+        Yield entries of the multistream index file from line start onwards, as
+        (offset, article_id, article_title) tuples.
+        """
+        offset, first_line = self._locate_index_line(start)
+        with open(self.index_bz2_path, 'rb') as raw:
+            raw.seek(offset)
+            with bz2.open(raw, 'rt', encoding='utf-8', errors='replace') as f:
+                for i, line in enumerate(f, first_line):
+                    if i < start:
+                        continue
+                    parts = line.strip().split(':', 2)
+                    if len(parts) == 3:
+                        yield parts[0], int(parts[1]), parts[2]
+
+    def _locate_index_line(self, line: int) -> Tuple[int, int]:
+        """
+        Return (compressed_offset, first_line) of the text index stream to start reading at.
+        Falls back to the start of the file if the checkpoints cannot be built.
+        """
+        with self._index_lock:
+            if self._index_checkpoints is None:
+                try:
+                    self._index_checkpoints = IndexCheckpoints.load_or_build(self.index_bz2_path)
+                except OSError:
+                    return 0, 0
+            return self._index_checkpoints.locate(line)
+
+    def get_binary_index(self, index_path: str = None) -> BinaryIndex:
         """
-        Read entries from the binary index file. Each entry is three 64-bit unsigned ints:
-        (stream_offset, page_number, page_id)
-        Returns a list of tuples.
+        Return the memory-mapped binary index, mapping it on first use.
+        The mapping is kept between calls and refreshed when the file changes on disk.
+        Raises ValueError if a version 2 index records a different dump size than the dump.
         """
         if index_path is None:
             index_path = self.index_bz2_path
-        entries = []
-        entry_size = 8 * 3  # 3x 64-bit unsigned ints
-        with open(index_path, 'rb') as f:
-            f.seek(start * entry_size)
-            for _ in range(count):
-                data = f.read(entry_size)
-                if len(data) < entry_size:
-                    break
-                stream_offset, page_number, page_id = struct.unpack('>QQQ', data)
-                entries.append((stream_offset, page_id, page_number))
-        return entries
-
-    def _group_index_entries(self, entries):
-        """
-        Helper to group index entries by offset and return ordered offsets.
-        """
-        offset_groups = defaultdict(list)
-        for offset, article_id, _ in entries:
-            offset_groups[int(offset)].append(article_id)
-        sorted_offsets = [int(offset) for offset, _, _ in entries]
-        seen_offsets = set()
-        ordered_offsets = []
-        for o in sorted_offsets:
-            if o not in seen_offsets:
-                ordered_offsets.append(o)
-                seen_offsets.add(o)
-        return offset_groups, ordered_offsets
+        with self._index_lock:
+            index = self._binary_indexes.get(index_path)
+            if index is None or index.is_stale():
+                index = BinaryIndex(index_path)
+                if index.dump_size is not None and index.dump_size != os.path.getsize(self.xml_bz2_path):
+                    raise ValueError(f"Binary index {index_path} was built for another dump than {self.xml_bz2_path}")
+                self._binary_indexes[index_path] = index
+            return index
+
+    def list_binary_index_entries(self, start: int = 0, count: int = 10, index_path: str = None) -> list:
+        """
+        Read article entries from the binary index file.
+        Returns a list of (stream_offset, page_id, page_number) tuples.
+        """
+        return self.get_binary_index(index_path).slice(start, count)
+
+    def _iter_binary_index_entries(self, start: int = 0, stop: int = None, batch_size: int = 10000,
+                                   index_path: str = None):
+        """
+        Yield (stream_offset, page_id, page_number) entries of the binary index for
+        positions start..stop-1, reading the memory-mapped index in batches.
+        """
+        index = self.get_binary_index(index_path)
+        if stop is None or stop > len(index):
+            stop = len(index)
+        for batch_start in range(start, stop, batch_size):
+            yield from index.slice(batch_start, min(batch_size, stop - batch_start))
+
+    def find_index_position(self, page_id: int, index_path: str = None):
+        """
+        Return the binary index position of the article with the given page_id, or None.
+        """
+        return self.get_binary_index(index_path).find_page_id(page_id)
+
+    def get_title_index(self) -> TitleIndex:
+        """
+        Return the memory-mapped title index, opening it on first use.
+        Like the binary index, it is reopened when the file changes on disk (e.g. a reindex).
+        Raises FileNotFoundError if no title index was built for this dump.
+        """
+        with self._index_lock:
+            signature = _file_signature(self.title_index_path)
+            if signature is None:
+                raise FileNotFoundError(f"Title index not found: {self.title_index_path}")
+            if self._title_index is None or self._index_signatures.get('title') != signature:
+                self._title_index = TitleIndex(self.title_index_path)
+                self._index_signatures['title'] = signature
+            return self._title_index
+
+    def get_article_by_title(self, title: str):
+        """
+        Return the (title, text) tuple of the article with exactly this title, or None.
+        Uses the title index and the binary index, no scan of either index is needed.
+        """
+        position = self.get_title_index().lookup(title)
+        if position is None:
+            return None
+        articles = self.list_articles_by_index(start=position, count=1)
+        return articles[0] if articles else None
+
+    def search_titles(self, prefix: str, count: int = 10) -> List[Tuple[str, int]]:
+        """
+        Return up to count (title, index_position) tuples for titles starting with prefix.
+        """
+        return self.get_title_index().prefix_search(prefix, count)
+
+    def get_search_index(self) -> SearchIndex:
+        """
+        Return the memory-mapped full-text index, opening it on first use.
+        It is reopened when the file changes on disk.
+        Raises FileNotFoundError if no search index was built for this dump.
+        """
+        with self._index_lock:
+            signature = _file_signature(self.search_index_path)
+            if signature is None:
+                raise FileNotFoundError(f"Search index not found: {self.search_index_path}")
+            if self._search_index is None or self._index_signatures.get('search') != signature:
+                self._search_index = SearchIndex(self.search_index_path)
+                self._index_signatures['search'] = signature
+            return self._search_index
+
+    def search_articles(self, query: str, count: int = 10) -> List[Tuple[int, float]]:
+        """
+        Return up to count (index_position, score) tuples for the articles best matching the
+        words of query (BM25 ranking), best first. The positions feed get_articles_by_positions.
+        """
+        return self.get_search_index().search(query, count)
+
+    def get_block_index(self):
+        """
+        Return the block index of the dump, or None if none was built.
+        It is reloaded when the file changes on disk.
+        """
+        with self._index_lock:
+            signature = _file_signature(self.block_index_path)
+            if signature is None:
+                self._block_index = None
+                return None
+            if self._block_index is None or self._index_signatures.get('block') != signature:
+                self._block_index = BlockIndex(self.block_index_path, self.xml_bz2_path)
+                self._index_signatures['block'] = signature
+            return self._block_index
+
+    def _locate_block(self, offset: int, page_id: int):
+        """
+        Return the block index location to start reading page_id of the stream at offset,
+        or None to read the stream from its start.
+        """
+        block_index = self.get_block_index()
+        return block_index.locate(offset, page_id) if block_index is not None else None
+
+    def _iter_pages_from(self, infile, offset: int, page_id: int):
+        """
+        Incrementally parse the pages of the stream at offset, starting at the block containing
+        page_id when the block index covers the stream.
+        """
+        location = self._locate_block(offset, page_id)
+        if location is not None:
+            return _iter_stream_pages(iter_block_chunks(infile, location))
+        return _iter_stream_pages(_iter_stream_chunks(infile, offset))
+
+    def _fetch_stream_pages(self, offset: int, entries, use_cache: bool = True) -> dict:
+        """
+        Return {page_id: (title, wikitext, revision_id)} for the pages of the stream at offset
+        listed in entries, (page_id, page_number) pairs. Reading starts at the block of the
+        earliest wanted page when the block index covers the stream, otherwise the parsed stream
+        is served from (and stored in) the stream cache when use_cache is set.
+        """
+        wanted = {page_id for page_id, _ in entries}
+        first_page_id = min(entries, key=lambda entry: entry[1])[0]
+        # Streams covered by the block index are large, read them from the nearest block
+        # rather than parsing and caching the whole stream
+        location = self._locate_block(offset, first_page_id)
+        if location is not None:
+            pages = self._read_stream(offset, location, wanted)
+        elif use_cache:
+            pages = self._get_stream_pages(offset)
+        else:
+            pages = self._read_stream(offset, wanted=wanted)
+        found = {}
+        try:
+            for page_id, title, text, revision_id in pages:
+                if page_id in wanted:
+                    found[page_id] = (title, text, revision_id)
+                    if len(found) == len(wanted):
+                        break
+        finally:
+            if hasattr(pages, 'close'):
+                pages.close()
+        return found
+
+    def _fetch_entries(self, entries, use_cache: bool = True) -> List[Tuple[int, int, str, str, int]]:
+        """
+        Read the pages of (stream_offset, page_id, page_number) index entries, returning
+        (stream_offset, page_id, title, wikitext, revision_id) tuples in the order of entries.
+        Entries whose page is not in the dump are skipped. The distinct streams are read in
+        parallel in the fetch pool.
+        """
+        streams = {}
+        for offset, page_id, page_number in entries:
+            streams.setdefault(int(offset), []).append((page_id, page_number))
+        if len(streams) > 1 and self.fetch_workers > 1:
+            pool = self._get_fetch_pool()
+            fetch = metrics.propagate(self._fetch_stream_pages)
+            futures = {offset: pool.submit(fetch, offset, stream_entries, use_cache)
+                       for offset, stream_entries in streams.items()}
+            pages = {offset: future.result() for offset, future in futures.items()}
+        else:
+            pages = {offset: self._fetch_stream_pages(offset, stream_entries, use_cache)
+                     for offset, stream_entries in streams.items()}
+        results = []
+        for offset, page_id, _ in entries:
+            page = pages[int(offset)].get(page_id)
+            if page is not None:
+                results.append((int(offset), page_id) + page)
+        return results
+
+    def get_articles_by_positions(self, positions, strip_code: bool = True) -> List[Tuple[str, str]]:
+        """
+        Return (title, text) tuples for the articles at arbitrary binary index positions, in
+        the order of positions (repeated positions are allowed). The positions are grouped by
+        stream, each distinct stream is decompressed and parsed once, in parallel in the fetch
+        pool, and the texts are converted in the conversion pool when convert_workers is set.
+        strip_code: convert the wikitext with the reader's converter (otherwise raw wikitext is returned).
+        Raises IndexError for positions outside the index.
+        """
+        positions = list(positions)
+        if not positions:
+            return []
+        return self._articles_from_entries(self.get_binary_index().take(positions), strip_code)
+
+    def _articles_from_entries(self, entries, strip_code: bool = True) -> List[Tuple[str, str]]:
+        pages = self._fetch_entries(entries)
+        if not strip_code:
+            return [(title, text) for _, _, title, text, _ in pages]
+        texts = self.converter.convert_many([(text, page_id, revision_id)
+                                             for _, page_id, _, text, revision_id in pages],
+                                            self._get_convert_pool())
+        return [(page[2], text) for page, text in zip(pages, texts)]
 
     def list_articles_by_index(self, start: int = 0, count: int = 1, index_type: str = 'binary') -> list:
         """
@@ -71,133 +684,292 @@ class WikipediaMultistreamReader:
         if index_type == 'binary':
             entries = self.list_binary_index_entries(start, count)
         else:
-            entries = self.list_index_entries(start, count)
+            # Text index lines are in dump order, their rank within the batch stands in for page_number
+            entries = [(int(offset), page_id, i)
+                       for i, (offset, page_id, _) in enumerate(self.list_index_entries(start, count))]
         if not entries:
             return []
-        offset_groups, ordered_offsets = self._group_index_entries(entries)
-        results = []
+        return self._articles_from_entries(entries)
+
+    def iter_pages(self, start: int = 0, stop: int = None, index_type: str = 'binary', read_ahead: int = 0,
+                   index_path: str = None, failures: list = None):
+        """
+        Generator over the pages at index positions start..stop-1 (to the end of the index if
+        stop is None), yielding (position, page_id, revision_id, title, wikitext) tuples in
+        index order, without any text conversion.
+        Each stream is decompressed once and parsed incrementally, and nothing is accumulated
+        between pages, so memory stays flat for bulk extraction of the whole dump. To resume
+        an interrupted extraction, pass the index position of the next page as start.
+        The stream cache is bypassed, bulk reads would only evict useful entries.
+        index_type: 'text' for text index, 'binary' for binary index.
+        read_ahead: number of streams decompressed ahead in the fetch pool, in parallel with
+        the consumer and with each other. The wanted pages of up to read_ahead + 1 streams
+        are then held in memory.
+        index_path: binary index to walk instead of the reader's own.
+        failures: if given, a (stream_offset, message) tuple is appended for every stream whose
+        indexed pages could not all be read (e.g. it is corrupt or truncated); those pages are
+        skipped either way.
+        """
+        if index_type == 'binary':
+            entries = self._iter_binary_index_entries(start, stop, index_path=index_path)
+        else:
+            entries = self._iter_index_entries(start)
+            if stop is not None:
+                entries = itertools.islice(entries, max(0, stop - start))
+        positioned = zip(itertools.count(start), entries)
+        streams = ((offset, [(position, entry[1]) for position, entry in group])
+                   for offset, group in itertools.groupby(positioned, key=lambda item: int(item[1][0])))
+        if read_ahead > 0:
+            yield from self._iter_pages_read_ahead(streams, read_ahead, failures)
+            return
         with open(self.xml_bz2_path, 'rb') as infile:
-            for offset in ordered_offsets:
-                infile.seek(offset)
-                decompressor = bz2.BZ2Decompressor()
-                uncompressed_data = b""
-                while True:
-                    chunk = infile.read(262144)
-                    if not chunk:
-                        break
-                    try:
-                        uncompressed_data += decompressor.decompress(chunk)
-                    except EOFError:
-                        break
-                    if decompressor.eof:
+            for offset, wanted in streams:
+                idx = 0
+                pages = self._iter_pages_from(infile, offset, wanted[0][1])
+                for page_id, title, text, revision_id in pages:
+                    position, wanted_id = wanted[idx]
+                    if page_id != wanted_id:
+                        continue
+                    yield position, page_id, revision_id, title, text
+                    idx += 1
+                    if idx >= len(wanted):
                         break
-                try:
-                    xml_text = uncompressed_data.decode('utf-8', errors='replace')
-                    xml_text = f'<root>{xml_text}</root>'
-                    root = ET.fromstring(xml_text)
-                    wanted_ids = [aid for aid in offset_groups[offset]]
-                    idx = 0
-                    for page in root.findall('page'):
-                        page_id_text = page.find('id').text if page.find('id') is not None else None
-                        try:
-                            page_id = int(page_id_text)
-                        except Exception:
-                            continue
-                        if page_id == wanted_ids[idx]:
-                            title = page.find('title').text if page.find('title') is not None else ''
-                            revision = page.find('revision')
-                            text = ''
-                            if revision is not None:
-                                text_elem = revision.find('text')
-                                if text_elem is not None:
-                                    text = text_elem.text or ''
-                                    wikicode = mwparserfromhell.parse(text)
-                                    text = wikicode.strip_code()
-                            results.append((title, text))
-                            idx += 1
-                            if idx >= len(wanted_ids):
-                                break
-                except Exception:
-                    continue
-        return results
+                pages.close()
+                if idx < len(wanted) and failures is not None:
+                    failures.append(_unread_pages_failure(offset, len(wanted) - idx, len(wanted)))
+
+    def _iter_pages_read_ahead(self, streams, read_ahead: int, failures: list = None):
+        """
+        iter_pages with the next read_ahead streams fetched in the fetch pool.
+        """
+        pool = self._get_fetch_pool()
+        fetch = metrics.propagate(self._fetch_stream_pages)
+        pending = deque()
+        try:
+            for offset, wanted in streams:
+                # Entries of a stream are in dump order, their rank stands in for page_number
+                stream_entries = [(page_id, rank) for rank, (_, page_id) in enumerate(wanted)]
+                pending.append((offset, wanted, pool.submit(fetch, offset, stream_entries, False)))
+                if len(pending) > read_ahead:
+                    yield from self._pages_in_order(*pending.popleft(), failures)
+            while pending:
+                yield from self._pages_in_order(*pending.popleft(), failures)
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _pages_in_order(offset, wanted, future, failures):
+        pages = future.result()
+        if len(pages) < len(wanted) and failures is not None:
+            failures.append(_unread_pages_failure(offset, len(wanted) - len(pages), len(wanted)))
+        for position, page_id in wanted:
+            page = pages.get(page_id)
+            if page is not None:
+                title, text, revision_id = page
+                yield position, page_id, revision_id, title, text
+
+    def iter_articles(self, start: int = 0, stop: int = None, index_type: str = 'binary', strip_code: bool = True,
+                      with_positions: bool = False, read_ahead: int = 0):
+        """
+        Generator over the articles at index positions start..stop-1, yielding
+        (page_id, title, text) tuples in index order; see iter_pages.
+        strip_code: convert the wikitext with the reader's converter (otherwise raw wikitext is returned).
+        with_positions: yield (position, page_id, title, text) tuples instead.
+        """
+        for position, page_id, revision_id, title, text in self.iter_pages(start, stop, index_type, read_ahead):
+            if strip_code:
+                text = self.converter.convert(text, page_id, revision_id)
+            if with_positions:
+                yield position, page_id, title, text
+            else:
+                yield page_id, title, text
+
+    def _read_stream(self, offset: int, location: tuple = None, wanted: set = None):
+        """
+        Iterate the (page_id, title, text, revision_id) pages of the stream at offset, from the
+        block at location when given. With an extraction pool, the stream is parsed there and
+        only the pages in wanted (all when None) come back.
+        """
+        pool = self._get_extract_pool()
+        if pool is not None:
+            return iter(pool.submit(_read_stream_worker, (self.xml_bz2_path, offset, location, wanted)).result())
+        infile = self._dump_file()
+        if location is not None:
+            return _iter_stream_pages(iter_block_chunks(infile, location))
+        return _iter_stream_pages(_iter_stream_chunks(infile, offset))
 
-    def reindex_multistream(self, output_index_path: str, progress: bool = True) -> int:
+    def _get_stream_pages(self, offset: int) -> list:
+        """
+        Return the pages of the stream at the given offset as a list of (page_id, title, text,
+        revision_id) tuples, where text is the raw wikitext. Served from the stream cache when possible.
+        """
+        key = (self.xml_bz2_path, offset)
+        if self.stream_cache is not None:
+            pages = self.stream_cache.get(key)
+            if pages is not None:
+                return pages
+        pages = list(self._read_stream(offset))
+        if self.stream_cache is not None:
+            self.stream_cache.put(key, pages)
+        return pages
+
+    def reindex_multistream(self, output_index_path: str, progress: bool = True, workers: int = 1,
+                            title_index_path: str = None, block_index_path: str = None,
+                            search_index_path: str = None) -> int:
         """
         Rebuild the multistream index file from the XML dump.
-        Writes a new binary index file. Each entry is three 64-bit unsigned ints:
-        - stream_offset (file offset of the bzip2 stream)
-        - page_number (number of the page within the stream, starting from 0)
-        - page_id (as integer)
-        Returns the total number of output entries written.
-        """
-        line_count = 0
-        with open(self.xml_bz2_path, 'rb') as infile, open(output_index_path, 'wb') as outfile:
-            while True:
-                stream_offset = infile.tell()
-                decompressor = bz2.BZ2Decompressor()
-                uncompressed_data = b""
-                unused = b""
+        Writes a version 2 binary index (see binary_index.BinaryIndexWriter): a header with the
+        dump size and checksum and the page counts, then one record per page of the dump with
+        its stream offset, page number within the stream, page id, text length, namespace and
+        redirect flag, and the positions of the articles (main namespace, no redirects).
+        workers: number of processes; values above 1 use the parallel reindexer.
+        title_index_path: if given, also write a title index (see TitleIndex) to this path.
+        block_index_path: if given, also record the bzip2 blocks of the multi-block streams
+        (see block_index.BlockIndex) in this file; the reader looks for '<index>.blocks'.
+        search_index_path: if given, also index the converted text of every article for full-text
+        search (see search_index.SearchIndex); the reader looks for '<index>.search'. This pass
+        converts every article, so it takes far longer than the rest of the reindexing.
+        Streams that fail to decompress or parse are reported and listed in
+        self.reindex_failures as (stream_offset, message); the pages parsed before a failure
+        are still indexed.
+        Returns the number of articles indexed.
+        """
+        self.reindex_failures = []
+        title_writer = TitleIndexWriter(title_index_path) if title_index_path else None
+        index_writer = BinaryIndexWriter(output_index_path)
+        if workers is not None and workers > 1:
+            self._reindex_multistream_parallel(index_writer, progress, workers, title_writer)
+        else:
+            self._reindex_multistream_serial(index_writer, progress, title_writer)
+        line_count = index_writer.close(dump_size=os.path.getsize(self.xml_bz2_path),
+                                        checksum=dump_checksum(self.xml_bz2_path))
+        if title_writer is not None:
+            title_writer.close()
+        if block_index_path:
+            stream_offsets = BinaryIndex(output_index_path).stream_offsets()
+            blocks = build_block_index(self.xml_bz2_path, block_index_path, stream_offsets, progress)
+            if progress:
+                print(f"{blocks} bzip2 blocks written to {block_index_path}")
+        if search_index_path:
+            documents = build_search_index(self, search_index_path, index_path=output_index_path,
+                                           pool=self._get_convert_pool(), progress=progress)
+            if progress:
+                print(f"{documents} articles indexed for search in {search_index_path}")
+        self._forget_indexes()
+        return line_count
+
+    def _forget_indexes(self):
+        """
+        Drop the cached indexes, so the next use opens the files just written even when their
+        size and mtime look unchanged.
+        """
+        with self._index_lock:
+            self._binary_indexes = {}
+            self._title_index = self._search_index = self._block_index = None
+            self._index_signatures = {}
+
+    def _report_stream_failure(self, offset: int, message: str):
+        self.reindex_failures.append((offset, message))
+        print(f"Stream at offset {offset}: {message}")
+
+    @staticmethod
+    def _write_index_entry(index_writer, title_writer, stream_offset: int, entry):
+        page_number, page_id, title, ns, is_redirect, text_length = entry
+        position = index_writer.add(stream_offset, page_number, page_id, ns, is_redirect, text_length, title)
+        if position is not None and title_writer is not None:
+            title_writer.add(title, position)
+
+    def _reindex_multistream_serial(self, index_writer, progress: bool, title_writer):
+        """
+        Index the dump stream by stream, in one pass. Each stream is decompressed and parsed
+        chunk by chunk and its entries are written as they are found. When the data at an
+        offset is not a valid stream, reindexing resumes at the next bzip2 stream magic.
+        """
+        candidates = None
+        dump_size = os.path.getsize(self.xml_bz2_path)
+        with open(self.xml_bz2_path, 'rb') as infile:
+            offset = 0
+            while offset < dump_size:
+                errors = []
+                indexer = _index_stream(infile, offset, errors)
                 while True:
-                    chunk_offset = infile.tell()
-                    chunk = infile.read(262144)
-                    if not chunk:
-                        break
                     try:
-                        data = decompressor.decompress(chunk)
-                        uncompressed_data += data
-                        if decompressor.eof:
-                            unused = decompressor.unused_data
-                            break
-                    except EOFError:
+                        entry = next(indexer)
+                    except StopIteration as stop:
+                        end_offset = stop.value
                         break
-                if not uncompressed_data:
-                    break
-                try:
-                    xml_text = uncompressed_data.decode('utf-8', errors='replace')
-                    xml_text = f'<root>{xml_text}</root>'
-                    root = ET.fromstring(xml_text)
-                    page_number = 0
-                    for page in root.findall('page'):
-                        page_id_text = page.find('id').text if page.find('id') is not None else ''
-                        # Filter out redirects
-                        is_redirect = page.find('redirect') is not None
-                        if is_redirect:
-                            continue
-                        # Filter out unwanted namespaces by title prefix (case-insensitive)
-                        title = page.find('title').text if page.find('title') is not None else ''
-                        lower_title = title.lower()
-                        unwanted_prefixes = (
-                            'template:', 'module:', 'file:', 'talk:', 'user:', 'mediawiki:'
-                        )
-                        if lower_title.startswith(unwanted_prefixes):
-                            continue
-                        try:
-                            page_id = int(page_id_text)
-                        except Exception:
-                            print(f"Invalid page ID: {page_id_text}")
-                            continue
-                        entry = struct.pack('>QQQ', stream_offset, page_number, page_id)
-                        outfile.write(entry)
-                        line_count += 1
-                        page_number += 1
-                        if progress and line_count % 1000 == 0:
-                            print(f"Processed {line_count} entries...", end='\r')
-                except Exception:
-                    pass
-                # If there was unused data, move the file pointer back so the next stream starts at the correct place
-                if unused:
-                    infile.seek(chunk_offset + len(chunk) - len(unused))
-                if not chunk:
+                    self._write_index_entry(index_writer, title_writer, offset, entry)
+                    if progress and index_writer.entry_count % 1000 == 0:
+                        print(f"Processed {index_writer.entry_count} pages...", end='\r')
+                for message in errors:
+                    self._report_stream_failure(offset, message)
+                if end_offset is not None and end_offset > offset:
+                    offset = end_offset
+                    continue
+                if candidates is None:
+                    candidates = find_stream_offsets(self.xml_bz2_path)
+                i = bisect.bisect_right(candidates, offset)
+                if i >= len(candidates):
                     break
-        return line_count
+                print(f"No bzip2 stream found at offset {offset}, resuming at {candidates[i]}")
+                offset = candidates[i]
+
+    def _reindex_multistream_parallel(self, index_writer, progress: bool, workers: int, title_writer=None):
+        """
+        Parallel variant of reindex_multistream.
+        Stream boundaries are located with a fast scan for the bzip2 stream magic,
+        the streams are indexed in a process pool and the results are written in
+        file order, producing exactly the same index as the serial reindexer.
+        Candidate offsets that fall inside a previous stream (false positives of
+        the magic scan) are discarded by chaining each stream's end offset.
+        """
+        offsets = find_stream_offsets(self.xml_bz2_path)
+        tasks = [(self.xml_bz2_path, offset) for offset in offsets]
+        chunksize = max(1, min(64, len(tasks) // (workers * 16)))
+        expected_offset = 0
+        with Pool(workers) as pool:
+            for stream_offset, end_offset, entries, errors in pool.imap(_reindex_stream_worker, tasks, chunksize):
+                if stream_offset < expected_offset or end_offset is None:
+                    continue
+                if stream_offset > expected_offset:
+                    print(f"No bzip2 stream found at offset {expected_offset}, resuming at {stream_offset}")
+                expected_offset = end_offset
+                for message in errors:
+                    self._report_stream_failure(stream_offset, message)
+                previous_count = index_writer.entry_count
+                for entry in entries:
+                    self._write_index_entry(index_writer, title_writer, stream_offset, entry)
+                if progress and index_writer.entry_count // 1000 != previous_count // 1000:
+                    print(f"Processed {index_writer.entry_count} pages...", end='\r')
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) == 4 and sys.argv[1] == '--reindex':
-        xml_bz2_path = sys.argv[2]
-        output_index_path = sys.argv[3]
-        reader = WikipediaMultistreamReader(xml_bz2_path, None)
-        lines = reader.reindex_multistream(output_index_path)
-        print(f"Reindexing complete. {lines} lines written to {output_index_path}")
-    else:
-        pass
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Wikipedia multistream dump tools')
+    parser.add_argument('--reindex', nargs=2, metavar=('XML_BZ2_PATH', 'OUTPUT_INDEX_PATH'),
+                        help='Rebuild the binary index from the multistream dump')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used by --reindex (default: 1)')
+    parser.add_argument('--build-checkpoints', metavar='INDEX_BZ2_PATH',
+                        help='Write seek checkpoints for a text index to INDEX_BZ2_PATH.checkpoints')
+    parser.add_argument('--title-index', metavar='PATH',
+                        help='Also write a title index to PATH (the reader looks for OUTPUT_INDEX_PATH.titles)')
+    parser.add_argument('--blocks', metavar='PATH',
+                        help='Also write a bzip2 block index to PATH (the reader looks for OUTPUT_INDEX_PATH.blocks)')
+    parser.add_argument('--search-index', metavar='PATH',
+                        help='Also write a full-text search index to PATH (the reader looks for OUTPUT_INDEX_PATH.search)')
+    parser.add_argument('--converter', default='mwparserfromhell',
+                        help='Wikitext conversion used for --search-index (raw, regex, mwparserfromhell)')
+    args = parser.parse_args()
+    if args.reindex:
+        xml_bz2_path, output_index_path = args.reindex
+        reader = WikipediaMultistreamReader(xml_bz2_path, None, converter=args.converter,
+                                            convert_workers=args.workers if args.workers > 1 else 0)
+        lines = reader.reindex_multistream(output_index_path, workers=args.workers,
+                                           title_index_path=args.title_index, block_index_path=args.blocks,
+                                           search_index_path=args.search_index)
+        reader.close()
+        print(f"Reindexing complete. {lines} articles indexed in {output_index_path}")
+    if args.build_checkpoints:
+        checkpoints = build_index_checkpoints(args.build_checkpoints, f'{args.build_checkpoints}.checkpoints')
+        print(f"{checkpoints} checkpoints written to {args.build_checkpoints}.checkpoints")
\ No newline at end of file
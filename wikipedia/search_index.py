@@ -0,0 +1,355 @@
+import heapq
+import itertools
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+SEARCH_INDEX_MAGIC = b'WIKISRC1'
+HEADER_FORMAT = '>8sQQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RUN_RECORD_FORMAT = '>HII'
+RUN_RECORD_SIZE = struct.calcsize(RUN_RECORD_FORMAT)
+
+# On-disk layout of a search index:
+#   header:            magic, document count D, term count T, total token count (u64 each)
+#   document lengths:  D big-endian u32 token counts, by binary index position
+#   term offsets:      T + 1 big-endian u64 offsets of the terms in the term blob
+#   postings offsets:  T + 1 big-endian u64 offsets of the postings lists in the postings blob
+#   document freqs:    T big-endian u32
+#   term blob:         UTF-8 terms, sorted bytewise
+#   postings blob:     per term, the varint gaps between its document positions followed by
+#                      the varint term frequencies
+
+_TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 32
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split plain text into lowercase word tokens, dropping single characters and very long tokens.
+    """
+    return [token for token in _TOKEN_RE.findall(text.casefold())
+            if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH]
+
+
+def encode_varints(values) -> bytes:
+    """
+    LEB128-encode unsigned integers: 7 bits per byte, high bit set on all bytes but the last.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if not values.size:
+        return b''
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+    for k in range(int(lengths.max())):
+        mask = lengths > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + k] = byte | more
+    return out.tobytes()
+
+
+def decode_varints(buf) -> np.ndarray:
+    """
+    Decode a buffer of LEB128 varints into a uint64 array.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if not ends.size:
+        return np.zeros(0, dtype=np.uint64)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    values = np.zeros(len(ends), dtype=np.uint64)
+    for k in range(int(lengths.max())):
+        mask = lengths > k
+        values[mask] |= (data[starts[mask] + k] & 0x7f).astype(np.uint64) << np.uint64(7 * k)
+    return values
+
+
+def encode_postings(positions, frequencies) -> bytes:
+    positions = np.asarray(positions, dtype=np.uint64)
+    gaps = np.diff(positions, prepend=np.uint64(0))
+    return encode_varints(gaps) + encode_varints(frequencies)
+
+
+def decode_postings(buf, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the (positions, frequencies) arrays of an encoded postings list of count documents.
+    """
+    values = decode_varints(buf)
+    return np.cumsum(values[:count]), values[count:]
+
+
+class SearchIndexWriter:
+    """
+    Build a full-text search index over article texts, single-pass in memory (SPIMI).
+    Documents are added in increasing binary index position order. Postings are collected in
+    per-term arrays; every run_postings postings the dictionary is sorted and spilled to a
+    temporary run file, and the runs are merged into the final file on close.
+    """
+
+    def __init__(self, path: str, run_postings: int = 5000000):
+        self.path = path
+        self.run_postings = run_postings
+        self.doc_lengths = array('I')
+        self.total_tokens = 0
+        self._terms = {}
+        self._pending = 0
+        self._runs = []
+        self._last_position = -1
+
+    def add(self, position: int, text: str):
+        """
+        Index the text of the article at the given binary index position.
+        """
+        if position <= self._last_position:
+            raise ValueError(f"Positions must increase: {position} after {self._last_position}")
+        self._last_position = position
+        tokens = tokenize(text)
+        if len(self.doc_lengths) < position:
+            self.doc_lengths.extend(itertools.repeat(0, position - len(self.doc_lengths)))
+        self.doc_lengths.append(min(len(tokens), 0xffffffff))
+        self.total_tokens += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            postings = self._terms.get(term)
+            if postings is None:
+                postings = self._terms[term] = (array('Q'), array('I'))
+            postings[0].append(position)
+            postings[1].append(frequency)
+            self._pending += 1
+        if self._pending >= self.run_postings:
+            self._spill()
+
+    def _sorted_terms(self):
+        for term in sorted(self._terms, key=lambda t: t.encode('utf-8')):
+            positions, frequencies = self._terms[term]
+            yield term.encode('utf-8'), positions, frequencies
+
+    def _spill(self):
+        run = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.path)))
+        for term, positions, frequencies in self._sorted_terms():
+            data = encode_postings(positions, frequencies)
+            run.write(struct.pack(RUN_RECORD_FORMAT, len(term), len(positions), len(data)))
+            run.write(term)
+            run.write(data)
+        run.seek(0)
+        self._runs.append(run)
+        self._terms = {}
+        self._pending = 0
+
+    @staticmethod
+    def _read_run(run, run_number: int):
+        while True:
+            header = run.read(RUN_RECORD_SIZE)
+            if not header:
+                return
+            term_length, count, data_length = struct.unpack(RUN_RECORD_FORMAT, header)
+            term = run.read(term_length)
+            yield term, run_number, count, run.read(data_length)
+
+    def _merged_terms(self):
+        """
+        Yield (term, encoded postings, document frequency) in term order.
+        """
+        if not self._runs:
+            for term, positions, frequencies in self._sorted_terms():
+                yield term, encode_postings(positions, frequencies), len(positions)
+            return
+        self._spill()
+        merged = heapq.merge(*(self._read_run(run, i) for i, run in enumerate(self._runs)))
+        for term, parts in itertools.groupby(merged, key=lambda record: record[0]):
+            parts = list(parts)
+            if len(parts) == 1:
+                yield term, parts[0][3], parts[0][2]
+                continue
+            # Runs hold consecutive position ranges, so concatenating them keeps positions sorted
+            decoded = [decode_postings(data, count) for _, _, count, data in parts]
+            positions = np.concatenate([p for p, _ in decoded])
+            frequencies = np.concatenate([f for _, f in decoded])
+            yield term, encode_postings(positions, frequencies), len(positions)
+
+    def close(self) -> int:
+        """
+        Merge the postings and write the index file. Returns the number of terms.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        term_offsets = array('Q', [0])
+        postings_offsets = array('Q', [0])
+        frequencies = array('I')
+        with tempfile.TemporaryFile(dir=directory) as terms, tempfile.TemporaryFile(dir=directory) as postings:
+            for term, data, count in self._merged_terms():
+                terms.write(term)
+                postings.write(data)
+                term_offsets.append(term_offsets[-1] + len(term))
+                postings_offsets.append(postings_offsets[-1] + len(data))
+                frequencies.append(count)
+            doc_lengths = self.doc_lengths
+            if sys.byteorder == 'little':
+                for values in (doc_lengths, term_offsets, postings_offsets, frequencies):
+                    values.byteswap()
+            with open(self.path, 'wb') as out:
+                out.write(struct.pack(HEADER_FORMAT, SEARCH_INDEX_MAGIC, len(doc_lengths), len(frequencies),
+                                      self.total_tokens))
+                for values in (doc_lengths, term_offsets, postings_offsets, frequencies):
+                    values.tofile(out)
+                for blob in (terms, postings):
+                    blob.seek(0)
+                    while True:
+                        chunk = blob.read(1 << 20)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        self._terms = {}
+        return len(frequencies)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for run in self._runs:
+                run.close()
+
+
+def build_search_index(reader, path: str, index_path: str = None, pool=None, progress: bool = False,
+                       batch_size: int = 256) -> int:
+    """
+    Index the converted text and title of every article of a dump, in the order of the binary
+    index at index_path (the reader's index by default), into a search index at path.
+    Texts are converted in batches with the reader's converter, in pool when one is given.
+    Returns the number of articles indexed.
+    """
+    pages = reader.iter_pages(read_ahead=4, index_path=index_path)
+    count = 0
+    with SearchIndexWriter(path) as writer:
+        while True:
+            batch = list(itertools.islice(pages, batch_size))
+            if not batch:
+                break
+            texts = reader.converter.convert_many([(text, page_id, revision_id)
+                                                   for _, page_id, revision_id, _, text in batch], pool)
+            for (position, _, _, title, _), text in zip(batch, texts):
+                writer.add(position, f'{title}\n{text}')
+            count += len(batch)
+            if progress and count // 10000 != (count - len(batch)) // 10000:
+                print(f"Indexed {count} articles...", end='\r')
+    return count
+
+
+class SearchIndex:
+    """
+    Memory-mapped full-text index answering ranked BM25 queries.
+    A query decodes the postings of its terms only, accumulates the scores of the matching
+    positions and keeps the k best with a heap.
+    """
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.doc_count, self.term_count, self.total_tokens = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != SEARCH_INDEX_MAGIC:
+            raise ValueError(f"Not a search index file: {path}")
+        offset = HEADER_SIZE
+        self._doc_lengths = np.frombuffer(self._mm, dtype='>u4', count=self.doc_count, offset=offset)
+        offset += self.doc_count * 4
+        self._term_offsets = np.frombuffer(self._mm, dtype='>u8', count=self.term_count + 1, offset=offset)
+        offset += (self.term_count + 1) * 8
+        self._postings_offsets = np.frombuffer(self._mm, dtype='>u8', count=self.term_count + 1, offset=offset)
+        offset += (self.term_count + 1) * 8
+        self._frequencies = np.frombuffer(self._mm, dtype='>u4', count=self.term_count, offset=offset)
+        offset += self.term_count * 4
+        self._terms_start = offset
+        self._postings_start = offset + int(self._term_offsets[-1])
+        documents = int(np.count_nonzero(self._doc_lengths))
+        self.average_length = self.total_tokens / documents if documents else 0.0
+
+    def __len__(self):
+        return self.doc_count
+
+    def _term_bytes(self, i: int) -> bytes:
+        return self._mm[self._terms_start + int(self._term_offsets[i]):self._terms_start + int(self._term_offsets[i + 1])]
+
+    def _find_term(self, term: str):
+        key = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.term_count and self._term_bytes(lo) == key:
+            return lo
+        return None
+
+    def document_frequency(self, term: str) -> int:
+        """
+        Return the number of articles containing term (0 if it is not indexed).
+        """
+        i = self._find_term(term.casefold())
+        return int(self._frequencies[i]) if i is not None else 0
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the (positions, frequencies) of the articles containing term.
+        """
+        i = self._find_term(term.casefold())
+        if i is None:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        start = self._postings_start + int(self._postings_offsets[i])
+        end = self._postings_start + int(self._postings_offsets[i + 1])
+        return decode_postings(self._mm[start:end], int(self._frequencies[i]))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Return up to k (binary index position, BM25 score) tuples for the articles matching any
+        term of the query, best first.
+        """
+        positions = []
+        scores = []
+        for term in dict.fromkeys(tokenize(query)):
+            docs, frequencies = self.postings(term)
+            if not docs.size:
+                continue
+            df = len(docs)
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            tf = frequencies.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[docs.astype(np.int64)] / self.average_length)
+            positions.append(docs)
+            scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not positions or k <= 0:
+            return []
+        unique, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        best = heapq.nlargest(k, zip(totals.tolist(), (-p for p in unique.tolist())))
+        return [(-position, score) for score, position in best]
+
+    def close(self):
+        self._doc_lengths = self._term_offsets = self._postings_offsets = self._frequencies = None
+        self._mm.close()
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+
+class StreamCache:
+    """
+    Bounded, byte-size-aware cache of parsed bzip2 streams of a multistream dump.
+    Keys are stream identifiers (the reader uses (dump path, stream offset)), values are
+    lists of parsed pages. The cache is bounded both by the total estimated size of the
+    cached values and by the number of cached streams.
+    Eviction policy:
+        'lru'  - evict the least recently used stream (default).
+        'fifo' - evict the oldest inserted stream, lookups do not refresh entries.
+    The cache is thread-safe and keeps hit/miss/eviction counters.
+    """
+    POLICIES = ('lru', 'fifo')
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 256, policy: str = 'lru'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.policy = policy
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def estimate_size(pages) -> int:
+        """
+        Estimate the memory used by a list of parsed pages (tuples of ints and strings).
+        """
+        size = 64
+        for page in pages:
+            size += 64
+            for value in page:
+                size += len(value) if isinstance(value, (str, bytes)) else 8
+        return size
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.policy == 'lru':
+                self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size: int = None):
+        """
+        Store value under key. Values larger than max_bytes are not cached.
+        """
+        if size is None:
+            size = self.estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self._entries and (self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop all cached entries. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self) -> dict:
+        """
+        Return cache statistics as a dict.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'policy': self.policy,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
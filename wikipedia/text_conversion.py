@@ -0,0 +1,217 @@
+import html
+import re
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+import mwparserfromhell
+
+from telemetry import metrics
+
+
+def raw_text(text: str) -> str:
+    """
+    Return the wikitext unchanged.
+    """
+    return text
+
+
+def mwparserfromhell_strip(text: str) -> str:
+    """
+    Full wikitext to plain text conversion with mwparserfromhell (accurate, slow).
+    """
+    return mwparserfromhell.parse(text).strip_code()
+
+
+_COMMENT_RE = re.compile(r'<!--.*?-->', re.S)
+_REF_RE = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.S | re.I)
+_TEMPLATE_RE = re.compile(r'\{\{[^{}]*\}\}')
+_TABLE_RE = re.compile(r'\{\|[^{}]*?\|\}', re.S)
+_FILE_LINK_RE = re.compile(r'\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]', re.I)
+_LINK_RE = re.compile(r'\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]')
+_EXTERNAL_LINK_RE = re.compile(r'\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]')
+_HEADING_RE = re.compile(r'^(=+)\s*(.*?)\s*\1\s*$', re.M)
+_TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+_QUOTES_RE = re.compile(r"'{2,}")
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def regex_strip(text: str) -> str:
+    """
+    Fast, approximate wikitext to plain text conversion with regular expressions.
+    Drops comments, references, templates, tables, file and category links; keeps link
+    labels, heading text and the text inside formatting. Meant for bulk jobs where the
+    exact mwparserfromhell output is not required.
+    """
+    text = _COMMENT_RE.sub('', text)
+    text = _REF_RE.sub('', text)
+    # Templates and tables nest, remove them innermost first
+    while True:
+        stripped = _TABLE_RE.sub('', _TEMPLATE_RE.sub('', text))
+        if stripped == text:
+            break
+        text = stripped
+    text = _FILE_LINK_RE.sub('', text)
+    text = _LINK_RE.sub(r'\1', text)
+    text = _EXTERNAL_LINK_RE.sub(r'\1', text)
+    text = _HEADING_RE.sub(r'\2', text)
+    text = _TAG_RE.sub('', text)
+    text = _QUOTES_RE.sub('', text)
+    text = html.unescape(text)
+    return _BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+CONVERTERS = {
+    'raw': raw_text,
+    'regex': regex_strip,
+    'mwparserfromhell': mwparserfromhell_strip,
+}
+
+
+def get_converter(converter) -> Callable[[str], str]:
+    """
+    Return a conversion function given its name in CONVERTERS or a callable.
+    """
+    if callable(converter):
+        return converter
+    try:
+        return CONVERTERS[converter]
+    except KeyError:
+        raise ValueError(f"Unknown text converter: {converter}")
+
+
+class StrippedTextCache:
+    """
+    Persistent on-disk cache of converted article text, stored in SQLite.
+    Entries are keyed by (page_id, converter) and hold the revision id they were computed for;
+    a lookup only hits when the revision id matches, so a newer dump invalidates changed pages.
+    The database can be shared between threads and processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS stripped_text ('
+            ' page_id INTEGER NOT NULL,'
+            ' converter TEXT NOT NULL,'
+            ' revision_id INTEGER NOT NULL,'
+            ' text TEXT NOT NULL,'
+            ' PRIMARY KEY (page_id, converter))'
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, page_id: int, revision_id: int, converter: str) -> Optional[str]:
+        """
+        Return the cached text for this page revision, or None.
+        """
+        row = self._connection().execute(
+            'SELECT text FROM stripped_text WHERE page_id = ? AND converter = ? AND revision_id = ?',
+            (page_id, converter, revision_id)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, page_id: int, revision_id: int, converter: str, text: str):
+        """
+        Store the converted text of a page revision, replacing older revisions.
+        """
+        self.put_many([(page_id, revision_id, converter, text)])
+
+    def put_many(self, rows):
+        """
+        Store many (page_id, revision_id, converter, text) rows in one transaction.
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO stripped_text (page_id, revision_id, converter, text) VALUES (?, ?, ?, ?)',
+                rows
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+class TextConverter:
+    """
+    The wikitext conversion stage of the reader: a conversion function plus an optional
+    StrippedTextCache. Raw text is never cached, there is nothing to save.
+    """
+
+    def __init__(self, converter='mwparserfromhell', cache: StrippedTextCache = None):
+        self.name = converter if isinstance(converter, str) else getattr(converter, '__name__', 'custom')
+        self.convert_text = get_converter(converter)
+        self.cache = cache if self.name != 'raw' else None
+
+    def convert(self, text: str, page_id: int = None, revision_id: int = None) -> str:
+        """
+        Convert wikitext, using the cache when page_id and revision_id are known.
+        """
+        if not text:
+            return ''
+        if self.cache is None or page_id is None or revision_id is None:
+            with metrics.span('strip'):
+                return self.convert_text(text)
+        cached = self.cache.get(page_id, revision_id, self.name)
+        if cached is not None:
+            return cached
+        with metrics.span('strip'):
+            converted = self.convert_text(text)
+        self.cache.put(page_id, revision_id, self.name, converted)
+        return converted
+
+    def convert_many(self, items, pool=None) -> List[str]:
+        """
+        Convert a list of (text, page_id, revision_id) items, returning the texts in order.
+        Cached texts are looked up first; the others are converted in pool when one is given
+        (a concurrent.futures executor, e.g. a ProcessPoolExecutor for the CPU-bound converters;
+        the conversion function must then be picklable, as the named converters are).
+        """
+        results = [''] * len(items)
+        pending = []
+        for i, (text, page_id, revision_id) in enumerate(items):
+            if not text:
+                continue
+            if self.cache is not None and page_id is not None and revision_id is not None:
+                cached = self.cache.get(page_id, revision_id, self.name)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            pending.append(i)
+        texts = [items[i][0] for i in pending]
+        with metrics.span('strip'):
+            if pool is not None and len(texts) > 1:
+                converted = list(pool.map(self.convert_text, texts, chunksize=max(1, len(texts) // 32)))
+            else:
+                converted = [self.convert_text(text) for text in texts]
+        rows = []
+        for i, text in zip(pending, converted):
+            results[i] = text
+            _, page_id, revision_id = items[i]
+            if self.cache is not None and page_id is not None and revision_id is not None:
+                rows.append((page_id, revision_id, self.name, text))
+        if rows:
+            self.cache.put_many(rows)
+        return results
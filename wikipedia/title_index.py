@@ -0,0 +1,187 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TITLE_INDEX_MAGIC = b'WIKITTL1'
+HEADER_FORMAT = '>8sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RUN_RECORD_FORMAT = '>IQ'
+RUN_RECORD_SIZE = struct.calcsize(RUN_RECORD_FORMAT)
+
+# On-disk layout of a title index:
+#   header:    magic, entry count N (u64)
+#   offsets:   N + 1 big-endian u64 offsets of the titles in the blob
+#   positions: N big-endian u64 binary index positions
+#   blob:      UTF-8 titles, sorted bytewise
+
+
+class TitleIndexWriter:
+    """
+    Build a title -> binary index position lookup file.
+    Titles can be added in any order. They are sorted in bounded memory: every run_size
+    titles are sorted and spilled to a temporary run file, and the runs are merged when
+    the writer is closed.
+    """
+
+    def __init__(self, path: str, run_size: int = 1000000):
+        self.path = path
+        self.run_size = run_size
+        self._pending = []
+        self._runs = []
+        self.count = 0
+
+    def add(self, title: str, position: int):
+        """
+        Add a title pointing at the given binary index position.
+        """
+        self._pending.append((title.encode('utf-8'), position))
+        self.count += 1
+        if len(self._pending) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        self._pending.sort()
+        run = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.path)))
+        for title, position in self._pending:
+            run.write(struct.pack(RUN_RECORD_FORMAT, len(title), position))
+            run.write(title)
+        run.seek(0)
+        self._runs.append(run)
+        self._pending = []
+
+    @staticmethod
+    def _read_run(run):
+        while True:
+            header = run.read(RUN_RECORD_SIZE)
+            if not header:
+                return
+            length, position = struct.unpack(RUN_RECORD_FORMAT, header)
+            yield run.read(length), position
+
+    def close(self) -> int:
+        """
+        Merge all titles and write the index file. Returns the number of titles written.
+        """
+        if self._runs:
+            self._spill()
+            merged = heapq.merge(*(self._read_run(run) for run in self._runs))
+        else:
+            self._pending.sort()
+            merged = iter(self._pending)
+        offsets = array('Q', [0])
+        positions = array('Q')
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.path))) as blob:
+            blob_size = 0
+            for title, position in merged:
+                blob.write(title)
+                blob_size += len(title)
+                offsets.append(blob_size)
+                positions.append(position)
+            if sys.byteorder == 'little':
+                offsets.byteswap()
+                positions.byteswap()
+            with open(self.path, 'wb') as out:
+                out.write(struct.pack(HEADER_FORMAT, TITLE_INDEX_MAGIC, len(positions)))
+                offsets.tofile(out)
+                positions.tofile(out)
+                blob.seek(0)
+                while True:
+                    chunk = blob.read(1 << 20)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        self._pending = []
+        return len(positions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for run in self._runs:
+                run.close()
+
+
+class TitleIndex:
+    """
+    Memory-mapped, sorted title -> binary index position lookup.
+    Exact lookups and prefix searches are binary searches over the sorted titles,
+    so they take O(log N) title comparisons and never scan the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != TITLE_INDEX_MAGIC:
+            raise ValueError(f"Not a title index file: {path}")
+        self.count = count
+        self._offsets = np.frombuffer(self._mm, dtype='>u8', count=count + 1, offset=HEADER_SIZE)
+        positions_start = HEADER_SIZE + (count + 1) * 8
+        self._positions = np.frombuffer(self._mm, dtype='>u8', count=count, offset=positions_start)
+        self._blob_start = positions_start + count * 8
+
+    def __len__(self):
+        return self.count
+
+    def _title_bytes(self, i: int) -> bytes:
+        return self._mm[self._blob_start + int(self._offsets[i]):self._blob_start + int(self._offsets[i + 1])]
+
+    def title_at(self, i: int) -> str:
+        """
+        Return the i-th title in sorted order.
+        """
+        return self._title_bytes(i).decode('utf-8')
+
+    def _bisect_left(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._title_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, title: str) -> Optional[int]:
+        """
+        Return the binary index position of the article with exactly this title, or None.
+        """
+        key = title.encode('utf-8')
+        i = self._bisect_left(key)
+        if i < self.count and self._title_bytes(i) == key:
+            return int(self._positions[i])
+        return None
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Return up to limit (title, position) tuples for titles starting with prefix, in title order.
+        """
+        key = prefix.encode('utf-8')
+        results = []
+        i = self._bisect_left(key)
+        while i < self.count and len(results) < limit:
+            title = self._title_bytes(i)
+            if not title.startswith(key):
+                break
+            results.append((title.decode('utf-8'), int(self._positions[i])))
+            i += 1
+        return results
+
+    def close(self):
+        self._offsets = None
+        self._positions = None
+        self._mm.close()